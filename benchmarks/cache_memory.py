@@ -0,0 +1,94 @@
+"""Память Redis на одну запись кэша скоринга для разных раскладок.
+
+Запуск (нужен Redis из .env):
+    python -m benchmarks.cache_memory --entries 100000 --db 15
+
+В заданную БД, которая должна быть пустой, записывается entries
+значений скоринга сначала отдельными ключами, затем корзинами-хешами.
+Для каждой раскладки выводится прирост used_memory на одну запись;
+после измерения БД очищается.
+"""
+
+import json
+import sys
+from argparse import ArgumentParser
+
+import redis
+
+from src.otus_hw5.buckets import BUCKET_BITS, BucketLayout
+from src.otus_hw5.scoring import SCORE_PERIOD, compute_score, score_key
+from src.otus_hw5.store import CACHE_DB, connection_kwargs, load_config
+
+BATCH_SIZE = 1000
+
+
+def used_memory(client: redis.Redis) -> int:
+    return int(client.info("memory")["used_memory"])
+
+
+def write_keys(client: redis.Redis, items) -> None:
+    pipe = client.pipeline(transaction=False)
+    for key, value in items:
+        pipe.set(key, value, ex=SCORE_PERIOD)
+    pipe.execute()
+
+
+def write_buckets(layout: BucketLayout):
+    def write(client: redis.Redis, items) -> None:
+        layout.set_batch(client, [(key, value, SCORE_PERIOD) for key, value in items])
+    return write
+
+
+def measure(client: redis.Redis, write, entries: int) -> dict:
+    client.flushdb()
+    before = used_memory(client)
+    batch = []
+    for i in range(entries):
+        item = {"phone": "7%010d" % i, "email": f"user{i}@otus.ru"}
+        batch.append((score_key(**item), compute_score(**item)))
+        if len(batch) >= BATCH_SIZE:
+            write(client, batch)
+            batch = []
+    if batch:
+        write(client, batch)
+    after = used_memory(client)
+    result = {
+        "keys": client.dbsize(),
+        "used_memory": after - before,
+        "bytes_per_entry": round((after - before) / entries, 1),
+    }
+    client.flushdb()
+    return result
+
+
+def main(argv=None) -> int:
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=100000)
+    parser.add_argument("--db", type=int, default=15,
+                        help="пустая БД Redis для измерения")
+    parser.add_argument("--bucket-bits", type=int, default=None,
+                        help="разрядность номера корзины (по умолчанию - "
+                             "до ~64 записей в корзине)")
+    parser.add_argument("--env", default=".env")
+    args = parser.parse_args(argv)
+
+    config = load_config(args.env)
+    client = redis.Redis(**dict(connection_kwargs(config, CACHE_DB), db=args.db))
+    if client.dbsize():
+        print("DB %s is not empty" % args.db, file=sys.stderr)
+        return 1
+    bits = args.bucket_bits or max(1, min(BUCKET_BITS,
+                                          (args.entries // 64).bit_length()))
+    report = {
+        "entries": args.entries,
+        "bucket_bits": bits,
+        "keys": measure(client, write_keys, args.entries),
+        "buckets": measure(client, write_buckets(BucketLayout(bits=bits)),
+                           args.entries),
+    }
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,277 @@
+"""Микробенчмарки конвейера обработки запроса.
+
+Запуск:
+    python -m benchmarks.pipeline --output report.json
+    python -m benchmarks.pipeline --redis --compare benchmarks/baseline.json
+
+По умолчанию используется RedisMock из юнит-тестов, с ключом --redis -
+Redis из .env. Отчет сохраняется в JSON; при сравнении с базовым
+отчетом замедление медианы больше порога с поправкой на разброс
+раундов, подтвержденное замедлением минимума, считается регрессией
+(код выхода 1). Подозрительные бенчмарки
+перед этим измеряются повторно, учитывается лучший замер.
+"""
+
+import datetime
+import gc
+import hashlib
+import itertools
+import json
+import platform
+import statistics
+import sys
+import time
+from argparse import ArgumentParser
+from typing import Callable, Dict
+
+import src.otus_hw5.api as api
+import src.otus_hw5.codec as codec
+import src.otus_hw5.scoring as scoring
+from src.otus_hw5.store import CACHE_DB, REMOTE_DB, ScoringStore
+from tests.unit.redis_mock import RedisMock
+
+ACCOUNT = "horns&hoofs"
+LOGIN = "h&f"
+TOKEN = hashlib.sha512((ACCOUNT + LOGIN + api.SALT).encode("utf-8")).hexdigest()
+# Поправка на шум: число разбросов раундов сверх порога
+CONFIDENCE = 2.0
+RETRIES = 3
+SCORE_ARGUMENTS = {
+    "phone": "79175002040",
+    "email": "stupnikov@otus.ru",
+    "gender": 1,
+    "birthday": "01.01.2000",
+    "first_name": "a",
+    "last_name": "b",
+}
+
+
+def make_store(use_redis: bool) -> ScoringStore:
+    store = ScoringStore(".env")
+    if not use_redis:
+        store.connections[CACHE_DB] = RedisMock()
+        store.connections[REMOTE_DB] = RedisMock()
+    return store
+
+
+def method_body(method: str, arguments: dict) -> dict:
+    return {"account": ACCOUNT, "login": LOGIN, "token": TOKEN,
+            "method": method, "arguments": arguments}
+
+
+def measure(func: Callable, min_time: float, rounds: int) -> Dict[str, float]:
+    """Время одного вызова в микросекундах по нескольким раундам."""
+    # Подбираем число вызовов в раунде, чтобы раунд длился не меньше min_time
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time / rounds or number >= 1 << 20:
+            break
+        number *= 2
+    samples = []
+    # Как и timeit, измеряем без сборщика мусора - его запуски
+    # дают основной разброс у бенчмарков с большим числом объектов
+    gc.collect()
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(rounds):
+            started = time.perf_counter()
+            for _ in range(number):
+                func()
+            samples.append((time.perf_counter() - started) / number * 1e6)
+    finally:
+        if enabled:
+            gc.enable()
+    samples.sort()
+    median = statistics.median(samples)
+    return {
+        "mean_us": statistics.fmean(samples),
+        "median_us": median,
+        "min_us": samples[0],
+        "p95_us": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        # Медианное абсолютное отклонение - разброс раундов
+        "mad_us": statistics.median(abs(sample - median) for sample in samples),
+        "calls": number * rounds,
+    }
+
+
+def margin(result: dict, base: dict, threshold: float,
+           confidence: float) -> float:
+    """Допустимое относительное замедление с поправкой на шум.
+
+    К порогу добавляется confidence разбросов (MAD) текущего и базового
+    замеров относительно базовой медианы."""
+    noise = result.get("mad_us", 0.0) + base.get("mad_us", 0.0)
+    return threshold + confidence * noise / base["median_us"]
+
+
+def cases(store: ScoringStore) -> Dict[str, Callable]:
+    """Набор бенчмарков: имя -> функция без аргументов."""
+
+    ctx = {}
+    online_score = {"body": method_body("online_score", SCORE_ARGUMENTS),
+                    "headers": {}}
+    interests = {"body": method_body("clients_interests",
+                                     {"client_ids": list(range(10))}),
+                 "headers": {}}
+    method_request = api.parse_method(online_score["body"])
+    admin_request = api.parse_method(dict(
+        online_score["body"], login=api.ADMIN_LOGIN,
+        token=api.admin_digest.get().decode("utf-8")))
+    birthday = datetime.date(2000, 1, 1)
+    phones = itertools.count(70000000000)
+
+    def check_auth_uncached():
+        api.auth_cache.clear()
+        api.check_auth(method_request)
+
+    def get_score_miss():
+        scoring.get_score(store, phone=str(next(phones)), email="a@b.ru")
+
+    def interests_request(n: int):
+        request = api.parse_method(
+            method_body("clients_interests", {"client_ids": list(range(n))}))
+        return lambda: api.clients_interest_request(request, ctx, store)
+
+    return {
+        "method_handler.online_score":
+            lambda: api.method_handler(online_score, ctx, store),
+        "method_handler.clients_interests":
+            lambda: api.method_handler(interests, ctx, store),
+        "codec.roundtrip":
+            lambda: codec.loads(codec.dumps(online_score["body"])),
+        "validate.MethodRequest":
+            lambda: api.parse_method(online_score["body"]),
+        "validate.OnlineScoreRequest":
+            lambda: api.parse_online_score(SCORE_ARGUMENTS),
+        "validate.ClientsInterestsRequest":
+            lambda: api.ClientsInterestsRequest(client_ids=list(range(10)),
+                                                date="20.07.2017"),
+        "validate.OnlineScoreBatchRequest":
+            lambda: api.OnlineScoreBatchRequest(items=[SCORE_ARGUMENTS] * 10),
+        "check_auth.cached": lambda: api.check_auth(method_request),
+        "check_auth.uncached": check_auth_uncached,
+        "check_auth.admin": lambda: api.check_auth(admin_request),
+        "get_score.hit":
+            lambda: scoring.get_score(store, phone="79175002040",
+                                      birthday=birthday, gender=1),
+        "get_score.miss": get_score_miss,
+        "clients_interests.1": interests_request(1),
+        "clients_interests.100": interests_request(100),
+        "clients_interests.10000": interests_request(10000),
+    }
+
+
+def environment(report: dict) -> dict:
+    """Окружение, от которого зависят замеры: хранилище, версия Python
+    (без патч-версии) и модуль JSON."""
+    return {"store": report.get("store"),
+            "python": ".".join(str(report.get("python")).split(".")[:2]),
+            "json_backend": report.get("json_backend")}
+
+
+def compare(report: dict, baseline: dict, threshold: float,
+            confidence: float = CONFIDENCE) -> list:
+    """Список регрессий относительно базового отчета.
+
+    Регрессия - замедление медианы больше порога с поправкой на
+    разброс, подтвержденное замедлением минимума больше порога:
+    минимум почти не зависит от периодов общей загрузки машины."""
+    regressions = []
+    for name, result in report["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if base is None:
+            continue
+        ratio = result["median_us"] / base["median_us"]
+        allowed = margin(result, base, threshold, confidence)
+        if (ratio > 1 + allowed
+                and result["min_us"] / base["min_us"] > 1 + threshold):
+            regressions.append({"name": name, "ratio": round(ratio, 3),
+                                "allowed": round(1 + allowed, 3),
+                                "baseline_us": base["median_us"],
+                                "current_us": result["median_us"]})
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--redis", action="store_true",
+                        help="использовать Redis из .env вместо RedisMock")
+    parser.add_argument("--output", default=None, help="файл JSON-отчета")
+    parser.add_argument("--compare", default=None, help="базовый JSON-отчет")
+    parser.add_argument("--threshold", type=float, default=0.3,
+                        help="допустимое замедление относительно базового")
+    parser.add_argument("--min-time", type=float, default=0.5,
+                        help="минимальное время измерения одного бенчмарка, с")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--confidence", type=float, default=CONFIDENCE,
+                        help="сколько разбросов раундов добавлять к порогу")
+    parser.add_argument("--retries", type=int, default=RETRIES,
+                        help="повторных замеров бенчмарка с регрессией")
+    parser.add_argument("-k", dest="select", default="",
+                        help="только бенчмарки, содержащие подстроку")
+    args = parser.parse_args(argv)
+
+    store = make_store(args.redis)
+    results = {}
+    benchmarks = cases(store)
+    for name, func in benchmarks.items():
+        if args.select not in name:
+            continue
+        func()  # прогрев кэшей
+        results[name] = measure(func, args.min_time, args.rounds)
+        print("%-36s %12.2f us" % (name, results[name]["median_us"]),
+              file=sys.stderr)
+
+    report = {
+        "store": "redis" if args.redis else "mock",
+        "python": platform.python_version(),
+        "json_backend": codec.BACKEND,
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "results": results,
+    }
+    code = 0
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if environment(report) != environment(baseline):
+            # Замеры в другом окружении несравнимы с базовыми
+            report["skipped"] = "baseline environment %s, current %s" % (
+                environment(baseline), environment(report))
+            print("SKIPPED comparison: %s" % report["skipped"], file=sys.stderr)
+            baseline = {}
+        regressions = compare(report, baseline, args.threshold, args.confidence)
+        # Замедление из-за фоновой нагрузки редко повторяется:
+        # перемеряем подозрительные бенчмарки и берем лучший замер
+        for _ in range(args.retries):
+            if not regressions:
+                break
+            for regression in regressions:
+                name = regression["name"]
+                result = measure(benchmarks[name], args.min_time, args.rounds)
+                print("%-36s %12.2f us (retry)" % (name, result["median_us"]),
+                      file=sys.stderr)
+                if result["median_us"] < results[name]["median_us"]:
+                    results[name] = result
+            regressions = compare(report, baseline, args.threshold,
+                                  args.confidence)
+        report["regressions"] = regressions
+        for regression in report["regressions"]:
+            print("REGRESSION %(name)s: x%(ratio)s" % regression, file=sys.stderr)
+        code = 1 if report["regressions"] else 0
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,206 @@
+"""Асинхронный сервер API на asyncio"""
+
+import asyncio
+import logging
+import uuid
+from http import HTTPStatus
+
+import src.otus_hw5.api as api
+import src.otus_hw5.codec as codec
+import src.otus_hw5.scoring as scoring
+from src.otus_hw5.body import MAX_BODY_SIZE, BadBody, BodyTooLarge, aread_body
+from src.otus_hw5.store import AsyncScoringStore
+
+MAX_HEADERS_SIZE = 64 * 1024
+
+
+async def online_score_request(
+    request: api.MethodRequest, ctx, store: AsyncScoringStore
+):
+    """Запрос скоринга."""
+
+    if request.is_admin:
+        score = 42
+    else:
+        arguments, response, code = api.parse_online_score(request.arguments)
+        if arguments is None:
+            return response, code
+        score = await scoring.aget_score(
+            store=store, **api.score_arguments(arguments)
+        )
+
+    ctx["has"] = [arg for arg, _ in request.arguments.items()]
+    return {"score": score}, api.OK
+
+
+async def clients_interest_request(
+    request: api.MethodRequest, ctx, store: AsyncScoringStore
+):
+    """Запрос интересов."""
+
+    arguments = api.parse_clients_interests(request)
+    response = await scoring.aget_interests_many(
+        store=store, cids=arguments.client_ids
+    )
+    ctx["nclients"] = len(arguments.client_ids)
+    return response, api.OK
+
+
+async def method_request(body, ctx, store: AsyncScoringStore):
+    """Запрос к API."""
+
+    method_req = api.parse_method(body)
+    if not api.check_auth(method_req):
+        return {"error": "Invalid token"}, api.FORBIDDEN
+    if method_req.method == "online_score":
+        return await online_score_request(method_req, ctx, store)
+    if method_req.method == "clients_interests":
+        return await clients_interest_request(method_req, ctx, store)
+    return {"error": "Invalid method"}, api.INVALID_REQUEST
+
+
+async def method_handler(request, ctx, store: AsyncScoringStore):
+    """Обработчик обращения к API."""
+
+    if api.is_empty_request(request):
+        return {"error": "Empty request"}, api.INVALID_REQUEST
+    try:
+        return await method_request(request.get("body"), ctx, store)
+    except ValueError as ve:
+        return {"error": ve}, api.INVALID_REQUEST
+
+
+class AsyncHTTPServer:
+    """Минимальный HTTP/1.1-сервер поверх asyncio.start_server."""
+
+    router = {"method": method_handler}
+    timeout = api.KEEP_ALIVE_TIMEOUT
+    max_requests = api.KEEP_ALIVE_MAX_REQUESTS
+    log_sample_rate = api.LOG_SAMPLE_RATE
+    log_body_limit = api.LOG_BODY_LIMIT
+    max_body_size = MAX_BODY_SIZE
+
+    def __init__(self, store: AsyncScoringStore):
+        self.store = store
+
+    async def handle(self, request_path: str, headers: dict, data: bytes):
+        """Обработка одного запроса. Возвращает (code, тело ответа)."""
+
+        context = {"request_id": headers.get("x-request-id", uuid.uuid4().hex)}
+        response, code = {}, api.OK
+        request = None
+        try:
+            request = codec.loads(data)
+        except BaseException:
+            code = api.BAD_REQUEST
+
+        if request:
+            path = request_path.strip("/")
+            if path in self.router:
+                try:
+                    response, code = await self.router[path](
+                        {"body": request, "headers": headers}, context, self.store
+                    )
+                except Exception as e:
+                    logging.exception("Unexpected error: %s" % e)
+                    code = api.INTERNAL_ERROR
+            else:
+                code = api.NOT_FOUND
+
+        r = api.make_envelope(response, code)
+        context.update(r)
+        api.log_request(request_path, code, data, context,
+                        self.log_sample_rate, self.log_body_limit)
+        return code, codec.dumps(r)
+
+    async def serve_client(self, reader: asyncio.StreamReader,
+                           writer: asyncio.StreamWriter):
+        """Обслуживание соединения с поддержкой keep-alive."""
+
+        served = 0
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(
+                        reader.readuntil(b"\r\n\r\n"), self.timeout
+                    )
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError,
+                        asyncio.TimeoutError):
+                    break
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, path, version = lines[0].split(" ", 2)
+                except ValueError:
+                    break
+                headers = {}
+                for line in lines[1:]:
+                    if ":" in line:
+                        name, value = line.split(":", 1)
+                        headers[name.strip().lower()] = value.strip()
+
+                try:
+                    data = await aread_body(reader, headers, self.max_body_size)
+                    rejected = False
+                except (BodyTooLarge, BadBody) as e:
+                    # Тело не прочитано - после ответа соединение закрывается
+                    data, rejected = b"", True
+                    code = (api.PAYLOAD_TOO_LARGE if isinstance(e, BodyTooLarge)
+                            else api.BAD_REQUEST)
+                    body = codec.dumps(api.make_envelope(None, code))
+                if not rejected and method == "POST":
+                    code, body = await self.handle(path, headers, data)
+                elif not rejected:
+                    code = HTTPStatus.NOT_IMPLEMENTED
+                    body = b""
+
+                served += 1
+                keep_alive = (
+                    not rejected
+                    and version == "HTTP/1.1"
+                    and headers.get("connection", "").lower() != "close"
+                    and served < self.max_requests
+                )
+                status = HTTPStatus(code)
+                writer.write(
+                    (
+                        "%s %d %s\r\n"
+                        "Content-Type: application/json\r\n"
+                        "Content-Length: %d\r\n"
+                        "Connection: %s\r\n\r\n"
+                        % (
+                            version,
+                            status.value,
+                            status.phrase,
+                            len(body),
+                            "keep-alive" if keep_alive else "close",
+                        )
+                    ).encode("latin-1")
+                    + body
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve_forever(self, host: str, port: int, backlog: int = 128):
+        server = await asyncio.start_server(
+            self.serve_client, host, port, backlog=backlog, limit=MAX_HEADERS_SIZE
+        )
+        logging.info("Starting async server at %s:%s" % (host, port))
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await self.store.close()
+
+
+def serve(host: str = "localhost", port: int = 8080, backlog: int = 128):
+    """Запуск асинхронного сервера."""
+    server = AsyncHTTPServer(AsyncScoringStore())
+    try:
+        asyncio.run(server.serve_forever(host, port, backlog))
+    except KeyboardInterrupt:
+        pass
@@ -4,31 +4,56 @@
 
 import datetime
 import hashlib
-import json
+import hmac
 import logging
+import random
+import threading
+import time
 import uuid
 from argparse import ArgumentParser
-from http.server import BaseHTTPRequestHandler, HTTPServer
+from collections.abc import Iterator
 
+import src.otus_hw5.codec as codec
+import src.otus_hw5.logs as logs
+import src.otus_hw5.metrics as metrics
 import src.otus_hw5.scoring as scoring
-from src.otus_hw5.store import ScoringStore
+from src.otus_hw5.body import MAX_BODY_SIZE, BadBody, BodyTooLarge, read_body
+from src.otus_hw5.cache import TTLCache
+from src.otus_hw5.deadline import Deadline, DeadlineExceeded
+from src.otus_hw5.server import PersistentHTTPRequestHandler, serve
+from src.otus_hw5.store import ScoringStore, get_store
 
 SALT = "Otus"
 ADMIN_LOGIN = "admin"
 ADMIN_SALT = "42"
+AUTH_CACHE_SIZE = 10000
+AUTH_CACHE_TTL = 300
+KEEP_ALIVE_TIMEOUT = 15
+READ_TIMEOUT = 5
+KEEP_ALIVE_MAX_REQUESTS = 1000
+REQUEST_TIMEOUT = 30.0
+LOG_SAMPLE_RATE = 1.0
+LOG_BODY_LIMIT = 1024
 OK = 200
 BAD_REQUEST = 400
 FORBIDDEN = 403
 NOT_FOUND = 404
+PAYLOAD_TOO_LARGE = 413
 INVALID_REQUEST = 422
 INTERNAL_ERROR = 500
+METHODS = ("online_score", "online_score_batch", "clients_interests")
 ERRORS = {
     BAD_REQUEST: "Bad Request",
     FORBIDDEN: "Forbidden",
     NOT_FOUND: "Not Found",
+    PAYLOAD_TOO_LARGE: "Payload Too Large",
     INVALID_REQUEST: "Invalid Request",
     INTERNAL_ERROR: "Internal Server Error",
 }
+MAX_BATCH_SIZE = 10000
+MAX_CLIENT_IDS = 100000
+# Заголовок запроса, включающий потоковый ответ clients_interests
+STREAM_HEADER = "X-Response-Stream"
 UNKNOWN = 0
 MALE = 1
 FEMALE = 2
@@ -39,15 +64,33 @@ GENDERS = {
 }
 
 
+REQUEST_LATENCY = metrics.histogram(
+    "api_request_duration_seconds",
+    "API request latency by method and status code",
+    ("method", "code"),
+)
+REQUESTS_IN_FLIGHT = metrics.gauge(
+    "api_requests_in_flight", "API requests being processed"
+)
+VALIDATION_LATENCY = metrics.histogram(
+    "api_validation_duration_seconds",
+    "Request validation time by request type",
+    ("request",),
+)
+
+
 class FieldRequired(object):
-    """Базовый класс - валидатор с атрибутом Required."""
+    """Базовый класс - валидатор с атрибутом Required.
+
+    Валидатор не хранит значение: метод clean проверяет и преобразует
+    переданное значение, а хранение выполняет экземпляр Request-класса."""
 
     def __init__(self, required: bool):
         self.required = required
-        self.value = ""
+        self.nullable = False
 
-    def __get__(self, instance, owner):
-        return self.value
+    def clean(self, value):
+        return value
 
 
 class FieldValidator(FieldRequired):
@@ -61,166 +104,186 @@ class FieldValidator(FieldRequired):
 class CharField(FieldValidator):
     """Валидатор символьного поля."""
 
-    def __set__(self, instance, value):
-        if value is None:
-            self.value = None
-        elif isinstance(value, str):
-            self.value = value
-        else:
-            raise ValueError("Invalid char value")
+    def clean(self, value):
+        if value is None or isinstance(value, str):
+            return value
+        raise ValueError("Invalid char value")
 
 
 class ArgumentsField(FieldValidator):
     """Валидатор словаря аргументов."""
 
-    def __init__(self, required: bool, nullable: bool):
-        super().__init__(required, nullable)
-        self.value = {}
-
-    def __set__(self, instance, value):
-        if value is None:
-            self.value = None
-        elif isinstance(value, dict):
-            self.value = value
-        else:
-            raise ValueError("Invalid arguments value")
+    def clean(self, value):
+        if value is None or isinstance(value, dict):
+            return value
+        raise ValueError("Invalid arguments value")
 
 
 class EmailField(CharField):
     """Валидатор адреса электронной почты."""
 
-    def __set__(self, instance, value):
-        old_value = self.value
-        super().__set__(instance, value)
-        if value is None:
-            self.value = None
-        elif value.find("@") > 0 and not value.endswith("@"):
-            self.value = value
-        else:
-            self.value = old_value
-            raise ValueError("Invalid email address")
+    def clean(self, value):
+        value = super().clean(value)
+        if value is None or (value.find("@") > 0 and not value.endswith("@")):
+            return value
+        raise ValueError("Invalid email address")
 
 
 class PhoneField(FieldValidator):
     """Валидатор номера телефона."""
 
-    def __set__(self, instance, value):
+    def clean(self, value):
         if value is None:
-            self.value = None
-        elif isinstance(value, str) and value.startswith("7") and len(value) == 11:
-            self.value = value
-        elif isinstance(value, int) and 70000000000 <= value <= 79999999999:
-            self.value = str(value)
-        else:
-            raise ValueError("Invalid phone number")
+            return None
+        if isinstance(value, str) and value.startswith("7") and len(value) == 11:
+            return value
+        if isinstance(value, int) and 70000000000 <= value <= 79999999999:
+            return str(value)
+        raise ValueError("Invalid phone number")
 
 
 class DateField(FieldValidator):
     """Валидатор даты."""
 
-    def __init__(self, required: bool, nullable: bool):
-        super().__init__(required, nullable)
-        self.value = datetime.date(year=datetime.MINYEAR, month=1, day=1)
-
-    def __set__(self, instance, value):
+    def clean(self, value):
         if value is None:
-            self.value = None
-        elif isinstance(value, str) and len(value) == 10:
-            self.value = datetime.datetime.strptime(value, "%d.%m.%Y").date()
-        else:
-            raise ValueError("Invalid date")
+            return None
+        # Разбор формата ДД.ММ.ГГГГ без strptime
+        if (
+            isinstance(value, str)
+            and len(value) == 10
+            and value[2] == value[5] == "."
+            and value[:2].isdigit()
+            and value[3:5].isdigit()
+            and value[6:].isdigit()
+        ):
+            return datetime.date(int(value[6:]), int(value[3:5]), int(value[:2]))
+        raise ValueError("Invalid date")
 
 
 class BirthDayField(DateField):
     """Валидатор даты рождения."""
 
-    def __set__(self, instance, value):
-        old_value = self.value
-        super().__set__(instance, value)
-        years0 = datetime.timedelta()
-        years70 = datetime.timedelta(days=365) * 70
+    years0 = datetime.timedelta()
+    years70 = datetime.timedelta(days=365) * 70
 
-        if value is None:
-            self.value = None
-        elif not years0 <= datetime.date.today() - self.value <= years70:
-            self.value = old_value
-            raise ValueError("Invalid birthday")
+    def clean(self, value):
+        value = super().clean(value)
+        if value is None or (
+            self.years0 <= datetime.date.today() - value <= self.years70
+        ):
+            return value
+        raise ValueError("Invalid birthday")
 
 
 class GenderField(FieldValidator):
     """Валидатор пола."""
 
-    def __set__(self, instance, value):
+    def clean(self, value):
+        if value is None or value in GENDERS.keys():
+            return value
+        raise ValueError("Invalid gender")
+
+
+class ArgumentsListField(FieldRequired):
+    """Валидатор списка словарей аргументов."""
+
+    def __init__(self, required: bool, max_length: int):
+        super().__init__(required)
+        self.max_length = max_length
+
+    def clean(self, value):
         if value is None:
-            self.value = None
-        elif value in GENDERS.keys():
-            self.value = value
-        else:
-            raise ValueError("Invalid gender")
+            return None
+        if not (isinstance(value, list) and all(isinstance(i, dict) for i in value)):
+            raise ValueError("Invalid arguments list")
+        if len(value) > self.max_length:
+            raise ValueError(f"Arguments list is longer than {self.max_length}")
+        return value
 
 
 class ClientIDsField(FieldRequired):
     """Валидатор списка клиентов."""
 
-    def __init__(self, required: bool):
+    def __init__(self, required: bool, max_length: int = MAX_CLIENT_IDS):
         super().__init__(required)
-        self.value = []
+        self.max_length = max_length
 
-    def __set__(self, instance, value):
+    def clean(self, value):
         if value is None:
-            self.value = None
-        elif isinstance(value, list) and all(isinstance(i, int) for i in value):
-            self.value = value
-        else:
+            return value
+        if not (isinstance(value, list) and all(isinstance(i, int) for i in value)):
             raise ValueError("ClientIDs is not a list")
+        if len(value) > self.max_length:
+            raise ValueError(f"ClientIDs list is longer than {self.max_length}")
+        return value
+
+
+def is_empty(value) -> bool:
+    """Проверка на пустое значение (None или нулевая длина)."""
+    return value is None or (hasattr(value, "__len__") and len(value) == 0)
 
 
 class MetaRequest(type):
-    """Метакласс для создания Request-классов."""
+    """Метакласс для создания Request-классов.
+
+    Поля-валидаторы класса заменяются слотами (__slots__), а для
+    проверки аргументов один раз при создании класса генерируется
+    специализированный инициализатор. Значения хранятся в экземпляре,
+    поэтому Request-объекты можно безопасно создавать из разных потоков."""
+
+    def __new__(mcs, name, bases, attrs):
+        # Собираем поля-валидаторы, включая поля базовых классов
+        fields = {}
+        for base in reversed(bases):
+            fields.update(getattr(base, "class_attrs", {}))
+        own = {k: v for k, v in attrs.items() if isinstance(v, FieldRequired)}
+        fields.update(own)
+        for key in own:
+            del attrs[key]
+        attrs["__slots__"] = tuple(own)
+        attrs["class_attrs"] = fields
+        cls = super().__new__(mcs, name, bases, attrs)
+        cls.__init__ = mcs.compile_init(name, fields)
+        return cls
 
-    def create_local_attrs(self, *args, **kwargs):
-        """Замена стандартного инициализатора Request-классов."""
+    @staticmethod
+    def compile_init(name: str, fields: dict):
+        """Генерация инициализатора с проверками для набора полей."""
 
-        for key, value in self.class_attrs.items():
+        namespace = {"is_empty": is_empty}
+        lines = []
+        for key, field in fields.items():
+            namespace[f"clean_{key}"] = field.clean
             # Если атрибут обязательный, но не передан или None,
             # вызываем исключение
-            if self.class_attrs[key].required and (
-                key not in kwargs or kwargs[key] is None
-            ):
-                raise ValueError(f"Mandatory attribute {key} is not set")
-            # Если атрибут не должен быть пустым, но пуст (длина 0),
+            if field.required:
+                lines.append(f"    if {key} is None:")
+                lines.append(
+                    f"        raise ValueError('Mandatory attribute {key} is not set')"
+                )
+            # Если атрибут не должен быть пустым, но пуст,
             # вызываем исключение
-            if (
-                not hasattr(self.class_attrs[key], "nullable")
-                or not self.class_attrs[key].nullable
-            ) and len(kwargs.get(key, "")) == 0:
-                raise ValueError(f"Attribute {key} is not nullable")
-            # Если атрибут передан
-            if key in kwargs:
-                # Добавляем атрибут уровня экземпляра
-                setattr(self, key, kwargs[key])
-
-    def __init__(cls, name, bases, attrs):
-        """Инициализатор."""
-
-        super().__init__(name, bases, attrs)
-        # Сохраняем атрибуты класса в словаре
-        # Исключаем magic-атрибуты, свойства и методы
-        cls.class_attrs = {
-            k: v
-            for k, v in attrs.items()
-            if not k.startswith("__")
-            and not isinstance(v, property)
-            and not callable(v)
-        }
-        # Подменяем инициализатор Request-классов
-        cls.__init__ = MetaRequest.create_local_attrs
+            if not field.nullable:
+                lines.append(f"    if is_empty({key}):")
+                lines.append(
+                    f"        raise ValueError('Attribute {key} is not nullable')"
+                )
+            lines.append(f"    self.{key} = clean_{key}({key})")
+        args = "".join(f"{key}=None, " for key in fields)
+        source = "def __init__(self, {}{}**kwargs):\n{}\n".format(
+            "*, " if fields else "", args, "\n".join(lines) or "    pass"
+        )
+        exec(compile(source, f"<{name}.__init__>", "exec"), namespace)
+        init = namespace["__init__"]
+        init.__qualname__ = f"{name}.__init__"
+        return init
 
 
 class ClientsInterestsRequest(metaclass=MetaRequest):
     """Атрибуты интересов."""
 
-    client_ids = ClientIDsField(required=True)
+    client_ids = ClientIDsField(required=True, max_length=MAX_CLIENT_IDS)
     date = DateField(required=False, nullable=True)
 
 
@@ -235,6 +298,12 @@ class OnlineScoreRequest(metaclass=MetaRequest):
     gender = GenderField(required=False, nullable=True)
 
 
+class OnlineScoreBatchRequest(metaclass=MetaRequest):
+    """Атрибуты для пакетного скоринга."""
+
+    items = ArgumentsListField(required=True, max_length=MAX_BATCH_SIZE)
+
+
 class MethodRequest(metaclass=MetaRequest):
     """Запрос к API."""
 
@@ -250,64 +319,113 @@ class MethodRequest(metaclass=MetaRequest):
         return self.login == ADMIN_LOGIN
 
 
+class AdminDigest:
+    """Токен администратора на текущий час.
+
+    Хеш вычисляется один раз в час и пересчитывается при переходе
+    через границу часа (по локальному времени)."""
+
+    def __init__(self):
+        self.digest = b""
+        self.expires = 0.0
+        self.lock = threading.Lock()
+
+    def get(self, now: float | None = None) -> bytes:
+        now = time.time() if now is None else now
+        if now >= self.expires:
+            with self.lock:
+                if now >= self.expires:
+                    moment = datetime.datetime.fromtimestamp(now)
+                    hour = moment.replace(minute=0, second=0, microsecond=0)
+                    self.digest = hashlib.sha512(
+                        (hour.strftime("%Y%m%d%H") + ADMIN_SALT).encode("utf-8")
+                    ).hexdigest().encode("utf-8")
+                    self.expires = (hour + datetime.timedelta(hours=1)).timestamp()
+        return self.digest
+
+
+admin_digest = AdminDigest()
+# Подтвержденные тройки (account, login, token)
+auth_cache = TTLCache(max_entries=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL)
+
+
 def check_auth(request):
     """Аутентификация."""
 
+    token = (request.token or "").encode("utf-8")
     if request.is_admin:
-        digest = hashlib.sha512(
-            (datetime.datetime.now().strftime("%Y%m%d%H") + ADMIN_SALT).encode("utf-8")
-        ).hexdigest()
-    else:
-        digest = hashlib.sha512(
-            (request.account + request.login + SALT).encode("utf-8")
-        ).hexdigest()
-    return digest == request.token
+        return hmac.compare_digest(admin_digest.get(), token)
+
+    key = (request.account, request.login, request.token)
+    if auth_cache.get(key):
+        return True
+    digest = hashlib.sha512(
+        (request.account + request.login + SALT).encode("utf-8")
+    ).hexdigest().encode("utf-8")
+    verified = hmac.compare_digest(digest, token)
+    if verified:
+        auth_cache.set(key, True)
+    return verified
+
+
+def parse_online_score(args: dict):
+    """Парсинг аргументов скоринга.
+
+    Возвращает кортеж (arguments, response, code): при ошибке arguments
+    равен None, а response и code содержат ответ API."""
+
+    if len(args) == 0:
+        # Пустой список аргументов
+        return None, {"error": "Empty arguments list"}, INVALID_REQUEST
+
+    # Парсинг списка аргументов с валидацией
+    arguments = OnlineScoreRequest(
+        first_name=args.get("first_name"),
+        last_name=args.get("last_name"),
+        email=args.get("email"),
+        phone=args.get("phone"),
+        birthday=args.get("birthday"),
+        gender=args.get("gender"),
+    )
+
+    # Проверка на обязательные пары аргументов
+    if (
+        (arguments.phone is None or arguments.email is None)
+        and (arguments.first_name is None or arguments.last_name is None)
+        and (arguments.gender is None or arguments.birthday is None)
+    ):
+        return None, {"error": "Incomplete arguments list"}, INVALID_REQUEST
+
+    return arguments, None, None
+
+
+def score_arguments(arguments: OnlineScoreRequest) -> dict:
+    """Именованные аргументы для функций скоринга."""
+    return {
+        "phone": arguments.phone,
+        "email": arguments.email,
+        "birthday": arguments.birthday,
+        "gender": arguments.gender,
+        "first_name": arguments.first_name,
+        "last_name": arguments.last_name,
+    }
 
 
 def online_score_request(request: MethodRequest, ctx, store:ScoringStore):
     """Запрос скоринга."""
 
-    response, code = None, None
-
     if request.is_admin:
         # Режим администратора
         score = 42
-    elif len(request.arguments) == 0:
-        # Пустой список аргументов
-        code = INVALID_REQUEST
-        response = {"error": "Empty arguments list"}
-        return response, code
     else:
-        # Парсинг списка аргументов с валидацией
-        arguments = OnlineScoreRequest(
-            first_name=request.arguments.get("first_name"),
-            last_name=request.arguments.get("last_name"),
-            email=request.arguments.get("email"),
-            phone=request.arguments.get("phone"),
-            birthday=request.arguments.get("birthday"),
-            gender=request.arguments.get("gender"),
-        )
-
-        # Проверка на обязательные пары аргументов
-        if (
-            (arguments.phone is None or arguments.email is None)
-            and (arguments.first_name is None or arguments.last_name is None)
-            and (arguments.gender is None or arguments.birthday is None)
-        ):
-            code = INVALID_REQUEST
-            response = {"error": "Incomplete arguments list"}
+        with VALIDATION_LATENCY.time(request="online_score"):
+            arguments, response, code = parse_online_score(request.arguments)
+        if arguments is None:
             return response, code
 
         # Получение скоринга
-        score = scoring.get_score(
-            store=store,
-            phone=arguments.phone,
-            email=arguments.email,
-            birthday=arguments.birthday,
-            gender=arguments.gender,
-            first_name=arguments.first_name,
-            last_name=arguments.last_name,
-        )
+        score = scoring.get_score(store=store, deadline=ctx.get("deadline"),
+                                  **score_arguments(arguments))
 
     # Сохраняем в контексте количество переданных аргументов
     ctx["has"] = [arg for arg, _ in request.arguments.items()]
@@ -317,43 +435,115 @@ def online_score_request(request: MethodRequest, ctx, store:ScoringStore):
     return response, code
 
 
-def clients_interest_request(request: MethodRequest, ctx, store:ScoringStore):
-    """Запрос интересов."""
+def online_score_batch_request(request: MethodRequest, ctx, store:ScoringStore):
+    """Пакетный запрос скоринга.
 
-    response, code = None, None
+    Каждый элемент списка items проверяется как отдельный запрос
+    online_score; ошибка в одном элементе не влияет на остальные."""
 
-    # Парсинг списка аргументов с валидацией
-    arguments = ClientsInterestsRequest(
+    with VALIDATION_LATENCY.time(request="online_score_batch"):
+        arguments = OnlineScoreBatchRequest(items=request.arguments.get("items"))
+
+        results = [None] * len(arguments.items)
+        valid = {}
+        for i, item in enumerate(arguments.items):
+            if request.is_admin:
+                results[i] = {"score": 42}
+                continue
+            try:
+                parsed, response, code = parse_online_score(item)
+            except ValueError as ve:
+                parsed, response, code = None, {"error": str(ve)}, INVALID_REQUEST
+            if parsed is None:
+                results[i] = dict(response, code=code)
+            else:
+                valid[i] = score_arguments(parsed)
+
+    # Скоринг всех корректных элементов за один проход по кэшу
+    scores = scoring.get_scores_many(store=store, items=list(valid.values()),
+                                     deadline=ctx.get("deadline"))
+    for i, score in zip(valid, scores):
+        results[i] = {"score": score}
+
+    # Сохраняем в контексте размер пакета
+    ctx["nitems"] = len(arguments.items)
+
+    return {"scores": results}, OK
+
+
+def parse_clients_interests(request: MethodRequest) -> "ClientsInterestsRequest":
+    """Парсинг аргументов запроса интересов с валидацией."""
+    return ClientsInterestsRequest(
         client_ids=request.arguments.get("client_ids"),
         date=request.arguments.get("date"),
     )
 
-    code = OK
-    response = {}
 
-    # Выбираем интересы каждого клиента. Результат Dict[int,List]
-    for id in arguments.client_ids:
-        response[id] = scoring.get_interests(store=store, cid=id)
+def iter_interests(store: ScoringStore, cids: list, ctx):
+    """Интересы клиентов порциями по мере чтения из хранилища.
+
+    Если срок запроса истек, последняя порция содержит None для
+    клиентов, интересы которых не успели получить."""
+    pending = dict.fromkeys(cids)
+    try:
+        for batch in scoring.iter_interests_batches(store, cids,
+                                                    deadline=ctx.get("deadline")):
+            for cid in batch:
+                del pending[cid]
+            yield batch
+    except DeadlineExceeded:
+        pass
+    if pending:
+        ctx["partial"] = True
+        ctx["missing"] = list(pending)
+        yield pending
+
+
+def clients_interest_request(request: MethodRequest, ctx, store:ScoringStore):
+    """Запрос интересов.
+
+    Если срок запроса истек, возвращаются уже полученные интересы,
+    а для остальных клиентов - None. При ctx["stream"] ответ - итератор
+    порций интересов, который обработчик отправляет по мере получения."""
+
+    with VALIDATION_LATENCY.time(request="clients_interests"):
+        arguments = parse_clients_interests(request)
+
+    code = OK
 
     # Сохраняем в контексте количество клиентов
     ctx["nclients"] = len(arguments.client_ids)
 
-    return response, code
-
+    batches = iter_interests(store, arguments.client_ids, ctx)
+    if ctx.get("stream"):
+        return batches, code
 
-def method_request(body, ctx, store:ScoringStore):
-    """Запрос к API."""
+    # Результат Dict[int,List]
+    response = {}
+    for batch in batches:
+        response.update(batch)
+    return response, code
 
-    response, code = None, None
 
-    # Парсинг запроса с валидацией
-    method_req = MethodRequest(
+def parse_method(body) -> MethodRequest:
+    """Парсинг запроса к API с валидацией."""
+    return MethodRequest(
         account=body.get("account"),
         login=body.get("login"),
         token=body.get("token"),
         arguments=body.get("arguments"),
         method=body.get("method"),
     )
+
+
+def method_request(body, ctx, store:ScoringStore):
+    """Запрос к API."""
+
+    response, code = None, None
+
+    # Парсинг запроса с валидацией
+    with VALIDATION_LATENCY.time(request="method"):
+        method_req = parse_method(body)
     # Аутентификация
     if not check_auth(method_req):
         code = FORBIDDEN
@@ -362,6 +552,10 @@ def method_request(body, ctx, store:ScoringStore):
     elif method_req.method == "online_score":
         response, code = online_score_request(request=method_req, ctx=ctx,
                                               store=store)
+    # Пакетный запрос скоринга
+    elif method_req.method == "online_score_batch":
+        response, code = online_score_batch_request(request=method_req, ctx=ctx,
+                                                    store=store)
     # Запрос увлечений
     elif method_req.method == "clients_interests":
         response, code = clients_interest_request(request=method_req, ctx=ctx,
@@ -374,13 +568,18 @@ def method_request(body, ctx, store:ScoringStore):
     return response, code
 
 
+def is_empty_request(request) -> bool:
+    """Проверка на пустое тело запроса."""
+    return len(request) == 0 or len(request.get("body")) == 0
+
+
 def method_handler(request, ctx, store:ScoringStore):
     """Обработчик обращения к API."""
 
     response, code = None, None
 
     # Ошибка - пустое тело запроса
-    if len(request) == 0 or len(request.get("body")) == 0:
+    if is_empty_request(request):
         code = INVALID_REQUEST
         response = {"error": "Empty request"}
     else:
@@ -394,31 +593,156 @@ def method_handler(request, ctx, store:ScoringStore):
     return response, code
 
 
-class MainHTTPHandler(BaseHTTPRequestHandler):
+def make_envelope(response, code) -> dict:
+    """Формирование тела ответа API."""
+    if code not in ERRORS:
+        return {"response": response, "code": code}
+    return {
+        "error": response or ERRORS.get(code, "Unknown Error"),
+        "code": code,
+    }
+
+
+class MainHTTPHandler(PersistentHTTPRequestHandler):
     router = {"method": method_handler}
 
+    # Постоянные соединения HTTP/1.1: ответ всегда содержит Content-Length,
+    # простаивающее соединение закрывается через idle_timeout секунд,
+    # после max_requests запросов сервер закрывает соединение.
+    # timeout - ожидание данных при чтении начатого запроса
+    protocol_version = "HTTP/1.1"
+    timeout = READ_TIMEOUT
+    idle_timeout = KEEP_ALIVE_TIMEOUT
+    max_requests = KEEP_ALIVE_MAX_REQUESTS
+    disable_nagle_algorithm = True
+    # Серверный срок обработки запроса, с; клиент может сократить его
+    # заголовком X-Request-Timeout
+    request_timeout = REQUEST_TIMEOUT
+    # Доля журналируемых успешных запросов; ошибки журналируются всегда.
+    # Тело запроса обрезается до log_body_limit байт, 0 - не журналируется
+    log_sample_rate = LOG_SAMPLE_RATE
+    log_body_limit = LOG_BODY_LIMIT
+    # Наибольший размер тела запроса, байт
+    max_body_size = MAX_BODY_SIZE
 
     def __init__(self,*args,**kwargs):
+        # Запрос обрабатывается внутри инициализатора базового класса,
+        # поэтому хранилище должно быть получено до его вызова.
+        # Хранилище с пулом соединений общее для всех потоков процесса
+        self.store = get_store()
+        self.requests_served = 0
         super().__init__(*args,**kwargs)
-        self.store = ScoringStore()
+
+    def log_request(self, code="-", size="-"):
+        # Запросы к API журналирует модульная log_request через очередь
+        # с выборкой; синхронная строка доступа на каждый ответ не пишется
+        pass
+
+    def log_message(self, format, *args):
+        # Ошибки протокола (log_error) пишутся через logging и его очередь
+        logging.warning("%s %s" % (self.address_string(), format % args))
 
     @staticmethod
-    def get_request_id(self, headers):
+    def get_request_id(headers):
         return headers.get("HTTP_X_REQUEST_ID", uuid.uuid4().hex)
 
+    def send_stream(self, batches: Iterator):
+        """Потоковый ответ в кодировке chunked.
+
+        Порции словаря response пишутся по мере получения; итоговый
+        JSON совпадает с обычным ответом. Ошибка после отправки
+        заголовков обрывает ответ без завершающей порции."""
+        self.requests_served += 1
+        self.send_response(OK)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Transfer-Encoding", "chunked")
+        if self.close_connection or self.requests_served >= self.max_requests:
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.write_chunk(b'{"response":{')
+        separator = b""
+        try:
+            for batch in batches:
+                if batch:
+                    self.write_chunk(separator + codec.dumps(batch)[1:-1])
+                    separator = b","
+        except Exception as e:
+            logging.exception("Streaming failed: %s" % e)
+            self.close_connection = True
+            return
+        self.write_chunk(b'},"code":%d}' % OK)
+        self.wfile.write(b"0\r\n\r\n")
+
+    def write_chunk(self, data: bytes):
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+
+    def send_body(self, code, body: bytes, content_type="application/json"):
+        """Отправка ответа с заголовками keep-alive."""
+        self.requests_served += 1
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if self.close_connection or self.requests_served >= self.max_requests:
+            # Заголовок также выставляет close_connection
+            self.send_header("Connection", "close")
+        elif self.request_version == "HTTP/1.0":
+            self.send_header("Connection", "keep-alive")
+        self.end_headers()
+        self.wfile.write(body)
+
+    @staticmethod
+    def method_label(request) -> str:
+        """Метка API-метода для метрик (с ограниченным набором значений)."""
+        if isinstance(request, dict) and isinstance(request.get("method"), str):
+            return request["method"] if request["method"] in METHODS else "other"
+        return "none"
+
+    def do_GET(self):
+        if self.path.strip("/") == "metrics":
+            self.send_body(OK, metrics.REGISTRY.render().encode("utf-8"),
+                           content_type=metrics.CONTENT_TYPE)
+        else:
+            self.send_body(NOT_FOUND, codec.dumps(make_envelope(None, NOT_FOUND)))
+
     def do_POST(self):
+        started = time.perf_counter()
+        with REQUESTS_IN_FLIGHT.track_inprogress():
+            code, method = self.handle_post()
+        REQUEST_LATENCY.observe(time.perf_counter() - started,
+                                method=method, code=code)
+
+    def handle_post(self):
         response, code = {}, OK
-        context = {"request_id": self.get_request_id(self.headers)}
+        context = {
+            "request_id": self.get_request_id(self.headers),
+            "deadline": Deadline.from_headers(self.headers, self.request_timeout),
+            # Кодировка chunked есть только в HTTP/1.1
+            "stream": (self.request_version == "HTTP/1.1"
+                       and self.headers.get(STREAM_HEADER, "").lower()
+                       in ("1", "true", "yes")),
+        }
         request = None
         try:
-            data_string = self.rfile.read(int(self.headers["Content-Length"]))
-            request = json.loads(data_string)
-        except BaseException:
-            code = BAD_REQUEST
+            data_string = read_body(self.rfile, self.headers, self.max_body_size)
+        except BodyTooLarge:
+            # Тело не прочитано - соединение дальше использовать нельзя
+            data_string, code = b"", PAYLOAD_TOO_LARGE
+            self.close_connection = True
+        except BadBody:
+            data_string, code = b"", BAD_REQUEST
+            self.close_connection = True
+        if data_string is None:
+            # Без длины тела граница следующего запроса неизвестна
+            data_string = b""
+            self.close_connection = True
+        if code == OK:
+            try:
+                request = codec.loads(data_string)
+            except BaseException:
+                code = BAD_REQUEST
 
         if request:
             path = self.path.strip("/")
-            logging.info("%s: %s %s" % (self.path, data_string, context["request_id"]))
             if path in self.router:
                 try:
                     response, code = self.router[path](
@@ -432,29 +756,131 @@ class MainHTTPHandler(BaseHTTPRequestHandler):
             else:
                 code = NOT_FOUND
 
-        self.send_response(code)
-        self.send_header("Content-Type", "application/json")
-        self.end_headers()
-        if code not in ERRORS:
-            r = {"response": response, "code": code}
-        else:
-            r = {
-                "error": response or ERRORS.get(code, "Unknown Error"),
-                "code": code,
-            }
+        if isinstance(response, Iterator):
+            self.send_stream(response)
+            context["code"] = code
+            log_request(self.path, code, data_string, context,
+                        self.log_sample_rate, self.log_body_limit)
+            return code, self.method_label(request)
+
+        r = make_envelope(response, code)
         context.update(r)
-        logging.info(context)
-        self.wfile.write(json.dumps(r).encode("utf-8"))
+        log_request(self.path, code, data_string, context,
+                    self.log_sample_rate, self.log_body_limit)
+        self.send_body(code, codec.dumps(r))
+        return code, self.method_label(request)
+
+
+def log_request(path, code, data_string: bytes, context: dict,
+                sample_rate: float = LOG_SAMPLE_RATE,
+                body_limit: int = LOG_BODY_LIMIT):
+    """Журналирование запроса одной записью.
+
+    Успешные запросы журналируются с долей sample_rate, ошибки - всегда.
+    Сообщение форматируется в потоке записи журнала."""
+    context.pop("deadline", None)
+    if code == OK and random.random() >= sample_rate:
+        logs.LOG_RECORDS.inc(result="sampled_out")
+        return
+    level = logging.INFO if code == OK else logging.WARNING
+    if body_limit <= 0:
+        logging.log(level, "%s: %s", path, context)
         return
+    body = data_string[:body_limit]
+    truncated = "..." if len(data_string) > body_limit else ""
+    logging.log(level, "%s: %s%s %s", path, body, truncated, context)
+
+
+queue_logging = logs.QueueLogging()
+
+
+def start_worker():
+    """Подготовка процесса-обработчика к обслуживанию запросов."""
+    queue_logging.start()
+    warm_up_store()
+
+
+def stop_worker():
+    """Завершение процесса-обработчика."""
+    close_store()
+    queue_logging.stop()
+
+
+def warm_up_store():
+    """Прогрев пула соединений общего хранилища процесса."""
+    try:
+        get_store().warm_up()
+    except Exception as e:
+        logging.warning("Store warm up failed: %s" % e)
+
+
+def close_store():
+    """Закрытие общего хранилища с записью отложенных данных."""
+    get_store().close()
 
 
 if __name__ == "__main__":
-    # k = ClientsInterestsRequest(client_ids="4",date="2025-03-09")
-    # k.client_ids = "5"
-    # print(k.__dict__)
     parser = ArgumentParser()
     parser.add_argument("-p", "--port", action="store", type=int, default=8080)
     parser.add_argument("-l", "--log", action="store", default=None)
+    parser.add_argument("--host", action="store", default="localhost")
+    parser.add_argument(
+        "-w", "--workers", action="store", type=int, default=1,
+        help="количество процессов-обработчиков",
+    )
+    parser.add_argument(
+        "-t", "--threads", action="store", type=int, default=16,
+        help="размер пула потоков в каждом процессе",
+    )
+    parser.add_argument(
+        "--max-concurrency", action="store", type=int, default=None,
+        help="лимит одновременно обрабатываемых соединений на процесс",
+    )
+    parser.add_argument(
+        "--backlog", action="store", type=int, default=128,
+        help="размер очереди listen-сокета",
+    )
+    parser.add_argument(
+        "--keep-alive-timeout", action="store", type=float,
+        default=KEEP_ALIVE_TIMEOUT,
+        help="время простоя постоянного соединения, с",
+    )
+    parser.add_argument(
+        "--read-timeout", action="store", type=float, default=READ_TIMEOUT,
+        help="ожидание данных при чтении запроса, с",
+    )
+    parser.add_argument(
+        "--max-requests", action="store", type=int,
+        default=KEEP_ALIVE_MAX_REQUESTS,
+        help="лимит запросов в одном соединении",
+    )
+    parser.add_argument(
+        "--request-timeout", action="store", type=float,
+        default=REQUEST_TIMEOUT,
+        help="срок обработки запроса, с",
+    )
+    parser.add_argument(
+        "--log-sample-rate", action="store", type=float,
+        default=LOG_SAMPLE_RATE,
+        help="доля журналируемых успешных запросов (0..1)",
+    )
+    parser.add_argument(
+        "--log-body-limit", action="store", type=int, default=LOG_BODY_LIMIT,
+        help="сколько байт тела запроса журналировать, 0 - не журналировать",
+    )
+    parser.add_argument(
+        "--log-queue-size", action="store", type=int,
+        default=logs.LOG_QUEUE_SIZE,
+        help="размер очереди записей журнала",
+    )
+    parser.add_argument(
+        "--max-body-size", action="store", type=int, default=MAX_BODY_SIZE,
+        help="наибольший размер тела запроса, байт",
+    )
+    parser.add_argument(
+        "--async", dest="use_async", action="store_true",
+        help="асинхронный сервер на asyncio",
+    )
     args = parser.parse_args()
     logging.basicConfig(
         filename=args.log,
@@ -462,10 +888,35 @@ if __name__ == "__main__":
         format="[%(asctime)s] %(levelname).1s %(message)s",
         datefmt="%Y.%m.%d %H:%M:%S",
     )
-    server = HTTPServer(("localhost", args.port), MainHTTPHandler)
-    logging.info("Starting server at %s" % args.port)
-    try:
-        server.serve_forever()
-    except KeyboardInterrupt:
-        pass
-    server.server_close()
+    MainHTTPHandler.timeout = args.read_timeout
+    MainHTTPHandler.idle_timeout = args.keep_alive_timeout
+    MainHTTPHandler.max_requests = args.max_requests
+    MainHTTPHandler.request_timeout = args.request_timeout
+    MainHTTPHandler.log_sample_rate = args.log_sample_rate
+    MainHTTPHandler.log_body_limit = args.log_body_limit
+    MainHTTPHandler.max_body_size = args.max_body_size
+    queue_logging.queue_size = args.log_queue_size
+    if args.use_async:
+        from src.otus_hw5.aio import AsyncHTTPServer
+        from src.otus_hw5.aio import serve as serve_async
+
+        AsyncHTTPServer.log_sample_rate = args.log_sample_rate
+        AsyncHTTPServer.log_body_limit = args.log_body_limit
+        AsyncHTTPServer.max_body_size = args.max_body_size
+        queue_logging.start()
+        try:
+            serve_async(host=args.host, port=args.port, backlog=args.backlog)
+        finally:
+            queue_logging.stop()
+    else:
+        serve(
+            MainHTTPHandler,
+            host=args.host,
+            port=args.port,
+            workers=args.workers,
+            threads=args.threads,
+            max_concurrency=args.max_concurrency,
+            backlog=args.backlog,
+            initializer=start_worker,
+            finalizer=stop_worker,
+        )
@@ -0,0 +1,113 @@
+"""Пакетная обработка запросов к API из JSONL-файла.
+
+Каждая строка входного файла - тело запроса к /method, каждая строка
+результата - ответ API в том же формате, что и у HTTP-сервера, в
+порядке строк входного файла:
+
+    python -m src.otus_hw5.batch -i requests.jsonl -o results.jsonl -w 4
+
+Запросы обрабатываются пулом процессов, у каждого процесса свое
+хранилище. Одновременно в обработке не больше window порций по
+chunk_size строк на процесс, поэтому память не зависит от размера
+файла."""
+
+import collections
+import multiprocessing
+import os
+from argparse import ArgumentParser
+from multiprocessing.util import Finalize
+from typing import Callable, Iterable, Iterator, List
+
+import src.otus_hw5.api as api
+import src.otus_hw5.codec as codec
+from src.otus_hw5.store import ScoringStore
+from src.otus_hw5.transfer import batches
+
+CHUNK_SIZE = 100
+WINDOW = 4
+
+# Хранилище процесса-обработчика
+_store: ScoringStore | None = None
+
+
+def init_worker(store_factory: Callable[[], ScoringStore]) -> None:
+    """Создание хранилища в процессе пула."""
+    global _store
+    _store = store_factory()
+    # Отложенные записи сбрасываются при штатном завершении процесса
+    Finalize(_store, _store.close, exitpriority=10)
+
+
+def process_line(line: str, store: ScoringStore) -> str:
+    """Ответ API на одну строку входного файла."""
+    try:
+        body = codec.loads(line)
+    except Exception:
+        return codec.dumps_text(api.make_envelope(None, api.BAD_REQUEST))
+    try:
+        response, code = api.method_handler({"body": body, "headers": {}}, {}, store)
+    except Exception as e:
+        response, code = str(e), api.INTERNAL_ERROR
+    return codec.dumps_text(api.make_envelope(response, code))
+
+
+def process_chunk(lines: List[str]) -> List[str]:
+    return [process_line(line, _store) for line in lines]
+
+
+def process_stream(lines: Iterable[str], workers: int = 1,
+                   chunk_size: int = CHUNK_SIZE, window: int = WINDOW,
+                   store_factory: Callable[[], ScoringStore] = ScoringStore
+                   ) -> Iterator[str]:
+    """Ответы на строки lines в исходном порядке.
+
+    Пустые строки пропускаются. window - число порций в обработке
+    на каждый процесс."""
+    lines = (line for line in lines if line.strip())
+    if workers <= 1:
+        store = store_factory()
+        try:
+            for line in lines:
+                yield process_line(line, store)
+        finally:
+            store.close()
+        return
+
+    pool = multiprocessing.Pool(workers, initializer=init_worker,
+                                initargs=(store_factory,))
+    try:
+        pending = collections.deque()
+        for chunk in batches(lines, chunk_size):
+            pending.append(pool.apply_async(process_chunk, (chunk,)))
+            if len(pending) >= window * workers:
+                yield from pending.popleft().get()
+        while pending:
+            yield from pending.popleft().get()
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+
+
+if __name__ == "__main__":
+    from src.otus_hw5.transfer import open_stream
+
+    parser = ArgumentParser(description="Пакетная обработка запросов к API")
+    parser.add_argument("-i", "--input", default="-", help="файл запросов JSONL")
+    parser.add_argument("-o", "--output", default="-", help="файл ответов JSONL")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1,
+                        help="количество процессов")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE,
+                        help="строк в одной порции")
+    parser.add_argument("--window", type=int, default=WINDOW,
+                        help="порций в обработке на процесс")
+    args = parser.parse_args()
+
+    with open_stream(args.input, "r") as lines, \
+            open_stream(args.output, "w") as output:
+        for result in process_stream(lines, workers=args.workers,
+                                     chunk_size=args.chunk_size,
+                                     window=args.window):
+            output.write(result + "\n")
@@ -0,0 +1,110 @@
+"""Чтение тела HTTP-запроса с ограничением размера.
+
+Поддерживаются Content-Length и Transfer-Encoding: chunked. Тело
+больше limit байт не читается: при известной длине запрос отклоняется
+до чтения, при chunked - как только сумма порций превысит лимит."""
+
+MAX_BODY_SIZE = 4 * 1024 * 1024
+# Длина строки с размером порции или заголовка трейлера
+MAX_LINE = 8192
+
+
+class BodyTooLarge(Exception):
+    """Тело запроса больше допустимого."""
+
+
+class BadBody(Exception):
+    """Некорректная длина или кодирование тела запроса."""
+
+
+def is_chunked(headers) -> bool:
+    value = headers.get("Transfer-Encoding") or headers.get("transfer-encoding")
+    return value is not None and value.lower().rsplit(",", 1)[-1].strip() == "chunked"
+
+
+def content_length(headers, limit: int) -> int | None:
+    """Длина тела из заголовка (None - заголовка нет)."""
+    value = headers.get("Content-Length") or headers.get("content-length")
+    if value is None:
+        return None
+    try:
+        length = int(value)
+    except ValueError:
+        raise BadBody("Invalid Content-Length")
+    if length < 0:
+        raise BadBody("Invalid Content-Length")
+    if length > limit:
+        raise BodyTooLarge("Body of %s bytes exceeds %s" % (length, limit))
+    return length
+
+
+def chunk_size(line: bytes) -> int:
+    if not line.endswith(b"\n") or len(line) > MAX_LINE:
+        raise BadBody("Invalid chunk size line")
+    try:
+        # Расширения порции после ";" игнорируются
+        size = int(line.split(b";", 1)[0].strip(), 16)
+    except ValueError:
+        raise BadBody("Invalid chunk size")
+    if size < 0:
+        raise BadBody("Invalid chunk size")
+    return size
+
+
+def read_chunked(rfile, limit: int) -> bytes:
+    """Чтение тела в кодировке chunked из файлового объекта."""
+    parts, total = [], 0
+    while True:
+        size = chunk_size(rfile.readline(MAX_LINE + 1))
+        if size == 0:
+            break
+        total += size
+        if total > limit:
+            raise BodyTooLarge("Chunked body exceeds %s" % limit)
+        data = rfile.read(size)
+        if len(data) != size or rfile.readline(MAX_LINE + 1) not in (b"\r\n", b"\n"):
+            raise BadBody("Truncated chunk")
+        parts.append(data)
+    # Трейлеры до пустой строки
+    while rfile.readline(MAX_LINE + 1) not in (b"\r\n", b"\n", b""):
+        pass
+    return b"".join(parts)
+
+
+def read_body(rfile, headers, limit: int = MAX_BODY_SIZE) -> bytes | None:
+    """Тело запроса; None - длина тела неизвестна."""
+    if is_chunked(headers):
+        return read_chunked(rfile, limit)
+    length = content_length(headers, limit)
+    if length is None:
+        return None
+    data = rfile.read(length)
+    if len(data) != length:
+        raise BadBody("Truncated body")
+    return data
+
+
+async def aread_chunked(reader, limit: int) -> bytes:
+    """read_chunked для asyncio.StreamReader."""
+    parts, total = [], 0
+    while True:
+        size = chunk_size(await reader.readline())
+        if size == 0:
+            break
+        total += size
+        if total > limit:
+            raise BodyTooLarge("Chunked body exceeds %s" % limit)
+        parts.append(await reader.readexactly(size))
+        if await reader.readline() not in (b"\r\n", b"\n"):
+            raise BadBody("Truncated chunk")
+    while await reader.readline() not in (b"\r\n", b"\n", b""):
+        pass
+    return b"".join(parts)
+
+
+async def aread_body(reader, headers, limit: int = MAX_BODY_SIZE) -> bytes:
+    """read_body для asyncio.StreamReader; без длины тело пустое."""
+    if is_chunked(headers):
+        return await aread_chunked(reader, limit)
+    length = content_length(headers, limit)
+    return await reader.readexactly(length) if length else b""
@@ -0,0 +1,63 @@
+"""Предохранитель (circuit breaker) для обращений к внешним сервисам"""
+
+import threading
+import time
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+STATES = {CLOSED: 0, OPEN: 1, HALF_OPEN: 2}
+
+
+class CircuitBreaker:
+    """Предохранитель с тремя состояниями.
+
+    closed - вызовы разрешены, считаются подряд идущие ошибки; после
+    failure_threshold ошибок предохранитель размыкается (open) и
+    вызовы сразу отклоняются. Через reset_timeout секунд он переходит
+    в half_open и пропускает одну пробную операцию: успех замыкает
+    предохранитель, ошибка снова размыкает."""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 5.0,
+                 clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.rejected = 0
+        self.lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Можно ли выполнить операцию."""
+        with self.lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                if self.clock() - self.opened_at < self.reset_timeout:
+                    self.rejected += 1
+                    return False
+                self.state = HALF_OPEN
+                self.probing = False
+            # half_open: одновременно допускается одна пробная операция
+            if self.probing:
+                self.rejected += 1
+                return False
+            self.probing = True
+            return True
+
+    def record_success(self) -> None:
+        with self.lock:
+            self.state = CLOSED
+            self.failures = 0
+            self.probing = False
+
+    def record_failure(self) -> None:
+        with self.lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = OPEN
+                self.opened_at = self.clock()
+                self.probing = False
@@ -0,0 +1,133 @@
+"""Компактная раскладка кэша скоринга в Redis.
+
+Вместо отдельного ключа на каждое значение записи группируются в хеши
+(корзины): корзина и поле определяются двоичным дайджестом ключа, а
+значение хранится вместе с моментом истечения срока в 8 байтах. Если
+в корзине не больше hash-max-listpack-entries полей (по умолчанию 128),
+Redis хранит ее в компактной кодировке listpack, и накладные расходы
+на запись в несколько раз меньше, чем у отдельного ключа.
+
+Срок жизни проверяется при чтении по встроенному моменту истечения;
+сама корзина получает EXPIRE при каждой записи, поэтому заброшенные
+корзины удаляются Redis. Истекшие поля используемых корзин удаляются:
+на Redis 7.4+ (field_ttl) - самим Redis по HEXPIRE, иначе HDEL при
+чтении и выборочной чисткой корзин при записи (sweep_rate).
+
+Раскладка хранит только числа (значения скоринга) с точностью float32;
+прочие значения не записываются, и чтение дает промах."""
+
+import hashlib
+import random
+import struct
+import time
+from typing import List
+
+BUCKET_BITS = 16
+BUCKET_PREFIX = b"s:"
+# Поле - часть дайджеста после номера корзины
+FIELD_BYTES = 8
+# Значение и момент истечения (unix-время, 0 - без ограничения)
+VALUE = struct.Struct("!fI")
+# Доля записей в корзину, после которых она очищается от истекших полей
+SWEEP_RATE = 0.01
+
+
+class BucketLayout:
+    """Размещение записей кэша по корзинам."""
+
+    def __init__(self, bits: int = BUCKET_BITS, prefix: bytes = BUCKET_PREFIX,
+                 field_ttl: bool = False, sweep_rate: float = SWEEP_RATE,
+                 clock=time.time, random=random.random):
+        if not 0 < bits <= 32:
+            raise ValueError("Bucket bits must be in 1..32")
+        self.bits = bits
+        self.prefix = prefix
+        self.field_ttl = field_ttl
+        self.sweep_rate = sweep_rate
+        self.clock = clock
+        self.random = random
+        self.size = (bits + 7) // 8
+
+    def locate(self, key: str) -> tuple:
+        """Ключ корзины и поле для ключа кэша."""
+        digest = hashlib.md5(key.encode("utf-8")).digest()
+        bucket = int.from_bytes(digest[:4], "big") >> (32 - self.bits)
+        return (self.prefix + bucket.to_bytes(self.size, "big"),
+                digest[4:4 + FIELD_BYTES])
+
+    def pack(self, value, period: int | None) -> bytes:
+        expires = int(self.clock()) + period if period else 0
+        return VALUE.pack(float(value), expires)
+
+    def unpack(self, data: bytes | None) -> float | None:
+        if data is None or self.expired(data):
+            return None
+        return VALUE.unpack(data)[0]
+
+    def expired(self, data: bytes) -> bool:
+        expires = VALUE.unpack(data)[1]
+        return bool(expires) and expires <= self.clock()
+
+    def get_many(self, redis, keys: List) -> List[float | None]:
+        """Чтение значений одним пакетом HGET.
+
+        Найденные истекшие поля удаляются следующим пакетом HDEL."""
+        pipe = redis.pipeline(transaction=False)
+        locations = [self.locate(key) for key in keys]
+        for bucket, field in locations:
+            pipe.hget(bucket, field)
+        values = pipe.execute()
+        expired = 0
+        for (bucket, field), data in zip(locations, values):
+            if data is not None and self.expired(data):
+                pipe.hdel(bucket, field)
+                expired += 1
+        if expired:
+            pipe.execute()
+        return [self.unpack(data) for data in values]
+
+    def set_batch(self, redis, items: List) -> None:
+        """Запись списка (key, value, period) одним пакетом.
+
+        Срок жизни корзины продлевается на самый долгий срок записанных
+        в нее значений. Корзина истекает вместе со значениями без срока -
+        для кэша это лишь промах. Значения, не являющиеся числами,
+        пропускаются."""
+        pipe = redis.pipeline(transaction=False)
+        expires = {}
+        for key, value, period in items:
+            try:
+                data = self.pack(value, period)
+            except (TypeError, ValueError):
+                continue
+            bucket, field = self.locate(key)
+            pipe.hset(bucket, field, data)
+            if self.field_ttl and period:
+                pipe.hexpire(bucket, period, field)
+            expires[bucket] = max(expires.get(bucket, 0), period or 0)
+        for bucket, period in expires.items():
+            if period:
+                pipe.expire(bucket, period)
+        if not expires:
+            return
+        pipe.execute()
+        if not self.field_ttl:
+            self.sweep(redis, [bucket for bucket in expires
+                               if self.random() < self.sweep_rate])
+
+    def sweep(self, redis, buckets: List) -> int:
+        """Удаление истекших полей корзин; число удаленных полей."""
+        if not buckets:
+            return 0
+        pipe = redis.pipeline(transaction=False)
+        for bucket in buckets:
+            pipe.hgetall(bucket)
+        expired = 0
+        for bucket, fields in zip(buckets, pipe.execute()):
+            stale = [field for field, data in fields.items() if self.expired(data)]
+            if stale:
+                pipe.hdel(bucket, *stale)
+                expired += len(stale)
+        if expired:
+            pipe.execute()
+        return expired
@@ -0,0 +1,85 @@
+"""Локальный кэш в памяти процесса"""
+
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable
+
+
+class TTLCache:
+    """Потокобезопасный LRU-кэш с ограниченным сроком жизни записей.
+
+    Размер ограничен количеством записей max_entries и приблизительным
+    объемом памяти max_bytes (по sys.getsizeof ключа и значения).
+    При превышении любого из лимитов вытесняются давно не
+    использовавшиеся записи."""
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 60.0,
+                 max_bytes: int | None = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.data: OrderedDict = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "expired": 0}
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    @staticmethod
+    def sizeof(key, value) -> int:
+        return sys.getsizeof(key) + sys.getsizeof(value)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self.lock:
+            item = self.data.get(key)
+            if item is None:
+                self.stats["misses"] += 1
+                return default
+            value, expires, size = item
+            if expires <= time.monotonic():
+                del self.data[key]
+                self.size -= size
+                self.stats["expired"] += 1
+                self.stats["misses"] += 1
+                return default
+            self.data.move_to_end(key)
+            self.stats["hits"] += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None) -> None:
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0 or self.max_entries <= 0:
+            return
+        size = self.sizeof(key, value)
+        with self.lock:
+            old = self.data.pop(key, None)
+            if old is not None:
+                self.size -= old[2]
+            self.data[key] = (value, time.monotonic() + ttl, size)
+            self.size += size
+            while len(self.data) > self.max_entries or (
+                self.max_bytes is not None and self.size > self.max_bytes
+                and len(self.data) > 1
+            ):
+                _, (_, _, evicted) = self.data.popitem(last=False)
+                self.size -= evicted
+                self.stats["evictions"] += 1
+
+    def delete(self, key: Hashable) -> None:
+        with self.lock:
+            item = self.data.pop(key, None)
+            if item is not None:
+                self.size -= item[2]
+
+    def clear(self) -> None:
+        with self.lock:
+            self.data.clear()
+            self.size = 0
+
+    def info(self) -> Dict[str, int]:
+        """Счетчики кэша и текущий размер."""
+        with self.lock:
+            return dict(self.stats, entries=len(self.data), bytes=self.size)
@@ -0,0 +1,38 @@
+"""Кодирование JSON.
+
+Используется orjson, если он установлен (poetry install -E fast),
+иначе - стандартный модуль json. Результат dumps всегда bytes в UTF-8,
+поэтому его можно сразу писать в сокет без дополнительного encode."""
+
+import json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - зависит от окружения
+    orjson = None
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+
+if orjson is not None:
+
+    def loads(data: bytes | str):
+        return orjson.loads(data)
+
+    def dumps(obj) -> bytes:
+        # Нестроковые ключи (id клиентов) и произвольные объекты
+        # (например, исключения в ответе) приводятся к строкам
+        return orjson.dumps(obj, default=str, option=orjson.OPT_NON_STR_KEYS)
+
+else:
+
+    def loads(data: bytes | str):
+        return json.loads(data)
+
+    def dumps(obj) -> bytes:
+        return json.dumps(obj, default=str).encode("utf-8")
+
+
+def dumps_text(obj) -> str:
+    """Кодирование в строку (для значений, хранимых в Redis)."""
+    return dumps(obj).decode("utf-8")
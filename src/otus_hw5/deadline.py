@@ -0,0 +1,53 @@
+"""Крайний срок обработки запроса"""
+
+import time
+
+# Заголовок с бюджетом времени на запрос, секунды
+DEADLINE_HEADER = "X-Request-Timeout"
+
+
+class DeadlineExceeded(Exception):
+    """Бюджет времени на запрос исчерпан."""
+
+
+class Deadline:
+    """Момент, после которого обращения к хранилищу прекращаются."""
+
+    def __init__(self, timeout: float, clock=time.monotonic):
+        self.clock = clock
+        self.timeout = timeout
+        self.expires = clock() + timeout
+
+    def __repr__(self):
+        return "Deadline(timeout=%s, remaining=%.3f)" % (self.timeout,
+                                                         self.remaining())
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires - self.clock())
+
+    def expired(self) -> bool:
+        return self.clock() >= self.expires
+
+    def check(self) -> None:
+        if self.expired():
+            raise DeadlineExceeded("Request deadline of %ss exceeded"
+                                   % self.timeout)
+
+    @classmethod
+    def from_headers(cls, headers, default: float | None) -> "Deadline | None":
+        """Срок из заголовка запроса или серверный по умолчанию.
+
+        Заголовок может только сократить серверный срок."""
+        timeout = default
+        try:
+            requested = float(headers.get(DEADLINE_HEADER))
+        except (TypeError, ValueError):
+            requested = None
+        if requested is not None and requested > 0:
+            timeout = requested if timeout is None else min(timeout, requested)
+        return None if timeout is None else cls(timeout)
+
+
+def check_deadline(deadline: Deadline | None) -> None:
+    if deadline is not None:
+        deadline.check()
@@ -0,0 +1,117 @@
+"""Компактное хранение интересов клиентов.
+
+Интересы хранятся целым числом: старшие биты - версия словаря,
+младшие 16 бит - маска интересов из этого словаря. Redis хранит такие
+значения как целые числа, а декодирование сводится к выборке из
+заранее построенной таблицы. Значения старого формата (JSON-список)
+читаются прозрачно; перевести их в новый формат можно командой
+
+    python -m src.otus_hw5.interests migrate
+"""
+
+import sys
+from argparse import ArgumentParser
+from typing import Dict, List, Tuple
+
+import src.otus_hw5.codec as codec
+
+# Словари интересов по версиям. Существующую версию менять нельзя:
+# новый набор интересов добавляется следующей версией
+VOCABULARIES: Dict[int, Tuple[str, ...]] = {
+    1: ("cars", "pets", "travel", "hi-tech", "sport", "music", "books", "tv",
+        "cinema", "geek", "otus"),
+}
+VERSION = 1
+MASK_BITS = 16
+MASK = (1 << MASK_BITS) - 1
+
+MIGRATE_MATCH = "i:*"
+MIGRATE_BATCH_SIZE = 1000
+
+
+def build_table(words: Tuple[str, ...]) -> List[Tuple[str, ...]]:
+    """Интересы для каждого значения маски."""
+    return [tuple(word for i, word in enumerate(words) if mask >> i & 1)
+            for mask in range(1 << len(words))]
+
+
+TABLES = {version: build_table(words) for version, words in VOCABULARIES.items()}
+INDEXES = {version: {word: i for i, word in enumerate(words)}
+           for version, words in VOCABULARIES.items()}
+
+
+def encode(interests: List[str], version: int = VERSION) -> int:
+    index = INDEXES[version]
+    mask = 0
+    for interest in interests:
+        mask |= 1 << index[interest]
+    return version << MASK_BITS | mask
+
+
+def is_legacy(value: str | bytes) -> bool:
+    return value[:1] in ("[", b"[")
+
+
+def decode(value: str | bytes) -> List[str]:
+    """Интересы из хранимого значения любого формата."""
+    if is_legacy(value):
+        return codec.loads(value)
+    packed = int(value)
+    table = TABLES.get(packed >> MASK_BITS)
+    if table is None:
+        raise ValueError("Unknown interests vocabulary version %s"
+                         % (packed >> MASK_BITS))
+    return list(table[packed & MASK])
+
+
+def migrate(redis, match: str = MIGRATE_MATCH,
+            batch_size: int = MIGRATE_BATCH_SIZE) -> Dict[str, int]:
+    """Перевод значений старого формата в новый без остановки сервиса.
+
+    Ключи перебираются SCAN, значения читаются MGET порциями по
+    batch_size и перезаписываются пакетом с сохранением срока жизни
+    (SET KEEPTTL XX: ключ, истекший после чтения, не создается заново
+    без срока жизни)."""
+    stats = {"scanned": 0, "migrated": 0}
+    batch = []
+
+    def flush():
+        values = redis.mget(batch)
+        pipe = redis.pipeline(transaction=False)
+        legacy = 0
+        for key, value in zip(batch, values):
+            if value is not None and is_legacy(value):
+                pipe.set(key, encode(codec.loads(value)), keepttl=True, xx=True)
+                legacy += 1
+        if legacy:
+            stats["migrated"] += sum(1 for result in pipe.execute() if result)
+        stats["scanned"] += len(batch)
+        batch.clear()
+
+    for key in redis.scan_iter(match=match, count=batch_size):
+        batch.append(key)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    return stats
+
+
+if __name__ == "__main__":
+    from src.otus_hw5.store import REMOTE_DB, ScoringStore
+
+    parser = ArgumentParser(description="Перевод интересов в компактный формат")
+    parser.add_argument("command", choices=("migrate",))
+    parser.add_argument("--env", action="store", default=".env")
+    parser.add_argument("--match", action="store", default=MIGRATE_MATCH)
+    parser.add_argument("--batch-size", action="store", type=int,
+                        default=MIGRATE_BATCH_SIZE)
+    args = parser.parse_args()
+    store = ScoringStore(args.env)
+    try:
+        store.warm_up(1)
+        result = migrate(store.connections[REMOTE_DB], match=args.match,
+                         batch_size=args.batch_size)
+    finally:
+        store.close()
+    sys.stdout.write("scanned: %(scanned)s, migrated: %(migrated)s\n" % result)
@@ -0,0 +1,74 @@
+"""Асинхронная запись журнала.
+
+Обработчики запросов только кладут записи в ограниченную очередь,
+форматирование и запись в файл выполняет фоновый поток. При
+переполнении очереди записи отбрасываются и учитываются в метрике,
+чтобы медленный диск не задерживал ответы."""
+
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+import src.otus_hw5.metrics as metrics
+
+LOG_QUEUE_SIZE = 10000
+
+LOG_RECORDS = metrics.counter(
+    "log_records_total",
+    "Log records not written by result (dropped, sampled_out)",
+    ("result",),
+)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """Обработчик, не блокирующий поток при заполненной очереди."""
+
+    def prepare(self, record):
+        # Записи не покидают процесс, поэтому форматирование сообщения
+        # откладывается до фонового потока
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS.inc(result="dropped")
+
+
+class BlockingStopListener(QueueListener):
+    """Слушатель, дожидающийся места в очереди для признака остановки."""
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+
+class QueueLogging:
+    """Перенос обработчиков корневого логгера в фоновый поток.
+
+    start() вызывается в каждом процессе после fork: поток записи
+    не наследуется дочерними процессами."""
+
+    def __init__(self, queue_size: int = LOG_QUEUE_SIZE,
+                 logger: logging.Logger | None = None):
+        self.queue_size = queue_size
+        self.logger = logger or logging.getLogger()
+        self.handlers = []
+        self.listener = None
+
+    def start(self) -> None:
+        if self.listener is not None:
+            return
+        self.handlers = list(self.logger.handlers)
+        records = queue.Queue(self.queue_size)
+        self.listener = BlockingStopListener(records, *self.handlers,
+                                             respect_handler_level=True)
+        self.logger.handlers = [DroppingQueueHandler(records)]
+        self.listener.start()
+
+    def stop(self) -> None:
+        """Запись оставшихся в очереди записей и возврат обработчиков."""
+        if self.listener is None:
+            return
+        self.listener.stop()
+        self.logger.handlers = self.handlers
+        self.listener = None
@@ -0,0 +1,186 @@
+"""Чтение с реплик Redis.
+
+Чтения (GET, MGET) направляются на реплики, запись и остальные команды -
+на основной узел. Реплика выбирается по кругу (round_robin) или по
+наименьшей средней задержке (least_latency). При включенном
+хеджировании, если ответ не получен за заданный перцентиль задержки,
+тот же запрос уходит на вторую реплику и используется первый ответ.
+Реплика, не ответившая из-за ошибки соединения или таймаута,
+исключается из выбора на REPLICA_COOLDOWN секунд."""
+
+import collections
+import itertools
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, List
+
+from redis.exceptions import ConnectionError, TimeoutError
+
+import src.otus_hw5.metrics as metrics
+from src.otus_hw5.shard import WORKERS_PER_NODE
+
+ROUND_ROBIN = "round_robin"
+LEAST_LATENCY = "least_latency"
+BALANCERS = (ROUND_ROBIN, LEAST_LATENCY)
+
+# Окно замеров задержки реплики и вес нового замера в скользящем среднем
+LATENCY_WINDOW = 1000
+LATENCY_ALPHA = 0.2
+# Пока замеров меньше HEDGE_MIN_SAMPLES, хеджирование выполняется
+# через HEDGE_DELAY секунд
+HEDGE_MIN_SAMPLES = 20
+HEDGE_DELAY = 0.01
+# Время исключения реплики после ошибки, с
+REPLICA_COOLDOWN = 5.0
+
+HEDGED_READS = metrics.counter(
+    "store_hedged_reads_total",
+    "Hedged replica reads by result (sent, won)",
+    ("result",),
+)
+REPLICA_EJECTIONS = metrics.counter(
+    "store_replica_ejections_total",
+    "Replicas excluded from reads after an error",
+    ("node",),
+)
+
+
+class LatencyStats:
+    """Задержки обращений к одному узлу."""
+
+    def __init__(self, window: int = LATENCY_WINDOW, alpha: float = LATENCY_ALPHA):
+        self.samples = collections.deque(maxlen=window)
+        self.alpha = alpha
+        self.average = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        with self.lock:
+            self.average = (value if not self.samples else
+                            self.alpha * value + (1 - self.alpha) * self.average)
+            self.samples.append(value)
+
+    def percentile(self, p: float) -> float | None:
+        with self.lock:
+            if len(self.samples) < HEDGE_MIN_SAMPLES:
+                return None
+            ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+class ReplicatedRedis:
+    """Клиент основного узла с репликами для чтения.
+
+    Интерфейс совпадает с используемой хранилищем частью redis.Redis.
+    Ошибка реплики не прерывает чтение - оно повторяется на основном
+    узле, а реплика исключается из выбора на cooldown секунд. Если
+    исключены все реплики, чтения идут на основной узел. Для хеджирования
+    используется пул из workers_per_node потоков на реплику."""
+
+    def __init__(self, primary, replicas: Dict[str, object],
+                 balance: str = ROUND_ROBIN, hedge_percentile: float | None = None,
+                 cooldown: float = REPLICA_COOLDOWN, clock=time.monotonic,
+                 workers_per_node: int = WORKERS_PER_NODE):
+        if balance not in BALANCERS:
+            raise ValueError("Unknown replica balance %r" % balance)
+        self.primary = primary
+        self.replicas = replicas
+        self.balance = balance
+        self.hedge_percentile = hedge_percentile
+        self.cooldown = cooldown
+        self.clock = clock
+        self.latency = {node: LatencyStats() for node in replicas}
+        # Момент возврата исключенной реплики в выбор
+        self.ejected: Dict[str, float] = {}
+        self.counter = itertools.count()
+        self.executor = None
+        if hedge_percentile and len(replicas) > 1:
+            # По размеру пулов соединений реплик: под нагрузкой чтения
+            # не ждут свободного потока дольше, чем ответа реплики
+            self.executor = ThreadPoolExecutor(
+                max_workers=len(replicas) * workers_per_node,
+                thread_name_prefix="hedge",
+            )
+
+    def endpoints(self) -> List:
+        return [self.primary, *self.replicas.values()]
+
+    def order(self) -> List[str]:
+        """Доступные реплики в порядке предпочтения для очередного чтения."""
+        nodes = list(self.replicas)
+        if self.ejected:
+            now = self.clock()
+            nodes = [node for node in nodes if self.ejected.get(node, 0.0) <= now]
+            if not nodes:
+                return nodes
+        if self.balance == LEAST_LATENCY:
+            return sorted(nodes, key=lambda node: self.latency[node].average)
+        shift = next(self.counter) % len(nodes)
+        return nodes[shift:] + nodes[:shift]
+
+    def hedge_delay(self, node: str) -> float:
+        delay = self.latency[node].percentile(self.hedge_percentile)
+        return HEDGE_DELAY if delay is None else delay
+
+    def eject(self, node: str) -> None:
+        self.ejected[node] = self.clock() + self.cooldown
+        REPLICA_EJECTIONS.inc(node=node)
+
+    def call(self, node: str, name: str, *args):
+        started = time.perf_counter()
+        try:
+            return getattr(self.replicas[node], name)(*args)
+        except (ConnectionError, TimeoutError):
+            self.eject(node)
+            raise
+        finally:
+            # Время неудачного обращения тоже учитывается: после
+            # возврата в выбор медленная реплика не окажется первой
+            self.latency[node].observe(time.perf_counter() - started)
+
+    def read(self, name: str, *args):
+        nodes = self.order()
+        if not nodes:
+            return getattr(self.primary, name)(*args)
+        try:
+            if self.executor is None or len(nodes) < 2:
+                return self.call(nodes[0], name, *args)
+            return self.hedged(nodes, name, *args)
+        except (ConnectionError, TimeoutError):
+            return getattr(self.primary, name)(*args)
+
+    def hedged(self, nodes: List[str], name: str, *args):
+        first = self.executor.submit(self.call, nodes[0], name, *args)
+        done, _ = wait([first], timeout=self.hedge_delay(nodes[0]))
+        if done:
+            return first.result()
+        HEDGED_READS.inc(result="sent")
+        second = self.executor.submit(self.call, nodes[1], name, *args)
+        pending = {first, second}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is second:
+                        HEDGED_READS.inc(result="won")
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def get(self, key):
+        return self.read("get", key)
+
+    def mget(self, keys: List) -> List:
+        return self.read("mget", keys)
+
+    def __getattr__(self, name):
+        # Запись и прочие команды - на основной узел
+        return getattr(self.primary, name)
+
+    def close(self) -> None:
+        for client in self.endpoints():
+            client.close()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
@@ -1,21 +1,27 @@
 import hashlib
-import json
 from datetime import datetime
 from typing import Optional
 import random
 
-from src.otus_hw5.store import ScoringStore
+import src.otus_hw5.interests as interests
+from src.otus_hw5.deadline import Deadline, DeadlineExceeded
+from src.otus_hw5.store import AsyncScoringStore, ScoringStore
 
+SCORE_PERIOD = 60 * 60
+INTERESTS_PERIOD = 60 * 60
+INTERESTS = list(interests.VOCABULARIES[interests.VERSION])
+# Число клиентов в одной команде MGET
+INTERESTS_BATCH_SIZE = 1000
 
-def get_score(
-    store: ScoringStore,
+
+def score_key(
     phone: Optional[str] = None,
     email: Optional[str] = None,
     birthday: Optional[datetime] = None,
     gender: Optional[int] = None,
     first_name: Optional[str] = None,
     last_name: Optional[str] = None,
-) -> float:
+) -> str:
     key_parts = [
         first_name or "",
         last_name or "",
@@ -24,14 +30,17 @@ def get_score(
         str(gender) if gender else "",
         birthday.strftime("%Y%m%d") if birthday else "",
     ]
-    key = "uid:" + hashlib.md5("".join(key_parts).encode("utf-8")).hexdigest()
+    return "uid:" + hashlib.md5("".join(key_parts).encode("utf-8")).hexdigest()
 
-    # Try to get from cache
-    score = store.cache_get(key)
-    if score is not None:
-        return float(score)
 
-    # Calculate score
+def compute_score(
+    phone: Optional[str] = None,
+    email: Optional[str] = None,
+    birthday: Optional[datetime] = None,
+    gender: Optional[int] = None,
+    first_name: Optional[str] = None,
+    last_name: Optional[str] = None,
+) -> float:
     score = 0.0
     if phone:
         score += 1.5
@@ -41,30 +50,162 @@ def get_score(
         score += 1.5
     if first_name and last_name:
         score += 0.5
+    return score
+
+
+def get_score(
+    store: ScoringStore,
+    phone: Optional[str] = None,
+    email: Optional[str] = None,
+    birthday: Optional[datetime] = None,
+    gender: Optional[int] = None,
+    first_name: Optional[str] = None,
+    last_name: Optional[str] = None,
+    deadline: Deadline | None = None,
+) -> float:
+    key = score_key(phone, email, birthday, gender, first_name, last_name)
+
+    # Try to get from cache
+    score = store.cache_get(key, deadline=deadline)
+    if score is not None:
+        return float(score)
+
+    # Calculate score
+    score = compute_score(phone, email, birthday, gender, first_name, last_name)
 
     # Cache the score for 60 minutes
-    store.cache_set(key, score, 60 * 60)
+    store.cache_set(key, score, SCORE_PERIOD, deadline=deadline)
     return score
 
 
+def get_scores_many(store: ScoringStore, items: list,
+                    deadline: Deadline | None = None) -> list:
+    """Скоринг списка наборов аргументов.
+
+    Кэш читается одним запросом, все промахи считаются за один проход
+    и записываются в кэш одним пакетом."""
+    keys = [score_key(**item) for item in items]
+    unique = list(dict.fromkeys(keys))
+    cached = dict(zip(unique, store.cache_get_many(unique, deadline=deadline)))
+
+    scores, missing = [], {}
+    for key, item in zip(keys, items):
+        score = cached.get(key)
+        if score is None:
+            score = missing.get(key)
+            if score is None:
+                score = missing[key] = compute_score(**item)
+        scores.append(float(score))
+
+    store.cache_set_many(missing, SCORE_PERIOD, deadline=deadline)
+    return scores
+
+
+async def aget_score(
+    store: AsyncScoringStore,
+    phone: Optional[str] = None,
+    email: Optional[str] = None,
+    birthday: Optional[datetime] = None,
+    gender: Optional[int] = None,
+    first_name: Optional[str] = None,
+    last_name: Optional[str] = None,
+) -> float:
+    key = score_key(phone, email, birthday, gender, first_name, last_name)
+
+    score = await store.cache_get(key)
+    if score is not None:
+        return float(score)
+
+    score = compute_score(phone, email, birthday, gender, first_name, last_name)
+    await store.cache_set(key, score, SCORE_PERIOD)
+    return score
+
+
+def interests_key(cid: int) -> str:
+    return f"i:{cid}"
+
+
+def random_interests() -> list:
+    # Порядок словаря совпадает с порядком после декодирования маски
+    return [INTERESTS[i] for i in sorted(random.sample(range(len(INTERESTS)), 2))]
+
+
 def get_interests(store: ScoringStore, cid: int) -> list:
-    key = f"i:{cid}"
-    r = store.get(key)
-    if r:
-        return json.loads(r)
-    interests = [
-            "cars",
-            "pets",
-            "travel",
-            "hi-tech",
-            "sport",
-            "music",
-            "books",
-            "tv",
-            "cinema",
-            "geek",
-            "otus",
-        ]
-    sample = random.sample(interests, 2)
-    store.set(key,json.dumps(sample),60 * 60)
-    return sample
+    """Интересы клиента за одно обращение к Redis.
+
+    Интересы нового клиента создаются атомарно: из конкурирующих
+    запросов сохраняется результат первого, остальные получают его."""
+    sample = random_interests()
+    r = store.get_or_set(interests_key(cid), interests.encode(sample),
+                         INTERESTS_PERIOD)
+    return interests.decode(r) if r else sample
+
+
+def iter_interests_batches(store: ScoringStore, cids: list,
+                           batch_size: int = INTERESTS_BATCH_SIZE,
+                           deadline: Deadline | None = None):
+    """Интересы клиентов порциями по batch_size.
+
+    На каждую порцию - одна команда MGET и, если есть новые клиенты,
+    один пакет SET NX GET для них. При исчерпании срока запроса
+    генератор поднимает DeadlineExceeded; уже выданные порции остаются
+    у вызывающего."""
+    cids = list(dict.fromkeys(cids))
+    for start in range(0, len(cids), batch_size):
+        batch = cids[start:start + batch_size]
+        values = store.get_many([interests_key(cid) for cid in batch],
+                                deadline=deadline)
+        found = [interests.decode(r) if r else None for r in values]
+        created = {i: random_interests() for i, value in enumerate(found)
+                   if value is None}
+        if created:
+            try:
+                existing = store.get_or_set_many(
+                    {interests_key(batch[i]): interests.encode(sample)
+                     for i, sample in created.items()},
+                    INTERESTS_PERIOD, deadline=deadline)
+            except DeadlineExceeded:
+                # Интересы новых клиентов не созданы - отдаем прочитанное
+                yield {cid: value for cid, value in zip(batch, found)
+                       if value is not None}
+                raise
+            for (i, sample), r in zip(created.items(), existing):
+                found[i] = interests.decode(r) if r else sample
+        yield dict(zip(batch, found))
+
+
+def get_interests_many(store: ScoringStore, cids: list,
+                       deadline: Deadline | None = None) -> dict:
+    """Интересы нескольких клиентов.
+
+    Ключи читаются командами MGET по INTERESTS_BATCH_SIZE штук, интересы
+    новых клиентов записываются пакетами. После исчерпания срока
+    запроса возвращается то, что успели получить."""
+    result = {}
+    try:
+        for batch in iter_interests_batches(store, cids, deadline=deadline):
+            result.update(batch)
+    except DeadlineExceeded:
+        pass
+    return result
+
+
+async def aget_interests(store: AsyncScoringStore, cid: int) -> list:
+    sample = random_interests()
+    r = await store.get_or_set(interests_key(cid), interests.encode(sample),
+                               INTERESTS_PERIOD)
+    return interests.decode(r) if r else sample
+
+
+async def aget_interests_many(store: AsyncScoringStore, cids: list) -> dict:
+    cids = list(dict.fromkeys(cids))
+    values = await store.get_many([interests_key(cid) for cid in cids])
+    found = [interests.decode(r) if r else None for r in values]
+    created = {i: random_interests() for i, value in enumerate(found)
+               if value is None}
+    existing = await store.get_or_set_many(
+        {interests_key(cids[i]): interests.encode(sample)
+         for i, sample in created.items()}, INTERESTS_PERIOD)
+    for (i, sample), r in zip(created.items(), existing):
+        found[i] = interests.decode(r) if r else sample
+    return dict(zip(cids, found))
@@ -0,0 +1,391 @@
+"""Многопоточный и многопроцессный HTTP-сервер API"""
+
+import logging
+import os
+import queue
+import selectors
+import signal
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+# Время простоя постоянного соединения по умолчанию, с
+IDLE_TIMEOUT = 15
+
+
+class PersistentHTTPRequestHandler(BaseHTTPRequestHandler):
+    """Обработчик постоянных соединений, не занимающий поток в простое.
+
+    После ответа соединение, в буфере которого нет следующего запроса,
+    возвращается серверу (parked) и ждет данных в selectors без потока
+    пула. timeout ограничивает ожидание данных внутри запроса,
+    idle_timeout - простой между запросами."""
+
+    idle_timeout = IDLE_TIMEOUT
+    parked = False
+
+    def handle(self):
+        if getattr(self.server, "idle", None) is None:
+            # Сервер не умеет ждать простаивающие соединения
+            super().handle()
+            return
+        self.close_connection = True
+        self.handle_one_request()
+        while not self.close_connection:
+            if not self.buffered():
+                self.parked = True
+                return
+            self.handle_one_request()
+
+    def resume(self):
+        """Обработка следующих запросов простаивавшего соединения."""
+        self.parked = False
+        try:
+            self.handle()
+        finally:
+            self.finish()
+
+    def buffered(self) -> bool:
+        """Есть ли уже полученные данные следующего запроса (конвейер)."""
+        self.connection.setblocking(False)
+        try:
+            return bool(self.rfile.peek(1))
+        except OSError:
+            return False
+        finally:
+            self.connection.settimeout(self.timeout)
+
+    def finish(self):
+        if not self.parked:
+            super().finish()
+
+    def close(self):
+        """Закрытие файлов простаивающего соединения."""
+        self.parked = False
+        self.finish()
+
+
+class IdleConnections:
+    """Простаивающие постоянные соединения.
+
+    Соединения ожидают следующего запроса в одном потоке через
+    selectors. Готовое к чтению соединение передается в dispatch,
+    простоявшее дольше timeout - в expire."""
+
+    def __init__(self, dispatch, expire, timeout: float = IDLE_TIMEOUT,
+                 clock=time.monotonic):
+        self.dispatch = dispatch
+        self.expire = expire
+        self.timeout = timeout
+        self.clock = clock
+        self.selector = selectors.DefaultSelector()
+        # Добавление выполняет поток ожидания, остальные пишут в очередь
+        self.added = queue.SimpleQueue()
+        # Срок простоя по порядку добавления, таймаут у всех общий
+        self.deadlines = {}
+        self.waker, self.wakeup = socket.socketpair()
+        self.waker.setblocking(False)
+        self.wakeup.setblocking(False)
+        self.selector.register(self.waker, selectors.EVENT_READ)
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name="http-idle",
+                                       daemon=True)
+        self.thread.start()
+
+    def __len__(self):
+        return len(self.deadlines)
+
+    def add(self, handler) -> None:
+        self.added.put(handler)
+        self.wake()
+
+    def wake(self) -> None:
+        try:
+            self.wakeup.send(b"\0")
+        except OSError:
+            # Буфер полон - поток ожидания и так будет разбужен
+            pass
+
+    def register(self) -> None:
+        while True:
+            try:
+                handler = self.added.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                self.selector.register(handler.connection, selectors.EVENT_READ,
+                                       handler)
+            except (ValueError, OSError):
+                # Соединение уже закрыто
+                self.expire(handler)
+                continue
+            self.deadlines[handler] = self.clock() + self.timeout
+
+    def unregister(self, handler) -> None:
+        del self.deadlines[handler]
+        try:
+            self.selector.unregister(handler.connection)
+        except (KeyError, ValueError):
+            pass
+
+    def expire_idle(self) -> float | None:
+        """Закрытие простоявших соединений; время до следующего срока."""
+        now = self.clock()
+        for handler, deadline in list(self.deadlines.items()):
+            if deadline > now:
+                return deadline - now
+            self.unregister(handler)
+            self.expire(handler)
+        return None
+
+    def run(self) -> None:
+        while self.running:
+            self.register()
+            timeout = self.expire_idle()
+            for key, _ in self.selector.select(timeout):
+                if key.fileobj is self.waker:
+                    try:
+                        while self.waker.recv(4096):
+                            pass
+                    except OSError:
+                        pass
+                    continue
+                self.unregister(key.data)
+                self.dispatch(key.data)
+
+    def close(self) -> None:
+        """Остановка ожидания и закрытие всех соединений."""
+        self.running = False
+        self.wake()
+        self.thread.join()
+        self.register()
+        for handler in list(self.deadlines):
+            self.unregister(handler)
+            self.expire(handler)
+        self.selector.close()
+        self.waker.close()
+        self.wakeup.close()
+
+
+class ThreadPoolHTTPServer(HTTPServer):
+    """HTTP-сервер с ограниченным пулом потоков.
+
+    Количество одновременно обрабатываемых соединений ограничено
+    max_concurrency: при исчерпании лимита цикл accept блокируется,
+    а новые клиенты ждут в очереди listen-сокета размера backlog.
+    Соединения PersistentHTTPRequestHandler между запросами ждут в
+    IdleConnections и не занимают ни поток, ни слот.
+    """
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(
+        self,
+        server_address,
+        handler_class,
+        threads: int = 16,
+        max_concurrency: int | None = None,
+        backlog: int = 128,
+        reuse_port: bool = False,
+        bind_and_activate: bool = True,
+        listen_socket: socket.socket | None = None,
+    ):
+        self.request_queue_size = backlog
+        self.reuse_port = reuse_port
+        self.executor = ThreadPoolExecutor(
+            max_workers=threads, thread_name_prefix="http-worker"
+        )
+        self.slots = threading.BoundedSemaphore(max_concurrency or threads)
+        self.idle = IdleConnections(
+            self.resume_request, self.close_idle,
+            timeout=getattr(handler_class, "idle_timeout", IDLE_TIMEOUT),
+        )
+        super().__init__(
+            server_address, handler_class,
+            bind_and_activate and listen_socket is None,
+        )
+        if listen_socket is not None:
+            # Сокет, открытый и унаследованный от родительского процесса
+            self.socket.close()
+            self.socket = listen_socket
+            self.server_address = listen_socket.getsockname()
+            self.server_name = socket.getfqdn(self.server_address[0])
+            self.server_port = self.server_address[1]
+
+    def server_bind(self):
+        if self.reuse_port:
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        super().server_bind()
+
+    def process_request(self, request, client_address):
+        self.submit(request, client_address)
+
+    def resume_request(self, handler):
+        """Следующий запрос простаивавшего соединения."""
+        self.submit(handler.request, handler.client_address, handler)
+
+    def submit(self, request, client_address, handler=None):
+        # Ожидаем свободный слот - так цикл accept не набирает
+        # соединений больше, чем может обработать пул
+        self.slots.acquire()
+        try:
+            self.executor.submit(self.process_request_thread, request,
+                                 client_address, handler)
+        except RuntimeError:
+            # Пул уже остановлен
+            self.slots.release()
+            if handler is not None:
+                handler.close()
+            self.shutdown_request(request)
+
+    def finish_request(self, request, client_address):
+        return self.RequestHandlerClass(request, client_address, self)
+
+    def process_request_thread(self, request, client_address, handler=None):
+        parked = False
+        try:
+            if handler is None:
+                handler = self.finish_request(request, client_address)
+            else:
+                handler.resume()
+            parked = getattr(handler, "parked", False)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.slots.release()
+            if parked:
+                self.idle.add(handler)
+            else:
+                self.shutdown_request(request)
+
+    def close_idle(self, handler):
+        handler.close()
+        self.shutdown_request(handler.request)
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown(wait=True)
+        self.idle.close()
+
+
+def reuse_port_supported() -> bool:
+    """Проверка поддержки SO_REUSEPORT платформой."""
+    return hasattr(socket, "SO_REUSEPORT") and hasattr(os, "fork")
+
+
+def listen(host: str, port: int, backlog: int = 128) -> socket.socket:
+    """Слушающий сокет, который наследуют процессы-обработчики."""
+    sock = socket.socket(HTTPServer.address_family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    return sock
+
+
+def run_worker(server: ThreadPoolHTTPServer, finalizer=None):
+    """Цикл обслуживания одного процесса."""
+
+    def stop(signum, frame):
+        # shutdown() блокирует до выхода из serve_forever,
+        # поэтому вызываем его из отдельного потока
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if finalizer is not None:
+            finalizer()
+
+
+def serve(
+    handler_class,
+    host: str = "localhost",
+    port: int = 8080,
+    workers: int = 1,
+    threads: int = 16,
+    max_concurrency: int | None = None,
+    backlog: int = 128,
+    initializer=None,
+    finalizer=None,
+):
+    """Запуск сервера.
+
+    При workers > 1 порождается заданное количество процессов, каждый со
+    своим пулом потоков. Процессы слушают один порт через SO_REUSEPORT,
+    распределение соединений выполняет ядро. Если SO_REUSEPORT недоступен,
+    сокет открывается в родительском процессе и наследуется потомками.
+    Функция initializer вызывается в каждом процессе перед началом
+    обслуживания (например, для прогрева соединений), finalizer - после
+    его завершения (например, для сброса отложенных записей).
+    """
+
+    def make_server(reuse_port: bool, listen_socket=None):
+        return ThreadPoolHTTPServer(
+            (host, port),
+            handler_class,
+            threads=threads,
+            max_concurrency=max_concurrency,
+            backlog=backlog,
+            reuse_port=reuse_port,
+            listen_socket=listen_socket,
+        )
+
+    if workers <= 1:
+        logging.info("Starting server at %s:%s" % (host, port))
+        server = make_server(reuse_port=False)
+        if initializer is not None:
+            initializer()
+        run_worker(server, finalizer)
+        return
+
+    reuse_port = reuse_port_supported()
+    # В родительском процессе открывается только сокет: пул потоков и поток
+    # простаивающих соединений не переживают fork и создаются в потомках
+    shared = None if reuse_port else listen(host, port, backlog)
+    children = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            # Дочерний процесс: сокет и ресурсы создаются после fork
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            code = 0
+            try:
+                server = make_server(reuse_port=shared is None,
+                                     listen_socket=shared)
+                if initializer is not None:
+                    initializer()
+                run_worker(server, finalizer)
+            except Exception:
+                logging.exception("Worker %s failed" % os.getpid())
+                code = 1
+            os._exit(code)
+        children.append(pid)
+    logging.info(
+        "Starting %s workers at %s:%s (reuse_port=%s)"
+        % (workers, host, port, reuse_port)
+    )
+    if shared is not None:
+        shared.close()
+
+    def terminate(signum, frame):
+        for child in children:
+            try:
+                os.kill(child, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, terminate)
+    try:
+        for child in children:
+            os.waitpid(child, 0)
+    except KeyboardInterrupt:
+        terminate(signal.SIGINT, None)
+        for child in children:
+            os.waitpid(child, 0)
@@ -0,0 +1,173 @@
+"""Шардирование ключей между несколькими узлами Redis.
+
+Ключи распределяются по узлам консистентным хешированием: каждый узел
+занимает на кольце vnodes точек, ключ принадлежит первой точке по
+часовой стрелке от своего хеша. При добавлении узла на него переходит
+примерно 1/N ключей, остальные остаются на прежних узлах."""
+
+import bisect
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List
+
+VNODES = 160
+# Потоков на узел для параллельных обращений; по размеру пула
+# соединений узла, чтобы запросы разных потоков сервера не ждали друг друга
+WORKERS_PER_NODE = 16
+
+
+def ring_hash(value: str) -> int:
+    return int.from_bytes(hashlib.md5(value.encode("utf-8")).digest()[:8], "big")
+
+
+def parse_nodes(value: str) -> List[str]:
+    """Список узлов вида "host:port,host:port"."""
+    return [node.strip() for node in value.split(",") if node.strip()]
+
+
+class HashRing:
+    """Кольцо консистентного хеширования."""
+
+    def __init__(self, nodes: Iterable[str] = (), vnodes: int = VNODES):
+        self.vnodes = vnodes
+        self.points: List[int] = []
+        self.owners: List[str] = []
+        for node in nodes:
+            self.add(node)
+
+    @property
+    def nodes(self) -> List[str]:
+        return list(dict.fromkeys(self.owners))
+
+    def add(self, node: str) -> None:
+        for i in range(self.vnodes):
+            point = ring_hash(f"{node}#{i}")
+            index = bisect.bisect(self.points, point)
+            self.points.insert(index, point)
+            self.owners.insert(index, node)
+
+    def remove(self, node: str) -> None:
+        kept = [(point, owner) for point, owner in zip(self.points, self.owners)
+                if owner != node]
+        self.points = [point for point, _ in kept]
+        self.owners = [owner for _, owner in kept]
+
+    def node(self, key) -> str:
+        if not self.points:
+            raise LookupError("Hash ring is empty")
+        if isinstance(key, bytes):
+            key = key.decode("utf-8")
+        index = bisect.bisect(self.points, ring_hash(key)) % len(self.points)
+        return self.owners[index]
+
+    def split(self, keys: Iterable) -> Dict[str, List[int]]:
+        """Индексы ключей, сгруппированные по узлам."""
+        groups: Dict[str, List[int]] = {}
+        for i, key in enumerate(keys):
+            groups.setdefault(self.node(key), []).append(i)
+        return groups
+
+
+class ShardedRedis:
+    """Клиент поверх нескольких узлов Redis с интерфейсом redis.Redis.
+
+    Поддерживаются команды, используемые хранилищем: get, set, mget,
+    pipeline и scan_iter. Прочие команды с ключом первым аргументом
+    направляются на узел этого ключа. MGET и пакеты выполняются
+    параллельно на всех затронутых узлах: обращение к одному из узлов -
+    в вызывающем потоке, к остальным - в общем пуле из
+    workers_per_node потоков на узел."""
+
+    def __init__(self, clients: Dict[str, object], vnodes: int = VNODES,
+                 workers_per_node: int = WORKERS_PER_NODE):
+        self.clients = clients
+        self.ring = HashRing(clients, vnodes=vnodes)
+        self.executor = ThreadPoolExecutor(
+            max_workers=max(1, len(clients) * workers_per_node),
+            thread_name_prefix="shard",
+        )
+
+    def endpoints(self) -> List:
+        return list(self.clients.values())
+
+    def client(self, key):
+        return self.clients[self.ring.node(key)]
+
+    def run(self, calls: Dict[str, object]) -> Dict[str, object]:
+        """Выполнение функций узлов параллельно: {узел: функция}."""
+        (node, call), *others = calls.items()
+        futures = {other: self.executor.submit(func) for other, func in others}
+        results = {node: call()}
+        for other, future in futures.items():
+            results[other] = future.result()
+        return results
+
+    def get(self, key):
+        return self.client(key).get(key)
+
+    def set(self, key, value, **kwargs):
+        return self.client(key).set(key, value, **kwargs)
+
+    def mget(self, keys: List) -> List:
+        keys = list(keys)
+        groups = self.ring.split(keys)
+        results = self.run({
+            node: (lambda client=self.clients[node], part=[keys[i] for i in indexes]:
+                   client.mget(part))
+            for node, indexes in groups.items()
+        })
+        values = [None] * len(keys)
+        for node, indexes in groups.items():
+            for i, value in zip(indexes, results[node]):
+                values[i] = value
+        return values
+
+    def pipeline(self, transaction: bool = False) -> "ShardedPipeline":
+        # Транзакции между узлами не поддерживаются
+        return ShardedPipeline(self)
+
+    def scan_iter(self, match=None, count=None):
+        for client in self.clients.values():
+            yield from client.scan_iter(match=match, count=count)
+
+    def __getattr__(self, name):
+        def command(key, *args, **kwargs):
+            return getattr(self.client(key), name)(key, *args, **kwargs)
+        return command
+
+    def close(self) -> None:
+        for client in self.clients.values():
+            client.close()
+        self.executor.shutdown(wait=False)
+
+
+class ShardedPipeline:
+    """Пакет команд, разбитый на пакеты узлов.
+
+    Результаты execute() возвращаются в порядке добавления команд."""
+
+    def __init__(self, redis: ShardedRedis):
+        self.redis = redis
+        self.pipes: Dict[str, object] = {}
+        self.order: List[str] = []
+
+    def __getattr__(self, name):
+        def command(key, *args, **kwargs):
+            node = self.redis.ring.node(key)
+            pipe = self.pipes.get(node)
+            if pipe is None:
+                pipe = self.pipes[node] = self.redis.clients[node].pipeline(
+                    transaction=False)
+            getattr(pipe, name)(key, *args, **kwargs)
+            self.order.append(node)
+            return self
+        return command
+
+    def execute(self) -> List:
+        pipes, order = self.pipes, self.order
+        self.pipes, self.order = {}, []
+        if not pipes:
+            return []
+        results = {node: iter(values) for node, values in self.redis.run(
+            {node: pipe.execute for node, pipe in pipes.items()}).items()}
+        return [next(results[node]) for node in order]
@@ -7,24 +7,168 @@ from pathlib import Path
 from dotenv import dotenv_values
 
 import functools
+import logging
+import queue
+import threading
+import time
 
-from typing import Dict
+from typing import Dict, List
 
 import redis
+import redis.asyncio
 from redis.retry import Retry
-from redis.exceptions import (TimeoutError, ConnectionError)
+from redis.asyncio.retry import Retry as AsyncRetry
+from redis.exceptions import (TimeoutError, ConnectionError, RedisError)
 from redis.backoff import ExponentialBackoff
 
+import src.otus_hw5.metrics as metrics
+from src.otus_hw5.breaker import STATES, CircuitBreaker
+from src.otus_hw5.buckets import BUCKET_BITS, BucketLayout
+from src.otus_hw5.cache import TTLCache
+from src.otus_hw5.deadline import Deadline, check_deadline
+from src.otus_hw5.replica import ROUND_ROBIN, ReplicatedRedis
+from src.otus_hw5.shard import VNODES, ShardedRedis, parse_nodes
+
 CACHE_DB: int = 0
 REMOTE_DB: int = 1
 
+# Параметры пула соединений по умолчанию
+POOL_SIZE: int = 16
+POOL_TIMEOUT: float = 5.0
+HEALTH_CHECK_INTERVAL: int = 30
+
+# Политики обращений к БД по умолчанию: таймаут операции (с) и
+# количество повторов. Промах кэша безвреден, поэтому CACHE_DB
+# получает короткий таймаут и один повтор
+CACHE_TIMEOUT: float = 0.1
+CACHE_RETRIES: int = 1
+REMOTE_TIMEOUT: float = 1.0
+REMOTE_RETRIES: int = 3
+
+# Предохранитель CACHE_DB: ошибок подряд до размыкания и
+# время до пробного запроса (с)
+BREAKER_THRESHOLD: int = 5
+BREAKER_RESET_TIMEOUT: float = 5.0
+
+# Параметры отложенной записи кэша по умолчанию
+WRITE_BEHIND_QUEUE_SIZE: int = 10000
+WRITE_BEHIND_BATCH_SIZE: int = 100
+WRITE_BEHIND_INTERVAL: float = 0.05
+
+# Параметры локального кэша (L1) по умолчанию
+L1_CACHE_SIZE: int = 10000
+L1_CACHE_TTL: float = 60.0
+L1_CACHE_MAX_BYTES: int = 16 * 1024 * 1024
+
+# Раскладка кэша скоринга в CACHE_DB: отдельные ключи или корзины-хеши
+CACHE_LAYOUT_KEYS = "keys"
+CACHE_LAYOUT_BUCKETS = "buckets"
+
+
+STORE_LATENCY = metrics.histogram(
+    "store_command_duration_seconds",
+    "Redis round-trip time by DB and command",
+    ("db", "command"),
+)
+CACHE_REQUESTS = metrics.counter(
+    "cache_requests_total",
+    "Score cache lookups by tier (l1, redis) and result (hit, miss)",
+    ("tier", "result"),
+)
+WRITE_BEHIND_EVENTS = metrics.counter(
+    "write_behind_records_total",
+    "Write-behind queue records by result (queued, written, dropped, failed)",
+    ("result",),
+)
+
+CACHE_CIRCUIT_STATE = metrics.gauge(
+    "cache_circuit_state", "Cache DB circuit breaker state "
+    "(0 - closed, 1 - open, 2 - half open)"
+)
+CACHE_CIRCUIT_REJECTED = metrics.counter(
+    "cache_circuit_rejected_total", "Cache DB calls rejected by the open circuit"
+)
+
+
+def cache_hit_ratio():
+    lookups = (CACHE_REQUESTS.get(tier="l1", result="hit")
+               + CACHE_REQUESTS.get(tier="l1", result="miss"))
+    hits = (CACHE_REQUESTS.get(tier="l1", result="hit")
+            + CACHE_REQUESTS.get(tier="redis", result="hit"))
+    return {(): hits / lookups if lookups else 0.0}
+
+
+metrics.REGISTRY.register(metrics.CallbackGauge(
+    "cache_hit_ratio", "Share of score cache lookups answered by L1 or Redis",
+    cache_hit_ratio,
+))
+
+
+def load_config(envfile: str = ".env") -> Dict[str, str]:
+    """Чтение параметров подключения из .env-файла в корне проекта."""
+    dotenv_path = Path(__file__).parent.parent.parent.joinpath(envfile)
+    if os.path.exists(dotenv_path):
+        return dotenv_values(dotenv_path)
+    return {}
+
+
+def pool_settings(config: Dict[str, str]) -> Dict[str, float]:
+    """Параметры пула соединений из конфигурации."""
+    return {
+        "max_connections": int(config.get("REDIS_POOL_SIZE") or POOL_SIZE),
+        "timeout": float(config.get("REDIS_POOL_TIMEOUT") or POOL_TIMEOUT),
+        "health_check_interval": int(
+            config.get("REDIS_HEALTH_CHECK_INTERVAL") or HEALTH_CHECK_INTERVAL
+        ),
+    }
+
+
+def retry_policy(config: Dict[str, str], db: int) -> Dict[str, float]:
+    """Таймаут и повторы для БД из конфигурации.
+
+    Худшее время операции ограничено примерно
+    (retries + 1) * timeout плюс паузы между повторами (не больше
+    timeout каждая)."""
+    prefix, timeout, retries = (
+        ("REDIS_CACHE", CACHE_TIMEOUT, CACHE_RETRIES) if db == CACHE_DB
+        else ("REDIS_REMOTE", REMOTE_TIMEOUT, REMOTE_RETRIES)
+    )
+    return {
+        "timeout": float(config.get(f"{prefix}_TIMEOUT") or timeout),
+        "retries": int(config.get(f"{prefix}_RETRIES") or retries),
+    }
+
+
+def connection_kwargs(config: Dict[str, str], db: int,
+                      node: str | None = None) -> Dict:
+    """Параметры подключения к Redis из конфигурации.
+
+    node - адрес узла "host:port" вместо REDIS_URL и REDIS_PORT."""
+    host, port = config["REDIS_URL"], config["REDIS_PORT"]
+    if node is not None:
+        host, _, port = node.rpartition(":")
+    return {
+        "host": host,
+        "port": port,
+        "db": db,
+        "username": config["REDIS_USER"],
+        "password": config["REDIS_USER_PASSWORD"],
+    }
+
+
+def expire_period(period) -> int | None:
+    """Срок жизни для SET EX (None - без ограничения)."""
+    return period if isinstance(period, int) and period > 0 else None
+
 
 def lazy_connect(db: int):
     def decorator(func):
         @functools.wraps(func)
         def wrapper(self,*args, **kwargs):
             if db not in self.connections.keys():
-                self.connections[db] = self.setup_connection(db=db)
+                with self.lock:
+                    if db not in self.connections.keys():
+                        self.connections[db] = self.setup_connection(db=db)
             res = func(self,*args, **kwargs)
             return res
         return wrapper
@@ -32,53 +176,575 @@ def lazy_connect(db: int):
 
 
 class ScoringStore:
+    """Хранилище на синхронном клиенте Redis.
 
+    Экземпляр потокобезопасен: соединения с каждой БД берутся из
+    ограниченного блокирующего пула (REDIS_POOL_SIZE соединений,
+    ожидание свободного не дольше REDIS_POOL_TIMEOUT секунд)."""
 
-    def __init__(self,envfile: str=".env"):
-        self.config = {}
-        dotenv_path = Path(__file__).parent.parent.parent.joinpath(envfile)
-        if os.path.exists(dotenv_path):
-            self.config = dotenv_values(dotenv_path)
+    def __init__(self,envfile: str=".env", write_behind: bool | None = None):
+        self.config = load_config(envfile)
+        self.pool = pool_settings(self.config)
         self.connections: Dict[int,redis.Redis] = {}
+        self.lock = threading.Lock()
+        if write_behind is None:
+            write_behind = self.config.get("REDIS_WRITE_BEHIND", "") in (
+                "1", "true", "yes")
+        # Локальный кэш перед CACHE_DB (L1_CACHE_SIZE=0 отключает)
+        l1_size = self.config.get("L1_CACHE_SIZE")
+        self.l1 = TTLCache(
+            max_entries=int(l1_size) if l1_size else L1_CACHE_SIZE,
+            ttl=float(self.config.get("L1_CACHE_TTL") or L1_CACHE_TTL),
+            max_bytes=int(self.config.get("L1_CACHE_MAX_BYTES")
+                          or L1_CACHE_MAX_BYTES),
+        )
+        self.breaker = CircuitBreaker(
+            failure_threshold=int(self.config.get("REDIS_BREAKER_THRESHOLD")
+                                  or BREAKER_THRESHOLD),
+            reset_timeout=float(self.config.get("REDIS_BREAKER_RESET_TIMEOUT")
+                                or BREAKER_RESET_TIMEOUT),
+        )
+        # Раскладка CACHE_DB (None - ключ на каждое значение)
+        self.layout = None
+        layout = self.config.get("REDIS_CACHE_LAYOUT") or CACHE_LAYOUT_KEYS
+        if layout == CACHE_LAYOUT_BUCKETS:
+            self.layout = BucketLayout(
+                bits=int(self.config.get("REDIS_CACHE_BUCKET_BITS") or BUCKET_BITS),
+                # HEXPIRE для полей корзин есть в Redis 7.4+
+                field_ttl=(self.config.get("REDIS_CACHE_FIELD_TTL") or "0")
+                in ("1", "true", "yes"))
+        elif layout != CACHE_LAYOUT_KEYS:
+            raise ValueError("Unknown cache layout %r" % layout)
+        self.writer = None
+        if write_behind:
+            self.writer = WriteBehindQueue(
+                flush=self.cache_set_batch,
+                max_size=int(self.config.get("REDIS_WRITE_BEHIND_QUEUE_SIZE")
+                             or WRITE_BEHIND_QUEUE_SIZE),
+                batch_size=int(self.config.get("REDIS_WRITE_BEHIND_BATCH_SIZE")
+                               or WRITE_BEHIND_BATCH_SIZE),
+                interval=float(self.config.get("REDIS_WRITE_BEHIND_INTERVAL")
+                               or WRITE_BEHIND_INTERVAL),
+            )
 
-    def setup_connection(self,db:int) -> redis.Redis:
-        connection = redis.Redis(
-            host=self.config["REDIS_URL"],
-            port=self.config["REDIS_PORT"],
-            db=db,
-            username=self.config["REDIS_USER"],
-            password=self.config["REDIS_USER_PASSWORD"],
-            retry=Retry(ExponentialBackoff(cap=10, base=1), retries=25),
+    def setup_connection(self,db:int) -> redis.Redis | ShardedRedis:
+        # REMOTE_DB может быть распределена по нескольким узлам
+        # или читаться с реплик основного узла
+        nodes = parse_nodes(self.config.get("REDIS_REMOTE_NODES") or "")
+        replicas = parse_nodes(self.config.get("REDIS_REMOTE_REPLICAS") or "")
+        if db == REMOTE_DB and nodes:
+            return ShardedRedis(
+                {node: self.connect(db, node) for node in nodes},
+                vnodes=int(self.config.get("REDIS_REMOTE_VNODES") or VNODES),
+                workers_per_node=self.pool["max_connections"],
+            )
+        if db == REMOTE_DB and replicas:
+            percentile = self.config.get("REDIS_REMOTE_HEDGE_PERCENTILE")
+            return ReplicatedRedis(
+                self.connect(db),
+                {node: self.connect(db, node) for node in replicas},
+                balance=self.config.get("REDIS_REMOTE_BALANCE") or ROUND_ROBIN,
+                hedge_percentile=float(percentile) if percentile else None,
+                workers_per_node=self.pool["max_connections"],
+            )
+        return self.connect(db)
+
+    def connect(self, db: int, node: str | None = None) -> redis.Redis:
+        policy = retry_policy(self.config, db)
+        pool = redis.BlockingConnectionPool(
+            max_connections=self.pool["max_connections"],
+            timeout=min(self.pool["timeout"], policy["timeout"]),
+            health_check_interval=self.pool["health_check_interval"],
+            socket_timeout=policy["timeout"],
+            socket_connect_timeout=policy["timeout"],
+            retry=Retry(
+                ExponentialBackoff(cap=policy["timeout"], base=policy["timeout"] / 10),
+                retries=policy["retries"],
+            ),
             retry_on_error=[ConnectionError, TimeoutError, ConnectionResetError],
-            health_check_interval=1,
+            **connection_kwargs(self.config, db, node),
         )
-        return connection
+        return redis.Redis.from_pool(pool)
+
+    def guarded(self, func, *args, default=None, deadline: Deadline | None = None):
+        """Вызов операции с CACHE_DB через предохранитель.
+
+        При разомкнутом предохранителе, исчерпанном сроке запроса или
+        любой ошибке Redis (в том числе ResponseError, например OOM)
+        возвращается default - промах кэша не должен задерживать ответ.
+        Результат операции учитывается предохранителем всегда, иначе
+        пробная операция в half_open не завершится."""
+        if deadline is not None and deadline.expired():
+            return default
+        if not self.breaker.allow():
+            CACHE_CIRCUIT_REJECTED.inc()
+            return default
+        failed = True
+        try:
+            result = func(*args)
+            failed = False
+        except RedisError:
+            return default
+        finally:
+            self.record_breaker(failed)
+        return result
+
+    def record_breaker(self, failed: bool) -> None:
+        if failed:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        CACHE_CIRCUIT_STATE.set(STATES[self.breaker.state])
+
+    def warm_up(self, size: int | None = None) -> None:
+        """Предварительное открытие соединений с обеими БД."""
+        size = size or self.pool["max_connections"]
+        for db in (CACHE_DB, REMOTE_DB):
+            if db not in self.connections.keys():
+                with self.lock:
+                    if db not in self.connections.keys():
+                        self.connections[db] = self.setup_connection(db=db)
+            client = self.connections[db]
+            clients = (client.endpoints()
+                       if isinstance(client, (ShardedRedis, ReplicatedRedis))
+                       else [client])
+            for client in clients:
+                warm_up_pool(client.connection_pool, size)
+
+    def close(self) -> None:
+        # Сначала сбрасываем очередь отложенной записи
+        if self.writer is not None:
+            self.writer.close()
+        with self.lock:
+            for connection in self.connections.values():
+                connection.close()
+            self.connections.clear()
+
+    @lazy_connect(REMOTE_DB)
+    def get(self, key, db=REMOTE_DB,
+            deadline: Deadline | None = None) -> str | None:
+        check_deadline(deadline)
+        with STORE_LATENCY.time(db=db, command="get"):
+            return decode(self.connections[db].get(key))
+
+    @lazy_connect(REMOTE_DB)
+    def set(self, key, value, period,db=REMOTE_DB,
+            deadline: Deadline | None = None) -> None:
+        check_deadline(deadline)
+        with STORE_LATENCY.time(db=db, command="set"):
+            self.connections[db].set(key, value, ex=expire_period(period))
+
+    @lazy_connect(REMOTE_DB)
+    def get_many(self, keys: List, db=REMOTE_DB,
+                 deadline: Deadline | None = None) -> List[str | None]:
+        """Чтение нескольких ключей одной командой MGET."""
+        if not keys:
+            return []
+        check_deadline(deadline)
+        with STORE_LATENCY.time(db=db, command="mget"):
+            values = self.connections[db].mget(keys)
+        return [decode(binary) for binary in values]
 
     @lazy_connect(REMOTE_DB)
-    def get(self, key, db=REMOTE_DB) -> str | None:
-        binary = self.connections[db].get(key)
-        return binary.decode("utf-8") if binary is not None else None
+    def set_many(self, mapping: Dict, period, db=REMOTE_DB,
+                 deadline: Deadline | None = None) -> None:
+        """Запись нескольких ключей одним пакетом (pipeline).
+
+        Срок жизни задается атомарно в той же команде SET."""
+        self.set_batch([(key, value, period) for key, value in mapping.items()],
+                       db=db, deadline=deadline)
+
+    @lazy_connect(REMOTE_DB)
+    def set_batch(self, items: List, db=REMOTE_DB,
+                  deadline: Deadline | None = None) -> None:
+        """Запись списка (key, value, period) одним пакетом."""
+        if not items:
+            return
+        check_deadline(deadline)
+        pipe = self.connections[db].pipeline(transaction=False)
+        for key, value, period in items:
+            pipe.set(key, value, ex=expire_period(period))
+        with STORE_LATENCY.time(db=db, command="pipeline"):
+            pipe.execute()
 
     @lazy_connect(REMOTE_DB)
-    def set(self, key, value, period,db=REMOTE_DB) -> None:
-        self.connections[db].set(key, value)
-        if isinstance(period,int) and period > 0:
-            self.connections[db].expire(key,period)
+    def get_or_set(self, key, value, period, db=REMOTE_DB,
+                   deadline: Deadline | None = None) -> str | None:
+        """Атомарное чтение или создание ключа (SET NX GET, Redis 7+).
+
+        Возвращает существующее значение; если ключа не было, записывает
+        value и возвращает None. Из конкурирующих запросов значение
+        записывает только первый."""
+        check_deadline(deadline)
+        with STORE_LATENCY.time(db=db, command="set"):
+            return decode(self.connections[db].set(
+                key, value, ex=expire_period(period), nx=True, get=True))
+
+    @lazy_connect(REMOTE_DB)
+    def get_or_set_many(self, mapping: Dict, period, db=REMOTE_DB,
+                        deadline: Deadline | None = None) -> List[str | None]:
+        """get_or_set для нескольких ключей одним пакетом."""
+        if not mapping:
+            return []
+        check_deadline(deadline)
+        pipe = self.connections[db].pipeline(transaction=False)
+        for key, value in mapping.items():
+            pipe.set(key, value, ex=expire_period(period), nx=True, get=True)
+        with STORE_LATENCY.time(db=db, command="pipeline"):
+            return [decode(binary) for binary in pipe.execute()]
 
     @lazy_connect(CACHE_DB)
-    def cache_get(self, key) -> str | None:
-        try:
-            value = self.get(key=key,db=CACHE_DB)
-        except ConnectionError:
-            value = None
+    def bucket_get_many(self, keys: List) -> List[str | None]:
+        """Чтение значений кэша из корзин одним пакетом.
+
+        Числа возвращаются строками, как и при раскладке по ключам."""
+        with STORE_LATENCY.time(db=CACHE_DB, command="hget"):
+            values = self.layout.get_many(self.connections[CACHE_DB], keys)
+        return [None if value is None else str(value) for value in values]
+
+    @lazy_connect(CACHE_DB)
+    def bucket_set_batch(self, items: List) -> None:
+        """Запись списка (key, value, period) в корзины одним пакетом."""
+        if not items:
+            return
+        with STORE_LATENCY.time(db=CACHE_DB, command="hset"):
+            self.layout.set_batch(
+                self.connections[CACHE_DB],
+                [(key, value, expire_period(period)) for key, value, period in items])
+
+    @lazy_connect(CACHE_DB)
+    def cache_get(self, key, deadline: Deadline | None = None) -> str | None:
+        # Сначала локальный кэш, Redis - только при промахе
+        value = self.l1.get(key)
+        if value is not None:
+            CACHE_REQUESTS.inc(tier="l1", result="hit")
+            return value
+        CACHE_REQUESTS.inc(tier="l1", result="miss")
+        if self.layout is None:
+            value = self.guarded(self.get, key, CACHE_DB, deadline=deadline)
+        else:
+            value = self.guarded(self.bucket_get_many, [key], default=[None],
+                                 deadline=deadline)[0]
+        if value is not None:
+            CACHE_REQUESTS.inc(tier="redis", result="hit")
+            self.l1.set(key, value)
+        else:
+            CACHE_REQUESTS.inc(tier="redis", result="miss")
         return value
 
 
     @lazy_connect(CACHE_DB)
-    def cache_set(self, key, value, period) -> None:
+    def cache_set(self, key, value, period,
+                  deadline: Deadline | None = None) -> None:
+        if isinstance(value, (str, int, float)):
+            # Значение в том виде, в каком его вернет Redis
+            self.l1.set(key, str(value), expire_period(period))
+        else:
+            self.l1.delete(key)
+        if self.writer is not None:
+            # Запись выполнит фоновый поток
+            self.writer.put(key, value, period)
+            return
+        if self.layout is None:
+            self.guarded(self.set, key, value, period, CACHE_DB, deadline=deadline)
+        else:
+            self.guarded(self.bucket_set_batch, [(key, value, period)],
+                         deadline=deadline)
+
+    @lazy_connect(CACHE_DB)
+    def cache_get_many(self, keys: List,
+                       deadline: Deadline | None = None) -> List[str | None]:
+        """Чтение нескольких ключей кэша: L1, затем один запрос к Redis."""
+        values = [self.l1.get(key) for key in keys]
+        missing = [key for key, value in zip(keys, values) if value is None]
+        CACHE_REQUESTS.inc(len(keys) - len(missing), tier="l1", result="hit")
+        CACHE_REQUESTS.inc(len(missing), tier="l1", result="miss")
+        if not missing:
+            return values
+        if self.layout is None:
+            found = self.guarded(self.get_many, missing, CACHE_DB,
+                                 default=[], deadline=deadline)
+        else:
+            found = self.guarded(self.bucket_get_many, missing,
+                                 default=[], deadline=deadline)
+        fetched = dict(zip(missing, found))
+        hits = 0
+        for key, value in fetched.items():
+            if value is not None:
+                hits += 1
+                self.l1.set(key, value)
+        CACHE_REQUESTS.inc(hits, tier="redis", result="hit")
+        CACHE_REQUESTS.inc(len(missing) - hits, tier="redis", result="miss")
+        return [fetched.get(key) if value is None else value
+                for key, value in zip(keys, values)]
+
+    @lazy_connect(CACHE_DB)
+    def cache_set_many(self, mapping: Dict, period,
+                       deadline: Deadline | None = None) -> None:
+        """Запись нескольких ключей кэша одним пакетом."""
+        for key, value in mapping.items():
+            self.l1.set(key, str(value), expire_period(period))
+        if self.writer is not None:
+            for key, value in mapping.items():
+                self.writer.put(key, value, period)
+            return
+        if self.layout is None:
+            self.guarded(self.set_many, mapping, period, CACHE_DB, deadline=deadline)
+        else:
+            self.guarded(self.bucket_set_batch,
+                         [(key, value, period) for key, value in mapping.items()],
+                         deadline=deadline)
+
+    @lazy_connect(CACHE_DB)
+    def cache_set_batch(self, items: List) -> None:
+        # Ошибка передается вызывающему (очереди отложенной записи),
+        # чтобы пакет был учтен как неудавшийся
+        if not self.breaker.allow():
+            CACHE_CIRCUIT_REJECTED.inc()
+            raise ConnectionError("Cache circuit is open")
+        failed = True
         try:
-            self.set(key, value, period,db=CACHE_DB)
-        except ConnectionError:
-            pass
+            if self.layout is None:
+                self.set_batch(items, db=CACHE_DB)
+            else:
+                self.bucket_set_batch(items)
+            failed = False
+        finally:
+            self.record_breaker(failed)
+
+
+class WriteBehindQueue:
+    """Ограниченная очередь отложенной записи.
+
+    Фоновый поток забирает элементы пакетами до batch_size штук (или
+    то, что накопилось за interval секунд) и передает их в flush.
+    При переполнении очереди запись отбрасывается и учитывается в
+    счетчике dropped."""
+
+    def __init__(self, flush, max_size: int = WRITE_BEHIND_QUEUE_SIZE,
+                 batch_size: int = WRITE_BEHIND_BATCH_SIZE,
+                 interval: float = WRITE_BEHIND_INTERVAL):
+        self.flush = flush
+        self.batch_size = batch_size
+        self.interval = interval
+        self.queue = queue.Queue(maxsize=max_size)
+        self.stats = {"queued": 0, "written": 0, "dropped": 0, "failed": 0}
+        self.stats_lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="write-behind",
+                                       daemon=True)
+        self.thread.start()
+
+    def count(self, name: str, value: int = 1) -> None:
+        with self.stats_lock:
+            self.stats[name] += value
+        WRITE_BEHIND_EVENTS.inc(value, result=name)
+
+    def put(self, key, value, period) -> bool:
+        try:
+            self.queue.put_nowait((key, value, period))
+        except queue.Full:
+            self.count("dropped")
+            return False
+        self.count("queued")
+        return True
+
+    def next_batch(self) -> List:
+        try:
+            batch = [self.queue.get(timeout=self.interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def write(self, batch: List) -> None:
+        try:
+            self.flush(batch)
+            self.count("written", len(batch))
+        except Exception as e:
+            self.count("failed", len(batch))
+            logging.warning("Write-behind flush failed: %s" % e)
+
+    def run(self) -> None:
+        while not self.stopped.is_set():
+            batch = self.next_batch()
+            if batch:
+                self.write(batch)
+
+    def drain(self) -> None:
+        """Синхронная запись всего, что накопилось в очереди."""
+        batch = []
+        while True:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+            if len(batch) >= self.batch_size:
+                self.write(batch)
+                batch = []
+        if batch:
+            self.write(batch)
+
+    def close(self, timeout: float | None = 5.0) -> None:
+        self.stopped.set()
+        self.thread.join(timeout)
+        self.drain()
+
+
+def decode(binary: bytes | None) -> str | None:
+    return binary.decode("utf-8") if binary is not None else None
+
+
+def warm_up_pool(pool: redis.ConnectionPool, size: int) -> None:
+    """Открытие size соединений пула."""
+    acquired = []
+    try:
+        for _ in range(size):
+            connection = acquire_connection(pool)
+            acquired.append(connection)
+            connection.connect()
+    finally:
+        for connection in acquired:
+            pool.release(connection)
+
+
+def acquire_connection(pool: redis.ConnectionPool):
+    """Получение соединения из пула (совместимо с redis-py < 5.3)."""
+    try:
+        return pool.get_connection()
+    except TypeError:
+        return pool.get_connection("PING")
+
+
+_shared_store: ScoringStore | None = None
+_shared_pid: int | None = None
+_shared_lock = threading.Lock()
+
 
+def get_store(envfile: str = ".env") -> ScoringStore:
+    """Общее хранилище процесса.
+
+    После fork соединения родителя непригодны, поэтому в дочернем
+    процессе хранилище создается заново."""
+    global _shared_store, _shared_pid
+    if _shared_store is None or _shared_pid != os.getpid():
+        with _shared_lock:
+            if _shared_store is None or _shared_pid != os.getpid():
+                _shared_store = ScoringStore(envfile)
+                _shared_pid = os.getpid()
+    return _shared_store
+
+
+def async_lazy_connect(db: int):
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(self, *args, **kwargs):
+            if db not in self.connections.keys():
+                self.connections[db] = self.setup_connection(db=db)
+            return await func(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class AsyncScoringStore:
+    """Хранилище на асинхронном клиенте Redis."""
+
+    def __init__(self, envfile: str = ".env"):
+        self.config = load_config(envfile)
+        # Без поддержки шардирования ключи REMOTE_DB попали бы на один
+        # узел - в другое пространство ключей, чем у синхронного сервера
+        if parse_nodes(self.config.get("REDIS_REMOTE_NODES") or ""):
+            raise ValueError("REDIS_REMOTE_NODES is not supported "
+                             "by the async store")
+        # Значения кэша в корзинах не прочитал бы ни один из серверов:
+        # асинхронный пишет и читает отдельные ключи
+        if (self.config.get("REDIS_CACHE_LAYOUT")
+                or CACHE_LAYOUT_KEYS) != CACHE_LAYOUT_KEYS:
+            raise ValueError("REDIS_CACHE_LAYOUT=%s is not supported "
+                             "by the async store"
+                             % self.config.get("REDIS_CACHE_LAYOUT"))
+        self.pool = pool_settings(self.config)
+        self.connections: Dict[int, redis.asyncio.Redis] = {}
+
+    def setup_connection(self, db: int) -> redis.asyncio.Redis:
+        policy = retry_policy(self.config, db)
+        pool = redis.asyncio.BlockingConnectionPool(
+            max_connections=self.pool["max_connections"],
+            timeout=min(self.pool["timeout"], policy["timeout"]),
+            health_check_interval=self.pool["health_check_interval"],
+            socket_timeout=policy["timeout"],
+            socket_connect_timeout=policy["timeout"],
+            retry=AsyncRetry(
+                ExponentialBackoff(cap=policy["timeout"], base=policy["timeout"] / 10),
+                retries=policy["retries"],
+            ),
+            retry_on_error=[ConnectionError, TimeoutError, ConnectionResetError],
+            **connection_kwargs(self.config, db),
+        )
+        return redis.asyncio.Redis.from_pool(pool)
+
+    @async_lazy_connect(REMOTE_DB)
+    async def get(self, key, db=REMOTE_DB) -> str | None:
+        return decode(await self.connections[db].get(key))
+
+    @async_lazy_connect(REMOTE_DB)
+    async def set(self, key, value, period, db=REMOTE_DB) -> None:
+        await self.connections[db].set(key, value, ex=expire_period(period))
+
+    @async_lazy_connect(REMOTE_DB)
+    async def get_many(self, keys: List, db=REMOTE_DB) -> List[str | None]:
+        if not keys:
+            return []
+        return [decode(binary) for binary in await self.connections[db].mget(keys)]
+
+    @async_lazy_connect(REMOTE_DB)
+    async def set_many(self, mapping: Dict, period, db=REMOTE_DB) -> None:
+        if not mapping:
+            return
+        pipe = self.connections[db].pipeline(transaction=False)
+        for key, value in mapping.items():
+            pipe.set(key, value, ex=expire_period(period))
+        await pipe.execute()
+
+    @async_lazy_connect(REMOTE_DB)
+    async def get_or_set(self, key, value, period, db=REMOTE_DB) -> str | None:
+        return decode(await self.connections[db].set(
+            key, value, ex=expire_period(period), nx=True, get=True))
+
+    @async_lazy_connect(REMOTE_DB)
+    async def get_or_set_many(self, mapping: Dict, period,
+                              db=REMOTE_DB) -> List[str | None]:
+        if not mapping:
+            return []
+        pipe = self.connections[db].pipeline(transaction=False)
+        for key, value in mapping.items():
+            pipe.set(key, value, ex=expire_period(period), nx=True, get=True)
+        return [decode(binary) for binary in await pipe.execute()]
+
+    @async_lazy_connect(CACHE_DB)
+    async def cache_get(self, key) -> str | None:
+        try:
+            value = await self.get(key=key, db=CACHE_DB)
+        except RedisError:
+            value = None
+        return value
+
+    @async_lazy_connect(CACHE_DB)
+    async def cache_set(self, key, value, period) -> None:
+        try:
+            await self.set(key, value, period, db=CACHE_DB)
+        except RedisError:
+            pass
 
+    async def close(self) -> None:
+        for connection in self.connections.values():
+            await connection.aclose()
+        self.connections.clear()
@@ -0,0 +1,164 @@
+"""Выгрузка и загрузка интересов клиентов в формате JSONL.
+
+Каждая строка - один клиент:
+
+    {"cid": 1, "interests": ["cars", "pets"], "ttl": 3540}
+
+ttl - оставшийся срок жизни ключа в секундах (null - без срока).
+Запуск:
+
+    python -m src.otus_hw5.transfer export -o interests.jsonl
+    python -m src.otus_hw5.transfer import -i interests.jsonl
+
+Файл читается и пишется потоком, в памяти держится одна порция
+ключей. Загрузка выполняется пакетами SET EX, выгрузка - SCAN с
+чтением значений и сроков одним пакетом на порцию."""
+
+import sys
+import time
+from argparse import ArgumentParser
+from typing import IO, Dict, Iterable, List
+
+import src.otus_hw5.codec as codec
+import src.otus_hw5.interests as interests
+from src.otus_hw5.scoring import INTERESTS_PERIOD, interests_key
+
+BATCH_SIZE = 10000
+MATCH = "i:*"
+# Интервал вывода прогресса, с
+PROGRESS_INTERVAL = 5.0
+
+
+class Progress:
+    """Счетчик обработанных записей с выводом скорости."""
+
+    def __init__(self, action: str, stream: IO | None = None,
+                 interval: float = PROGRESS_INTERVAL, clock=time.monotonic):
+        self.action = action
+        self.stream = stream
+        self.interval = interval
+        self.clock = clock
+        self.started = self.reported = clock()
+        self.count = 0
+
+    def rate(self) -> float:
+        elapsed = self.clock() - self.started
+        return self.count / elapsed if elapsed > 0 else 0.0
+
+    def update(self, count: int) -> None:
+        self.count += count
+        if self.stream is not None and self.clock() - self.reported >= self.interval:
+            self.reported = self.clock()
+            self.report()
+
+    def report(self) -> None:
+        if self.stream is not None:
+            self.stream.write("%s %d keys, %.0f keys/s\n"
+                              % (self.action, self.count, self.rate()))
+            self.stream.flush()
+
+    def summary(self) -> Dict[str, float]:
+        return {"count": self.count, "seconds": self.clock() - self.started,
+                "rate": self.rate()}
+
+
+def batches(items: Iterable, size: int) -> Iterable[List]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def export_interests(redis, output: IO[str], match: str = MATCH,
+                     batch_size: int = BATCH_SIZE,
+                     progress: Progress | None = None) -> Progress:
+    """Выгрузка интересов в JSONL."""
+    progress = progress or Progress("exported")
+    for keys in batches(redis.scan_iter(match=match, count=batch_size), batch_size):
+        pipe = redis.pipeline(transaction=False)
+        for key in keys:
+            pipe.get(key)
+            pipe.ttl(key)
+        results = pipe.execute()
+        lines = []
+        for key, value, ttl in zip(keys, results[::2], results[1::2]):
+            # Ключ мог истечь между SCAN и чтением
+            if value is None:
+                continue
+            if isinstance(key, bytes):
+                key = key.decode("utf-8")
+            lines.append(codec.dumps_text({
+                "cid": int(key.partition(":")[2]),
+                "interests": interests.decode(value),
+                "ttl": ttl if ttl is not None and ttl >= 0 else None,
+            }))
+        if lines:
+            output.write("\n".join(lines) + "\n")
+        progress.update(len(lines))
+    return progress
+
+
+def import_interests(redis, lines: Iterable[str], batch_size: int = BATCH_SIZE,
+                     ttl: int | None = INTERESTS_PERIOD, keep_ttl: bool = True,
+                     progress: Progress | None = None) -> Progress:
+    """Загрузка интересов из JSONL пакетами SET EX.
+
+    При keep_ttl используется срок из записи, если он указан, иначе ttl."""
+    progress = progress or Progress("imported")
+    records = (codec.loads(line) for line in lines if line.strip())
+    for batch in batches(records, batch_size):
+        pipe = redis.pipeline(transaction=False)
+        for record in batch:
+            period = record.get("ttl") if keep_ttl and "ttl" in record else ttl
+            pipe.set(interests_key(record["cid"]),
+                     interests.encode(record["interests"]),
+                     ex=period if period and period > 0 else None)
+        pipe.execute()
+        progress.update(len(batch))
+    return progress
+
+
+def open_stream(path: str, mode: str) -> IO[str]:
+    if path == "-":
+        return sys.stdin if "r" in mode else sys.stdout
+    return open(path, mode, encoding="utf-8", buffering=1 << 20)
+
+
+if __name__ == "__main__":
+    from src.otus_hw5.store import REMOTE_DB, ScoringStore
+
+    parser = ArgumentParser(description="Выгрузка и загрузка интересов клиентов")
+    parser.add_argument("command", choices=("export", "import"))
+    parser.add_argument("-o", "--output", default="-", help="файл выгрузки")
+    parser.add_argument("-i", "--input", default="-", help="файл загрузки")
+    parser.add_argument("--env", default=".env")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--match", default=MATCH, help="шаблон ключей выгрузки")
+    parser.add_argument("--ttl", type=int, default=INTERESTS_PERIOD,
+                        help="срок жизни загружаемых ключей, с (0 - без срока)")
+    parser.add_argument("--ignore-ttl", action="store_true",
+                        help="не использовать срок из файла при загрузке")
+    args = parser.parse_args()
+
+    store = ScoringStore(args.env)
+    try:
+        store.warm_up(1)
+        redis = store.connections[REMOTE_DB]
+        if args.command == "export":
+            progress = Progress("exported", sys.stderr)
+            with open_stream(args.output, "w") as output:
+                export_interests(redis, output, match=args.match,
+                                 batch_size=args.batch_size, progress=progress)
+        else:
+            progress = Progress("imported", sys.stderr)
+            with open_stream(args.input, "r") as lines:
+                import_interests(redis, lines, batch_size=args.batch_size,
+                                 ttl=args.ttl or None, keep_ttl=not args.ignore_ttl,
+                                 progress=progress)
+    finally:
+        store.close()
+    progress.report()
@@ -1,13 +1,17 @@
 import datetime
+import fnmatch
 
 import pytest
 
-from src.otus_hw5.store import CACHE_DB, REMOTE_DB, ScoringStore
+from src.otus_hw5.store import (CACHE_DB, REMOTE_DB, AsyncScoringStore,
+                                ScoringStore)
 
 
 class RedisMock:
     def __init__(self):
         self.cache = {}
+        # Сроки жизни полей хешей (HEXPIRE)
+        self.field_expires = {}
 
     def get(self, key):
         val = self.cache.get(key, None)
@@ -19,8 +23,65 @@ class RedisMock:
             del self.cache[key]
             return None
 
-    def set(self, key, value):
-        self.cache[key] = {"period": None, "value": str(value).encode("utf-8")}
+    def set(self, key, value, ex=None, keepttl=False, nx=False, xx=False,
+            get=False):
+        old = self.get(key) if nx or xx or get else None
+        if nx and old is not None:
+            return old if get else None
+        if xx and old is None:
+            return None
+        period = self.cache[key]["period"] if keepttl and key in self.cache \
+            else None
+        self.cache[key] = {"period": period, "value": str(value).encode("utf-8")}
+        if ex is not None:
+            self.expire(key, ex)
+        return old if get else True
+
+    def mget(self, keys):
+        return [self.get(key) for key in keys]
+
+    def ttl(self, key):
+        if self.get(key) is None:
+            return -2
+        period = self.cache[key]["period"]
+        if period is None:
+            return -1
+        return int((period - datetime.datetime.now()).total_seconds())
+
+    def hget(self, name, key):
+        fields = self.get(name)
+        return None if fields is None else fields.get(key)
+
+    def hset(self, name, key, value):
+        if self.get(name) is None:
+            self.cache[name] = {"period": None, "value": {}}
+        self.cache[name]["value"][key] = value
+
+    def hgetall(self, name):
+        return dict(self.get(name) or {})
+
+    def hdel(self, name, *keys):
+        fields = self.get(name) or {}
+        deleted = sum(1 for key in keys if fields.pop(key, None) is not None)
+        if name in self.cache and not fields:
+            del self.cache[name]
+        return deleted
+
+    def hexpire(self, name, seconds, *keys):
+        for key in keys:
+            self.field_expires[(name, key)] = seconds
+        return [1] * len(keys)
+
+    def pipeline(self, transaction=True):
+        return PipelineMock(self)
+
+    def scan_iter(self, match=None, count=None):
+        for key in list(self.cache):
+            if match is None or fnmatch.fnmatchcase(key, match):
+                yield key
+
+    def close(self):
+        pass
 
     def expire(self, key, period):
         time_limit = datetime.datetime.now() + \
@@ -34,4 +95,56 @@ def get_store():
     store = ScoringStore(".env")
     store.connections[CACHE_DB] = RedisMock()
     store.connections[REMOTE_DB] = RedisMock()
-    yield store
\ No newline at end of file
+    yield store
+
+class PipelineMock:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def __getattr__(self, name):
+        def command(*args, **kwargs):
+            self.commands.append((name, args, kwargs))
+            return self
+        return command
+
+    def execute(self):
+        commands, self.commands = self.commands, []
+        return [getattr(self.redis, name)(*args, **kwargs)
+                for name, args, kwargs in commands]
+
+
+class AsyncPipelineMock(PipelineMock):
+    async def execute(self):
+        return super().execute()
+
+
+class AsyncRedisMock:
+    def __init__(self):
+        self.sync = RedisMock()
+
+    async def get(self, key):
+        return self.sync.get(key)
+
+    async def set(self, key, value, ex=None, nx=False, get=False):
+        return self.sync.set(key, value, ex=ex, nx=nx, get=get)
+
+    async def mget(self, keys):
+        return self.sync.mget(keys)
+
+    def pipeline(self, transaction=True):
+        return AsyncPipelineMock(self.sync)
+
+    async def expire(self, key, period):
+        self.sync.expire(key, period)
+
+    async def aclose(self):
+        pass
+
+
+@pytest.fixture()
+def get_async_store():
+    store = AsyncScoringStore(".env")
+    store.connections[CACHE_DB] = AsyncRedisMock()
+    store.connections[REMOTE_DB] = AsyncRedisMock()
+    yield store
@@ -0,0 +1,109 @@
+"""Юнит-тесты асинхронного сервера"""
+
+import asyncio
+import hashlib
+import json
+
+import pytest
+
+import src.otus_hw5.aio as aio
+import src.otus_hw5.api as api
+from tests.unit.redis_mock import get_async_store
+
+
+def auth(request):
+    msg = (request["account"] + request["login"] + api.SALT).encode("utf-8")
+    request["token"] = hashlib.sha512(msg).hexdigest()
+    return request
+
+
+class TestAsyncHandler:
+    def get_response(self, store, request, ctx):
+        return asyncio.run(
+            aio.method_handler({"body": request, "headers": {}}, ctx, store)
+        )
+
+    def test_empty_request(self, get_async_store):
+        _, code = self.get_response(get_async_store, {}, {})
+        assert code == api.INVALID_REQUEST
+
+    def test_ok_score_request(self, get_async_store):
+        request = auth({
+            "account": "horns&hoofs",
+            "login": "h&f",
+            "method": "online_score",
+            "arguments": {"phone": "79175002040", "email": "stupnikov@otus.ru"},
+        })
+        ctx = {}
+        response, code = self.get_response(get_async_store, request, ctx)
+        assert code == api.OK
+        assert response["score"] == 3.0
+        assert sorted(ctx["has"]) == ["email", "phone"]
+
+    def test_ok_interests_request(self, get_async_store):
+        request = auth({
+            "account": "horns&hoofs",
+            "login": "h&f",
+            "method": "clients_interests",
+            "arguments": {"client_ids": [1, 2, 3]},
+        })
+        ctx = {}
+        first, code = self.get_response(get_async_store, request, ctx)
+        second, _ = self.get_response(get_async_store, request, ctx)
+        assert code == api.OK
+        assert sorted(first) == [1, 2, 3]
+        assert first == second
+        assert ctx["nclients"] == 3
+
+    def test_bad_auth(self, get_async_store):
+        request = {
+            "account": "horns&hoofs",
+            "login": "h&f",
+            "method": "online_score",
+            "token": "",
+            "arguments": {},
+        }
+        _, code = self.get_response(get_async_store, request, {})
+        assert code == api.FORBIDDEN
+
+
+class TestAsyncServer:
+    async def exchange(self, store, payload: bytes):
+        server = aio.AsyncHTTPServer(store)
+        listener = await asyncio.start_server(server.serve_client, "localhost", 0)
+        port = listener.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection("localhost", port)
+        request = (
+            b"POST /method HTTP/1.1\r\nHost: localhost\r\n"
+            b"Content-Length: %d\r\n\r\n" % len(payload)
+        ) + payload
+        # Два запроса в одном соединении
+        writer.write(request + request)
+        await writer.drain()
+        replies = []
+        for _ in range(2):
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = int(head.split(b"Content-Length: ")[1].split(b"\r\n")[0])
+            replies.append((head, json.loads(await reader.readexactly(length))))
+        writer.close()
+        listener.close()
+        await listener.wait_closed()
+        return replies
+
+    def test_keep_alive(self, get_async_store):
+        request = auth({
+            "account": "horns&hoofs",
+            "login": "h&f",
+            "method": "online_score",
+            "arguments": {"first_name": "a", "last_name": "b"},
+        })
+        replies = asyncio.run(
+            self.exchange(get_async_store, json.dumps(request).encode("utf-8"))
+        )
+        for head, body in replies:
+            assert head.startswith(b"HTTP/1.1 200")
+            assert body == {"response": {"score": 0.5}, "code": api.OK}
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -254,6 +254,143 @@ class TestSuite():
         )
         assert self.context.get("nclients") == len(params["client_ids"])
 
+    def test_interests_request_deadline(self, set_up):
+        request = {
+            "account": "horns&hoofs",
+            "login": "h&f",
+            "method": "clients_interests",
+            "arguments": {"client_ids": [1, 2, 3]},
+        }
+        self.set_valid_auth(request)
+        self.context["deadline"] = api.Deadline(0.0)
+        response, code = self.get_response(request)
+        assert code == api.OK
+        assert response == {1: None, 2: None, 3: None}
+        assert self.context["partial"]
+        assert self.context["missing"] == [1, 2, 3]
+
+    def test_interests_request_stream(self, set_up):
+        request = {
+            "account": "horns&hoofs",
+            "login": "h&f",
+            "method": "clients_interests",
+            "arguments": {"client_ids": [1, 2, 3]},
+        }
+        self.set_valid_auth(request)
+        self.context["stream"] = True
+        response, code = self.get_response(request)
+        assert code == api.OK
+        batches = list(response)
+        assert [list(batch) for batch in batches] == [[1, 2, 3]]
+        self.context["deadline"] = api.Deadline(0.0)
+        response, _ = self.get_response(request)
+        assert list(response) == [{1: None, 2: None, 3: None}]
+        assert self.context["missing"] == [1, 2, 3]
+
+    def test_ok_score_batch_request(self, set_up):
+        items = [
+            {"phone": "79175002040", "email": "stupnikov@otus.ru"},
+            {"first_name": "a", "last_name": "b"},
+            {"phone": "79175002040"},
+            {"phone": "89175002040", "email": "stupnikov@otus.ru"},
+            {"phone": "79175002040", "email": "stupnikov@otus.ru"},
+        ]
+        request = {
+            "account": "horns&hoofs",
+            "login": "h&f",
+            "method": "online_score_batch",
+            "arguments": {"items": items},
+        }
+        self.set_valid_auth(request)
+        response, code = self.get_response(request)
+        assert code == api.OK
+        scores = response["scores"]
+        assert len(scores) == len(items)
+        assert scores[0] == scores[4] == {"score": 3.0}
+        assert scores[1] == {"score": 0.5}
+        assert scores[2]["code"] == api.INVALID_REQUEST
+        assert scores[3]["code"] == api.INVALID_REQUEST
+        assert self.context["nitems"] == len(items)
+
+    def test_ok_score_batch_admin_request(self, set_up):
+        request = {
+            "account": "horns&hoofs",
+            "login": "admin",
+            "method": "online_score_batch",
+            "arguments": {"items": [{"phone": "79175002040"}, {}]},
+        }
+        self.set_valid_auth(request)
+        response, code = self.get_response(request)
+        assert code == api.OK
+        assert response["scores"] == [{"score": 42}, {"score": 42}]
+
+    @pytest.mark.parametrize("params",
+        [
+            {},
+            {"items": []},
+            {"items": {"phone": "79175002040"}},
+            {"items": [{"phone": "79175002040"}] * (api.MAX_BATCH_SIZE + 1)},
+        ]
+    )
+    def test_invalid_score_batch_request(self, set_up, params):
+        request = {
+            "account": "horns&hoofs",
+            "login": "h&f",
+            "method": "online_score_batch",
+            "arguments": params,
+        }
+        self.set_valid_auth(request)
+        response, code = self.get_response(request)
+        assert code == api.INVALID_REQUEST
+        assert len(response) > 0
+
+    def test_auth_cache(self, set_up):
+        request = {"account": "horns&hoofs", "login": "cached", "method": "x",
+                   "arguments": {}}
+        self.set_valid_auth(request)
+        method_req = api.parse_method(request)
+        hits = api.auth_cache.info()["hits"]
+        assert api.check_auth(method_req)
+        assert api.check_auth(method_req)
+        assert api.auth_cache.info()["hits"] == hits + 1
+        request["token"] = "bad"
+        assert not api.check_auth(api.parse_method(request))
+
+    def test_admin_digest_rotation(self):
+        digest = api.AdminDigest()
+        hour = datetime.datetime(2025, 3, 9, 10)
+        first = digest.get(hour.timestamp() + 30 * 60)
+        assert first == hashlib.sha512(
+            ("2025030910" + api.ADMIN_SALT).encode("utf-8")
+        ).hexdigest().encode("utf-8")
+        assert digest.get(hour.timestamp() + 59 * 60) == first
+        assert digest.get(hour.timestamp() + 60 * 60) != first
+
+    def test_request_instances(self):
+        first = api.OnlineScoreRequest(first_name="a", last_name="b")
+        second = api.OnlineScoreRequest(phone=79175002040)
+        assert (first.first_name, first.last_name, first.phone) == ("a", "b", None)
+        assert (second.first_name, second.phone) == (None, "79175002040")
+        with pytest.raises(AttributeError):
+            first.extra = 1
+
+    @pytest.mark.parametrize("params",
+        [
+            {"client_ids": None},
+            {"client_ids": []},
+            {"client_ids": [1, "2"]},
+        ]
+    )
+    def test_invalid_client_ids(self, params):
+        with pytest.raises(ValueError):
+            api.ClientsInterestsRequest(**params)
+
+    def test_client_ids_limit(self):
+        field = api.ClientIDsField(required=True, max_length=3)
+        assert field.clean([1, 2, 3]) == [1, 2, 3]
+        with pytest.raises(ValueError):
+            field.clean([1, 2, 3, 4])
+
 
 if __name__ == "__main__":
     pytest.main()
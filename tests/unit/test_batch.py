@@ -0,0 +1,67 @@
+"""Юнит-тесты пакетной обработки запросов"""
+
+import hashlib
+import json
+
+import pytest
+
+import src.otus_hw5.api as api
+from src.otus_hw5.batch import process_stream
+from src.otus_hw5.store import CACHE_DB, REMOTE_DB, ScoringStore
+from tests.unit.redis_mock import RedisMock
+
+
+def mock_store() -> ScoringStore:
+    store = ScoringStore(".env")
+    store.connections[CACHE_DB] = RedisMock()
+    store.connections[REMOTE_DB] = RedisMock()
+    return store
+
+
+def score_body(phone: str) -> dict:
+    return {
+        "account": "horns&hoofs",
+        "login": "h&f",
+        "method": "online_score",
+        "token": hashlib.sha512(b"horns&hoofsh&f" + api.SALT.encode()).hexdigest(),
+        "arguments": {"phone": phone, "email": "a@b.ru"} if phone else {},
+    }
+
+
+class TestBatch:
+
+    @pytest.mark.parametrize("workers", [1, 2])
+    def test_ordered_results(self, workers):
+        lines = []
+        for i in range(50):
+            lines.append(json.dumps(score_body("7917500%04d" % i if i % 3 else "")))
+        lines.insert(10, "{not json")
+        lines.insert(20, "")
+        results = [json.loads(line) for line in process_stream(
+            iter(lines), workers=workers, chunk_size=4, window=1,
+            store_factory=mock_store)]
+        assert len(results) == 51
+        assert results[10] == {"error": "Bad Request", "code": api.BAD_REQUEST}
+        codes = [result["code"] for result in results[:10] + results[11:]]
+        assert codes == [api.INVALID_REQUEST if i % 3 == 0 else api.OK
+                         for i in range(50)]
+        assert results[1] == {"response": {"score": 3.0}, "code": api.OK}
+
+    def test_bounded_window(self):
+        consumed = []
+
+        def lines():
+            for i in range(1000):
+                consumed.append(i)
+                yield json.dumps(score_body("79175000000"))
+
+        results = process_stream(lines(), workers=2, chunk_size=10, window=2,
+                                 store_factory=mock_store)
+        next(results)
+        # Прочитано не больше window * workers порций
+        assert len(consumed) <= 2 * 2 * 10
+        assert sum(1 for _ in results) == 999
+
+
+if __name__ == "__main__":
+    pytest.main()
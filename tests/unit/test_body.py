@@ -0,0 +1,74 @@
+"""Юнит-тесты чтения тела запроса"""
+
+import asyncio
+import io
+
+import pytest
+
+from src.otus_hw5.body import (BadBody, BodyTooLarge, aread_body, read_body)
+
+
+def chunked(*parts: bytes, trailer: bytes = b"") -> bytes:
+    data = b"".join(b"%x\r\n%s\r\n" % (len(part), part) for part in parts)
+    return data + b"0\r\n" + trailer + b"\r\n"
+
+
+def aread(data: bytes, headers: dict, limit: int):
+    async def run():
+        reader = asyncio.StreamReader()
+        reader.feed_data(data)
+        reader.feed_eof()
+        return await aread_body(reader, headers, limit)
+    return asyncio.run(run())
+
+
+class TestBody:
+
+    def test_content_length(self):
+        rfile = io.BytesIO(b'{"a": 1}next')
+        assert read_body(rfile, {"Content-Length": "8"}, 100) == b'{"a": 1}'
+        assert rfile.read() == b"next"
+        assert read_body(io.BytesIO(b""), {}, 100) is None
+
+    @pytest.mark.parametrize("headers, error",
+        [
+            ({"Content-Length": "101"}, BodyTooLarge),
+            ({"Content-Length": "abc"}, BadBody),
+            ({"Content-Length": "-1"}, BadBody),
+            ({"Content-Length": "50"}, BadBody),
+        ]
+    )
+    def test_content_length_errors(self, headers, error):
+        with pytest.raises(error):
+            read_body(io.BytesIO(b"{}"), headers, 100)
+
+    def test_chunked(self):
+        data = chunked(b'{"a": ', b"1}", trailer=b"X-Trailer: 1\r\n") + b"next"
+        rfile = io.BytesIO(data)
+        headers = {"Transfer-Encoding": "chunked", "Content-Length": "3"}
+        assert read_body(rfile, headers, 100) == b'{"a": 1}'
+        assert rfile.read() == b"next"
+        assert aread(data, {"transfer-encoding": "chunked"}, 100) == b'{"a": 1}'
+
+    def test_chunked_limit(self):
+        data = chunked(b"x" * 60, b"x" * 60)
+        headers = {"Transfer-Encoding": "chunked"}
+        with pytest.raises(BodyTooLarge):
+            read_body(io.BytesIO(data), headers, 100)
+        with pytest.raises(BodyTooLarge):
+            aread(data, {"transfer-encoding": "chunked"}, 100)
+
+    @pytest.mark.parametrize("data",
+        [
+            b"zz\r\n",
+            b"5\r\nab",
+            b"2\r\nabcd\r\n0\r\n\r\n",
+        ]
+    )
+    def test_chunked_errors(self, data):
+        with pytest.raises(BadBody):
+            read_body(io.BytesIO(data), {"Transfer-Encoding": "chunked"}, 100)
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,68 @@
+"""Юнит-тесты предохранителя"""
+
+import pytest
+
+from src.otus_hw5.breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestCircuitBreaker:
+
+    @pytest.fixture()
+    def clock(self):
+        return Clock()
+
+    @pytest.fixture()
+    def breaker(self, clock):
+        return CircuitBreaker(failure_threshold=3, reset_timeout=10, clock=clock)
+
+    def test_opens_after_threshold(self, breaker):
+        for _ in range(2):
+            assert breaker.allow()
+            breaker.record_failure()
+        assert breaker.state == CLOSED
+        breaker.record_failure()
+        assert breaker.state == OPEN
+        assert not breaker.allow()
+        assert breaker.rejected == 1
+
+    def test_success_resets_failures(self, breaker):
+        breaker.record_failure()
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        assert breaker.state == CLOSED
+
+    def test_half_open_probe(self, breaker, clock):
+        for _ in range(3):
+            breaker.record_failure()
+        clock.now = 10
+        assert breaker.allow()
+        assert breaker.state == HALF_OPEN
+        # Пока идет пробная операция, остальные отклоняются
+        assert not breaker.allow()
+        breaker.record_success()
+        assert breaker.state == CLOSED
+        assert breaker.allow()
+
+    def test_half_open_failure(self, breaker, clock):
+        for _ in range(3):
+            breaker.record_failure()
+        clock.now = 10
+        assert breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == OPEN
+        assert not breaker.allow()
+        clock.now = 20
+        assert breaker.allow()
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,127 @@
+"""Юнит-тесты раскладки кэша по корзинам"""
+
+import pytest
+
+from src.otus_hw5.buckets import VALUE, BucketLayout
+from src.otus_hw5.scoring import SCORE_PERIOD, get_score, get_scores_many, score_key
+from src.otus_hw5.store import CACHE_DB, AsyncScoringStore, ScoringStore
+from tests.unit.redis_mock import RedisMock
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestBucketLayout:
+
+    @pytest.fixture()
+    def clock(self):
+        return Clock()
+
+    @pytest.fixture()
+    def layout(self, clock):
+        return BucketLayout(bits=4, clock=clock)
+
+    def test_locate(self, layout):
+        bucket, field = layout.locate(score_key(phone="79175002040"))
+        assert bucket.startswith(b"s:") and len(bucket) == 3
+        assert len(field) == 8
+        buckets = {layout.locate(score_key(phone=str(i)))[0] for i in range(1000)}
+        assert len(buckets) == 16
+
+    def test_roundtrip_and_expiry(self, layout, clock):
+        redis = RedisMock()
+        keys = [score_key(phone=str(i)) for i in range(100)]
+        layout.set_batch(redis, [(key, 1.5, SCORE_PERIOD) for key in keys])
+        assert layout.get_many(redis, keys) == [1.5] * 100
+        assert layout.get_many(redis, ["uid:missing"]) == [None]
+        assert len(redis.cache) <= 16
+        # Значение хранится вместе со сроком в 8 байтах
+        assert all(len(value) == VALUE.size
+                   for bucket in redis.cache.values()
+                   for value in bucket["value"].values())
+        clock.now += SCORE_PERIOD
+        assert layout.get_many(redis, keys[:1]) == [None]
+
+    def test_expired_fields_deleted_on_read(self, layout, clock):
+        redis = RedisMock()
+        keys = [score_key(phone=str(i)) for i in range(20)]
+        layout.set_batch(redis, [(key, 1.5, SCORE_PERIOD) for key in keys])
+        clock.now += SCORE_PERIOD
+        assert layout.get_many(redis, keys) == [None] * 20
+        assert sum(len(bucket["value"]) for bucket in redis.cache.values()) == 0
+
+    def test_sweep_on_write(self, clock):
+        layout = BucketLayout(bits=1, clock=clock, random=lambda: 0.0)
+        redis = RedisMock()
+        old = [score_key(phone=str(i)) for i in range(100)]
+        layout.set_batch(redis, [(key, 1.5, 60) for key in old])
+        clock.now += 60
+        # Запись в корзину удаляет из нее истекшие поля
+        new = [score_key(phone="new%s" % i) for i in range(10)]
+        layout.set_batch(redis, [(key, 2.0, 60) for key in new])
+        assert sum(len(bucket["value"]) for bucket in redis.cache.values()) == 10
+        assert layout.get_many(redis, new) == [2.0] * 10
+
+    def test_field_ttl(self, clock):
+        layout = BucketLayout(bits=4, field_ttl=True, clock=clock,
+                              random=lambda: 0.0)
+        redis = RedisMock()
+        key = score_key(phone="79175002040")
+        layout.set_batch(redis, [(key, 1.5, 60)])
+        assert redis.field_expires == {layout.locate(key): 60}
+
+    def test_only_numbers(self, layout):
+        redis = RedisMock()
+        layout.set_batch(redis, [("key1", "value1", 60), ("key2", 2, 60)])
+        assert layout.get_many(redis, ["key1", "key2"]) == [None, 2.0]
+
+    def test_no_expiry(self, layout, clock):
+        assert layout.unpack(layout.pack(3.0, None)) == 3.0
+        clock.now += 10 ** 8
+        assert layout.unpack(layout.pack(3.0, None)) == 3.0
+
+    def test_invalid_bits(self):
+        with pytest.raises(ValueError):
+            BucketLayout(bits=0)
+
+
+class TestBucketStore:
+
+    def test_scores(self, monkeypatch):
+        monkeypatch.setattr("src.otus_hw5.store.load_config", lambda envfile: {
+            "REDIS_CACHE_LAYOUT": "buckets", "REDIS_CACHE_BUCKET_BITS": "8",
+            "L1_CACHE_SIZE": "0"})
+        store = ScoringStore(".env")
+        store.connections[CACHE_DB] = redis = RedisMock()
+        assert get_score(store=store, phone="79175002040") == 1.5
+        assert get_score(store=store, phone="79175002040") == 1.5
+        items = [{"phone": str(i)} for i in range(50)]
+        assert get_scores_many(store=store, items=items) == [1.5] * 50
+        assert get_scores_many(store=store, items=items) == [1.5] * 50
+        assert all(key.startswith(b"s:") for key in redis.cache)
+        assert len(redis.cache) <= 256
+        # Значения кэша - строки, как и при раскладке по ключам
+        assert store.cache_get_many([score_key(phone="79175002040")]) == ["1.5"]
+        store.cache_set("key1", "value1", 60)
+        assert store.cache_get("key1") is None
+
+    def test_unknown_layout(self, monkeypatch):
+        monkeypatch.setattr("src.otus_hw5.store.load_config",
+                            lambda envfile: {"REDIS_CACHE_LAYOUT": "zset"})
+        with pytest.raises(ValueError):
+            ScoringStore(".env")
+
+    def test_async_store_rejects_buckets(self, monkeypatch):
+        monkeypatch.setattr("src.otus_hw5.store.load_config",
+                            lambda envfile: {"REDIS_CACHE_LAYOUT": "buckets"})
+        with pytest.raises(ValueError):
+            AsyncScoringStore(".env")
+
+
+if __name__ == "__main__":
+    pytest.main()
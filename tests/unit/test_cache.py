@@ -0,0 +1,57 @@
+"""Юнит-тесты локального кэша"""
+
+from time import sleep
+
+import pytest
+
+from src.otus_hw5.cache import TTLCache
+
+
+class TestTTLCache:
+
+    def test_get_set(self):
+        cache = TTLCache(max_entries=10, ttl=60)
+        cache.set("key1", "value1")
+        assert cache.get("key1") == "value1"
+        assert cache.get("key2") is None
+        assert cache.info()["hits"] == 1
+        assert cache.info()["misses"] == 1
+
+    def test_expire(self):
+        cache = TTLCache(max_entries=10, ttl=60)
+        cache.set("key1", "value1", ttl=0.1)
+        sleep(0.2)
+        assert cache.get("key1") is None
+        assert cache.info()["expired"] == 1
+        assert len(cache) == 0
+
+    def test_lru_eviction(self):
+        cache = TTLCache(max_entries=2, ttl=60)
+        cache.set("key1", 1)
+        cache.set("key2", 2)
+        cache.get("key1")
+        cache.set("key3", 3)
+        assert cache.get("key2") is None
+        assert cache.get("key1") == 1
+        assert cache.get("key3") == 3
+        assert cache.info()["evictions"] == 1
+
+    def test_memory_cap(self):
+        value = "x" * 1000
+        size = TTLCache.sizeof("key0", value)
+        cache = TTLCache(max_entries=100, ttl=60, max_bytes=size * 3)
+        for i in range(10):
+            cache.set(f"key{i}", value)
+        assert len(cache) == 3
+        assert cache.info()["bytes"] <= size * 3
+
+    @pytest.mark.parametrize("params", [{"max_entries": 0, "ttl": 60},
+                                        {"max_entries": 10, "ttl": 0}])
+    def test_disabled(self, params):
+        cache = TTLCache(**params)
+        cache.set("key1", "value1")
+        assert cache.get("key1") is None
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,53 @@
+"""Юнит-тесты кодирования JSON"""
+
+import importlib
+import json
+import sys
+
+import pytest
+
+import src.otus_hw5.codec as codec
+
+
+@pytest.fixture(params=["default", "json"])
+def backend(request, monkeypatch):
+    if request.param == "json":
+        # Окружение без orjson
+        monkeypatch.setitem(sys.modules, "orjson", None)
+    module = importlib.reload(codec)
+    yield module
+    monkeypatch.undo()
+    importlib.reload(codec)
+
+
+class TestCodec:
+
+    @pytest.mark.parametrize("params",
+                             [{"a": 1, "b": [1.5, None, "x"]},
+                              ["cars", "pets"],
+                              {"error": "Интересы"}])
+    def test_roundtrip(self, backend, params):
+        data = backend.dumps(params)
+        assert isinstance(data, bytes)
+        assert backend.loads(data) == params
+        assert backend.loads(data.decode("utf-8")) == params
+        assert backend.loads(backend.dumps_text(params)) == params
+
+    def test_int_keys(self, backend):
+        data = backend.dumps({"response": {1: ["cars"], 2: ["pets"]}})
+        assert json.loads(data) == {"response": {"1": ["cars"], "2": ["pets"]}}
+
+    def test_exception_value(self, backend):
+        data = backend.dumps({"error": ValueError("Invalid date"), "code": 422})
+        assert json.loads(data) == {"error": "Invalid date", "code": 422}
+
+    def test_invalid(self, backend):
+        with pytest.raises(ValueError):
+            backend.loads(b"{")
+
+    def test_fallback(self, backend):
+        assert backend.BACKEND in ("orjson", "json")
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,50 @@
+"""Юнит-тесты срока обработки запроса"""
+
+import pytest
+
+from src.otus_hw5.deadline import (DEADLINE_HEADER, Deadline, DeadlineExceeded,
+                                   check_deadline)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestDeadline:
+
+    def test_expiry(self):
+        clock = Clock()
+        deadline = Deadline(2.0, clock=clock)
+        assert deadline.remaining() == 2.0
+        deadline.check()
+        clock.now = 2.0
+        assert deadline.expired()
+        assert deadline.remaining() == 0.0
+        with pytest.raises(DeadlineExceeded):
+            check_deadline(deadline)
+
+    def test_no_deadline(self):
+        check_deadline(None)
+        assert Deadline.from_headers({}, None) is None
+
+    @pytest.mark.parametrize("header, default, expected",
+        [
+            (None, 30.0, 30.0),
+            ("5", 30.0, 5.0),
+            ("60", 30.0, 30.0),
+            ("5", None, 5.0),
+            ("abc", 30.0, 30.0),
+            ("-1", 30.0, 30.0),
+        ]
+    )
+    def test_from_headers(self, header, default, expected):
+        headers = {} if header is None else {DEADLINE_HEADER: header}
+        assert Deadline.from_headers(headers, default).timeout == expected
+
+
+if __name__ == "__main__":
+    pytest.main()
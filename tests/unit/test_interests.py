@@ -0,0 +1,81 @@
+"""Юнит-тесты формата хранения интересов"""
+
+import json
+
+import pytest
+
+import src.otus_hw5.interests as interests
+from src.otus_hw5.scoring import (INTERESTS, get_interests_many, interests_key,
+                                  random_interests)
+from src.otus_hw5.store import REMOTE_DB
+from tests.unit.redis_mock import get_store
+
+
+class TestInterests:
+
+    @pytest.mark.parametrize("value",
+        [
+            [],
+            ["cars"],
+            ["cars", "otus"],
+            list(INTERESTS),
+        ]
+    )
+    def test_roundtrip(self, value):
+        packed = interests.encode(value)
+        assert packed >> interests.MASK_BITS == interests.VERSION
+        assert interests.decode(str(packed)) == value
+        assert interests.decode(str(packed).encode()) == value
+
+    def test_legacy_json(self):
+        assert interests.decode('["pets", "tv"]') == ["pets", "tv"]
+        assert interests.decode(b'["pets", "tv"]') == ["pets", "tv"]
+
+    def test_compact(self):
+        sample = random_interests()
+        assert len(str(interests.encode(sample))) < len(json.dumps(sample)) / 2
+
+    def test_unknown_version(self):
+        with pytest.raises(ValueError):
+            interests.decode(str(99 << interests.MASK_BITS | 1))
+        with pytest.raises(KeyError):
+            interests.encode(["unknown"])
+
+    def test_migrate(self, get_store):
+        redis = get_store.connections[REMOTE_DB]
+        redis.set(interests_key(1), json.dumps(["cars", "tv"]), ex=60)
+        redis.set(interests_key(2), json.dumps(["sport", "geek"]))
+        redis.set(interests_key(3), interests.encode(["books", "otus"]), ex=60)
+        redis.set("other", json.dumps(["cars"]))
+        expires = redis.cache[interests_key(1)]["period"]
+
+        stats = interests.migrate(redis, batch_size=2)
+        assert stats == {"scanned": 3, "migrated": 2}
+        assert redis.cache["other"]["value"] == b'["cars"]'
+        assert redis.cache[interests_key(1)]["value"] == \
+            str(interests.encode(["cars", "tv"])).encode()
+        # Срок жизни сохраняется
+        assert redis.cache[interests_key(1)]["period"] == expires
+        assert redis.cache[interests_key(2)]["period"] is None
+        assert get_interests_many(store=get_store, cids=[1, 2, 3]) == {
+            1: ["cars", "tv"], 2: ["sport", "geek"], 3: ["books", "otus"]}
+        assert interests.migrate(redis)["migrated"] == 0
+
+    def test_migrate_expired(self, get_store):
+        redis = get_store.connections[REMOTE_DB]
+        redis.set(interests_key(1), json.dumps(["cars", "tv"]), ex=60)
+        mget = redis.mget
+
+        def expire_after_read(keys):
+            values = mget(keys)
+            # Ключ истекает между чтением и записью
+            del redis.cache[interests_key(1)]
+            return values
+
+        redis.mget = expire_after_read
+        assert interests.migrate(redis)["migrated"] == 0
+        assert interests_key(1) not in redis.cache
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,83 @@
+"""Юнит-тесты асинхронной записи журнала"""
+
+import logging
+import queue
+import threading
+
+import pytest
+
+import src.otus_hw5.api as api
+from src.otus_hw5.logs import LOG_RECORDS, DroppingQueueHandler, QueueLogging
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+        self.threads = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+        self.threads.append(threading.current_thread())
+
+
+class TestQueueLogging:
+
+    @pytest.fixture()
+    def logger(self):
+        # Логгер вне иерархии: pytest добавляет свои обработчики
+        logger = logging.Logger("test_logs", logging.INFO)
+        handler = ListHandler()
+        logger.addHandler(handler)
+        return logger, handler
+
+    def test_background_writer(self, logger):
+        logger, handler = logger
+        pipeline = QueueLogging(queue_size=100, logger=logger)
+        pipeline.start()
+        assert isinstance(logger.handlers[0], DroppingQueueHandler)
+        for i in range(10):
+            logger.info("record %s", i)
+        pipeline.stop()
+        # После остановки все записи выведены, обработчики возвращены
+        assert handler.messages == ["record %s" % i for i in range(10)]
+        assert threading.current_thread() not in handler.threads
+        assert logger.handlers == [handler]
+
+    def test_drop_on_full_queue(self):
+        handler = DroppingQueueHandler(queue.Queue(1))
+        dropped = LOG_RECORDS.get(result="dropped")
+        record = logging.makeLogRecord({"msg": "x"})
+        handler.emit(record)
+        handler.emit(record)
+        assert LOG_RECORDS.get(result="dropped") == dropped + 1
+
+
+class TestRequestLogging:
+
+    @pytest.mark.parametrize("code, rate, logged",
+        [
+            (api.OK, 1.0, True),
+            (api.OK, 0.0, False),
+            (api.INVALID_REQUEST, 0.0, True),
+        ]
+    )
+    def test_sampling(self, caplog, code, rate, logged):
+        sampled_out = LOG_RECORDS.get(result="sampled_out")
+        with caplog.at_level(logging.INFO):
+            api.log_request("/method", code, b"{}", {"code": code},
+                            sample_rate=rate)
+        assert bool(caplog.records) == logged
+        assert LOG_RECORDS.get(result="sampled_out") == sampled_out + (not logged)
+
+    def test_body_limit(self, caplog):
+        with caplog.at_level(logging.INFO):
+            api.log_request("/method", api.OK, b"x" * 100, {}, body_limit=10)
+            api.log_request("/method", api.OK, b"x" * 100, {}, body_limit=0)
+        first, second = (record.getMessage() for record in caplog.records)
+        assert "b'xxxxxxxxxx'..." in first
+        assert "x" not in second.split(":", 1)[1]
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,60 @@
+"""Юнит-тесты метрик"""
+
+import pytest
+
+import src.otus_hw5.metrics as metrics
+
+
+class TestMetrics:
+
+    @pytest.fixture()
+    def registry(self):
+        return metrics.Registry()
+
+    def test_counter(self, registry):
+        counter = registry.register(
+            metrics.Counter("requests_total", "Requests", ("code",)))
+        counter.inc(code=200)
+        counter.inc(2, code=200)
+        counter.inc(code=404)
+        text = registry.render()
+        assert "# TYPE requests_total counter" in text
+        assert 'requests_total{code="200"} 3' in text
+        assert 'requests_total{code="404"} 1' in text
+
+    def test_gauge(self, registry):
+        gauge = registry.register(metrics.Gauge("in_flight", "In flight"))
+        with gauge.track_inprogress():
+            assert gauge.get() == 1
+        assert gauge.get() == 0
+        assert "in_flight 0" in registry.render()
+
+    def test_histogram(self, registry):
+        histogram = registry.register(metrics.Histogram(
+            "latency_seconds", "Latency", ("method",), buckets=(0.1, 1.0)))
+        for value in (0.05, 0.5, 5.0):
+            histogram.observe(value, method="get")
+        text = registry.render()
+        assert 'latency_seconds_bucket{method="get",le="0.1"} 1' in text
+        assert 'latency_seconds_bucket{method="get",le="1.0"} 2' in text
+        assert 'latency_seconds_bucket{method="get",le="+Inf"} 3' in text
+        assert 'latency_seconds_sum{method="get"} 5.55' in text
+        assert 'latency_seconds_count{method="get"} 3' in text
+
+    def test_callback_gauge(self, registry):
+        registry.register(metrics.CallbackGauge(
+            "ratio", "Ratio", lambda: {("l1",): 0.5}, ("tier",)))
+        assert 'ratio{tier="l1"} 0.5' in registry.render()
+
+    def test_escape(self, registry):
+        counter = registry.register(metrics.Counter("c", "C", ("v",)))
+        counter.inc(v='a"b\\')
+        assert 'c{v="a\\"b\\\\"} 1' in registry.render()
+
+    def test_register_twice(self, registry):
+        first = registry.register(metrics.Counter("c", "C"))
+        assert registry.register(metrics.Counter("c", "C")) is first
+
+
+if __name__ == "__main__":
+    pytest.main()
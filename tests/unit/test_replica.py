@@ -0,0 +1,163 @@
+"""Юнит-тесты чтения с реплик"""
+
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from redis.exceptions import ConnectionError
+
+from src.otus_hw5.replica import (HEDGED_READS, LEAST_LATENCY, REPLICA_COOLDOWN,
+                                  LatencyStats, ReplicatedRedis)
+from src.otus_hw5.store import REMOTE_DB, ScoringStore
+from tests.unit.redis_mock import RedisMock
+
+REPLICAS = ["localhost:6381", "localhost:6382"]
+
+
+class NamedRedis(RedisMock):
+    def __init__(self, name, delay=0.0):
+        super().__init__()
+        self.name = name
+        self.delay = delay
+        self.reads = 0
+
+    def get(self, key):
+        self.reads += 1
+        time.sleep(self.delay)
+        return self.name.encode("utf-8")
+
+
+class FailingRedis(NamedRedis):
+    def get(self, key):
+        self.reads += 1
+        raise ConnectionError("replica is down")
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestReplicatedRedis:
+
+    def make(self, *replicas, **kwargs):
+        primary = NamedRedis("primary")
+        return primary, ReplicatedRedis(
+            primary, dict(zip(REPLICAS, replicas)), **kwargs)
+
+    def test_round_robin(self):
+        _, redis = self.make(NamedRedis("a"), NamedRedis("b"))
+        assert [redis.get("k") for _ in range(4)] == [b"a", b"b", b"a", b"b"]
+        assert redis.mget(["k1", "k2"]) == [b"a", b"a"]
+
+    def test_writes_to_primary(self):
+        primary, redis = self.make(NamedRedis("a"))
+        redis.set("k", "v", ex=60)
+        redis.pipeline(transaction=False).set("p", "v").execute()
+        assert sorted(primary.cache) == ["k", "p"]
+        assert len(redis.endpoints()) == 2
+
+    def test_least_latency(self):
+        slow, fast = NamedRedis("slow", delay=0.02), NamedRedis("fast")
+        _, redis = self.make(slow, fast, balance=LEAST_LATENCY)
+        redis.get("k")
+        redis.latency[REPLICAS[1]].observe(0.001)
+        assert [redis.get("k") for _ in range(3)] == [b"fast"] * 3
+
+    def test_fallback_to_primary(self):
+        _, redis = self.make(FailingRedis("a"))
+        assert redis.get("k") == b"primary"
+
+    def test_down_replica_ejected(self):
+        clock = Clock()
+        down, up = FailingRedis("down"), NamedRedis("up")
+        _, redis = self.make(down, up, balance=LEAST_LATENCY, clock=clock)
+        assert [redis.get("k") for _ in range(100)] == [b"primary"] + [b"up"] * 99
+        assert down.reads == 1
+        # После паузы реплика снова пробуется
+        clock.now = REPLICA_COOLDOWN
+        redis.latency[REPLICAS[0]].average = 0.0
+        redis.get("k")
+        assert down.reads == 2
+
+    def test_all_replicas_down(self):
+        clock = Clock()
+        a, b = FailingRedis("a"), FailingRedis("b")
+        _, redis = self.make(a, b, clock=clock)
+        assert [redis.get("k") for _ in range(10)] == [b"primary"] * 10
+        assert a.reads + b.reads == 2
+
+    def test_hedged_read(self):
+        slow, fast = NamedRedis("slow", delay=0.5), NamedRedis("fast")
+        _, redis = self.make(slow, fast, hedge_percentile=95)
+        won = HEDGED_READS.get(result="won")
+        started = time.monotonic()
+        assert redis.get("k") == b"fast"
+        assert time.monotonic() - started < 0.3
+        assert HEDGED_READS.get(result="won") == won + 1
+        redis.close()
+
+    def test_hedge_not_needed(self):
+        a, b = NamedRedis("a"), NamedRedis("b")
+        _, redis = self.make(a, b, hedge_percentile=95)
+        sent = HEDGED_READS.get(result="sent")
+        assert redis.get("k") == b"a"
+        assert HEDGED_READS.get(result="sent") == sent
+        assert b.reads == 0
+        redis.close()
+
+    def median_latency(self, redis, threads=32, reads=10):
+        def client(_):
+            latencies = []
+            for _ in range(reads):
+                started = time.perf_counter()
+                redis.get("k")
+                latencies.append(time.perf_counter() - started)
+            return latencies
+
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            latencies = [value for values in pool.map(client, range(threads))
+                         for value in values]
+        return statistics.median(latencies)
+
+    def test_hedge_under_concurrency(self):
+        # Хеджирование не добавляет ожидания потока пула при параллельных чтениях
+        _, plain = self.make(NamedRedis("a", delay=0.005),
+                             NamedRedis("b", delay=0.005))
+        _, hedged = self.make(NamedRedis("a", delay=0.005),
+                              NamedRedis("b", delay=0.005), hedge_percentile=95)
+        baseline = self.median_latency(plain)
+        assert self.median_latency(hedged) < baseline * 1.5 + 0.005
+        hedged.close()
+
+    def test_invalid_balance(self):
+        with pytest.raises(ValueError):
+            self.make(NamedRedis("a"), balance="random")
+
+    def test_latency_percentile(self):
+        stats = LatencyStats()
+        assert stats.percentile(95) is None
+        for i in range(100):
+            stats.observe(i / 1000)
+        assert stats.percentile(95) == 0.095
+
+    def test_store_setup(self):
+        store = ScoringStore(".env")
+        store.config = {"REDIS_URL": "localhost", "REDIS_PORT": "6380",
+                        "REDIS_USER": "", "REDIS_USER_PASSWORD": "",
+                        "REDIS_REMOTE_REPLICAS": ",".join(REPLICAS),
+                        "REDIS_REMOTE_HEDGE_PERCENTILE": "99"}
+        connection = store.setup_connection(REMOTE_DB)
+        assert isinstance(connection, ReplicatedRedis)
+        assert connection.hedge_percentile == 99.0
+        assert [client.connection_pool.connection_kwargs["port"]
+                for client in connection.endpoints()] == ["6380", "6381", "6382"]
+        connection.close()
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -1,8 +1,13 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import random
+import threading
 
-from src.otus_hw5.scoring import get_interests, get_score
+from src.otus_hw5.deadline import Deadline, DeadlineExceeded
+from src.otus_hw5.scoring import (get_interests, get_interests_many, get_score,
+                                  get_scores_many, iter_interests_batches)
 from src.otus_hw5.api import MALE
+from src.otus_hw5.store import CACHE_DB, REMOTE_DB
 from tests.unit.redis_mock import get_store
 
 import pytest
@@ -33,6 +38,17 @@ class TestScoring():
         assert score == params["score"]
 
 
+    def test_get_scores_many(self, get_store):
+        items = [{"phone": "79894528759"},
+                 {"last_name": "Last", "first_name": "First"},
+                 {"birthday": datetime.today(), "gender": MALE},
+                 {"phone": "79894528759"}]
+        scores = get_scores_many(store=get_store, items=items)
+        assert scores == [get_score(store=get_store, **item) for item in items]
+        get_store.l1.clear()
+        assert get_scores_many(store=get_store, items=items) == scores
+        assert len(get_store.connections[CACHE_DB].cache) == 3
+
     def test_get_interests(self, get_store):
         cid = random.randint(1,10)
         interests1 = get_interests(store=get_store,
@@ -43,5 +59,107 @@ class TestScoring():
         assert isinstance(interests2, list)
         assert interests1 == interests2
 
+    def test_get_interests_many(self, get_store):
+        cids = list(range(1, 51))
+        single = get_interests(store=get_store, cid=1)
+        interests1 = get_interests_many(store=get_store, cids=cids)
+        interests2 = get_interests_many(store=get_store, cids=cids + [1])
+        assert list(interests1) == cids
+        assert interests1 == interests2
+        assert interests1[1] == single
+        assert all(isinstance(v, list) and len(v) == 2
+                   for v in interests1.values())
+
+    def test_get_interests_many_round_trips(self, get_store):
+        calls = []
+
+        class CountingRedis:
+            def __init__(self, redis):
+                self.redis = redis
+
+            def __getattr__(self, name):
+                calls.append(name)
+                return getattr(self.redis, name)
+
+        get_store.connections[REMOTE_DB] = CountingRedis(
+            get_store.connections[REMOTE_DB])
+        get_interests_many(store=get_store, cids=list(range(500)))
+        assert calls == ["mget", "pipeline"]
+
+    def test_get_interests_round_trip(self, get_store):
+        calls = []
+        redis = get_store.connections[REMOTE_DB]
+
+        class CountingRedis:
+            def __getattr__(self, name):
+                calls.append(name)
+                return getattr(redis, name)
+
+        get_store.connections[REMOTE_DB] = CountingRedis()
+        first = get_interests(store=get_store, cid=1)
+        assert get_interests(store=get_store, cid=1) == first
+        # Промах и попадание - по одной команде SET NX GET
+        assert calls == ["set", "set"]
+
+    def test_get_interests_concurrent(self, get_store):
+        redis = get_store.connections[REMOTE_DB]
+        lock = threading.Lock()
+        barrier = threading.Barrier(8)
+
+        class AtomicRedis:
+            def set(self, *args, **kwargs):
+                with lock:
+                    return redis.set(*args, **kwargs)
+
+            def __getattr__(self, name):
+                return getattr(redis, name)
+
+        get_store.connections[REMOTE_DB] = AtomicRedis()
+
+        def request(cid):
+            barrier.wait()
+            return get_interests(store=get_store, cid=cid)
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(request, [7] * 8))
+        # Все конкурирующие запросы получают одни и те же интересы
+        assert all(result == results[0] for result in results)
+        assert get_interests_many(store=get_store, cids=[7]) == {7: results[0]}
+
+    def test_interests_batches(self, get_store):
+        batches = list(iter_interests_batches(store=get_store,
+                                              cids=list(range(25)),
+                                              batch_size=10))
+        assert [list(batch) for batch in batches] == [
+            list(range(10)), list(range(10, 20)), list(range(20, 25))]
+
+    def test_interests_partial_on_deadline(self, get_store):
+        class Clock:
+            now = 0.0
+
+            def __call__(self):
+                # Каждое обращение к часам сдвигает время на секунду
+                self.now += 1.0
+                return self.now
+
+        deadline = Deadline(3.0, clock=Clock())
+        batches = iter_interests_batches(store=get_store, cids=list(range(30)),
+                                         batch_size=10, deadline=deadline)
+        first = next(batches)
+        assert list(first) == list(range(10))
+        with pytest.raises(DeadlineExceeded):
+            next(batches)
+
+    def test_expired_deadline_skips_store(self, get_store):
+        deadline = Deadline(0.0)
+        calls = []
+        get_store.connections[REMOTE_DB].mget = lambda *args: calls.append(args)
+        assert get_interests_many(store=get_store, cids=[1, 2],
+                                  deadline=deadline) == {}
+        assert calls == []
+        # Кэш скоринга при истекшем сроке считается промахом
+        assert get_score(store=get_store, phone="79894528759",
+                         deadline=deadline) == 1.5
+
 if __name__ == "__main__":
     pytest.main()
\ No newline at end of file
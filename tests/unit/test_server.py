@@ -0,0 +1,325 @@
+"""Юнит-тесты HTTP-сервера"""
+
+import hashlib
+import http.client
+import json
+import multiprocessing
+import os
+import socket
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+
+import src.otus_hw5.api as api
+import src.otus_hw5.server as server_module
+from src.otus_hw5.server import PersistentHTTPRequestHandler, ThreadPoolHTTPServer
+from tests.unit.redis_mock import get_store
+
+
+class SlowHandler(BaseHTTPRequestHandler):
+    delay = 0.3
+
+    def do_GET(self):
+        time.sleep(self.delay)
+        body = threading.current_thread().name.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class PingHandler(PersistentHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = str(os.getpid()).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_shared_socket(port):
+    # Платформа без SO_REUSEPORT: сокет открывается в родительском процессе
+    server_module.reuse_port_supported = lambda: False
+    server_module.serve(PingHandler, port=port, workers=2, threads=1)
+
+
+class TestThreadPoolServer:
+    @pytest.fixture()
+    def server(self):
+        server = ThreadPoolHTTPServer(
+            ("localhost", 0), SlowHandler, threads=4, backlog=16
+        )
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        yield server
+        server.shutdown()
+        server.server_close()
+
+    def fetch(self, server):
+        url = "http://localhost:%s/" % server.server_address[1]
+        with urllib.request.urlopen(url, timeout=5) as response:
+            return response.read().decode("utf-8")
+
+    def test_parallel_requests(self, server):
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            names = list(pool.map(lambda _: self.fetch(server), range(4)))
+        elapsed = time.monotonic() - started
+        assert all(name.startswith("http-worker") for name in names)
+        assert elapsed < SlowHandler.delay * 3
+
+    def test_backlog(self, server):
+        assert server.request_queue_size == 16
+
+    def test_prefork_shared_socket(self):
+        with socket.socket() as sock:
+            sock.bind(("localhost", 0))
+            port = sock.getsockname()[1]
+        process = multiprocessing.get_context("fork").Process(
+            target=serve_shared_socket, args=(port,)
+        )
+        process.start()
+        try:
+            deadline = time.monotonic() + 5
+            while True:
+                try:
+                    socket.create_connection(("localhost", port)).close()
+                    break
+                except ConnectionRefusedError:
+                    assert time.monotonic() < deadline
+                    time.sleep(0.05)
+            # Второй запрос в том же соединении обслуживается после простоя
+            connection = http.client.HTTPConnection("localhost", port, timeout=5)
+            pids = []
+            for _ in range(2):
+                connection.request("GET", "/")
+                pids.append(connection.getresponse().read())
+                time.sleep(0.1)
+            connection.close()
+            assert pids[0] == pids[1]
+        finally:
+            process.terminate()
+            process.join(5)
+
+
+class TestKeepAlive:
+    request = {
+        "account": "horns&hoofs",
+        "login": "h&f",
+        "method": "online_score",
+        "token": hashlib.sha512(b"horns&hoofsh&f" + api.SALT.encode()).hexdigest(),
+        "arguments": {"first_name": "a", "last_name": "b"},
+    }
+
+    @pytest.fixture()
+    def server(self, get_store, monkeypatch):
+        monkeypatch.setattr(api, "get_store", lambda: get_store)
+        monkeypatch.setattr(api.MainHTTPHandler, "max_requests", 3)
+        monkeypatch.setattr(api.MainHTTPHandler, "log_message",
+                            lambda *args: None)
+        server = ThreadPoolHTTPServer(("localhost", 0), api.MainHTTPHandler,
+                                      threads=2)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        yield server
+        server.shutdown()
+        server.server_close()
+
+    def test_persistent_connection(self, server):
+        connection = http.client.HTTPConnection("localhost",
+                                                server.server_address[1])
+        body = json.dumps(self.request)
+        sockets, headers = [], []
+        for _ in range(3):
+            connection.request("POST", "/method", body)
+            response = connection.getresponse()
+            assert json.loads(response.read())["response"] == {"score": 0.5}
+            sockets.append(connection.sock)
+            headers.append(response.getheader("Connection"))
+        connection.close()
+        # Одно соединение, закрытое сервером после max_requests запросов
+        assert sockets[0] is sockets[1]
+        assert headers == [None, None, "close"]
+
+    def test_idle_connections(self, server):
+        # Простаивающих соединений больше, чем потоков пула
+        body = json.dumps(self.request)
+        connections = []
+        for _ in range(4):
+            connection = http.client.HTTPConnection("localhost",
+                                                    server.server_address[1])
+            connection.request("POST", "/method", body)
+            connection.getresponse().read()
+            connections.append(connection)
+        started = time.monotonic()
+        connection = http.client.HTTPConnection("localhost",
+                                                server.server_address[1],
+                                                timeout=5)
+        connection.request("POST", "/method", body)
+        assert json.loads(connection.getresponse().read())["response"] == \
+            {"score": 0.5}
+        assert time.monotonic() - started < 1
+        assert len(server.idle) >= 4
+        # Простаивавшее соединение продолжает обслуживаться
+        connections[0].request("POST", "/method", body)
+        assert json.loads(connections[0].getresponse().read())["response"] == \
+            {"score": 0.5}
+        for connection in connections:
+            connection.close()
+
+    def test_idle_timeout(self, get_store, monkeypatch):
+        monkeypatch.setattr(api, "get_store", lambda: get_store)
+        monkeypatch.setattr(api.MainHTTPHandler, "idle_timeout", 0.2)
+        server = ThreadPoolHTTPServer(("localhost", 0), api.MainHTTPHandler,
+                                      threads=1)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            with socket.create_connection(server.server_address, timeout=5) as sock:
+                sock.sendall(b"GET /metrics HTTP/1.1\r\nHost: localhost\r\n\r\n")
+                data = b""
+                while True:
+                    chunk = sock.recv(65536)
+                    if not chunk:
+                        break
+                    data += chunk
+            # Сервер закрыл простаивающее соединение
+            assert data.startswith(b"HTTP/1.1 200")
+            assert len(server.idle) == 0
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_no_access_log(self, get_store, monkeypatch, capsys, caplog):
+        monkeypatch.setattr(api, "get_store", lambda: get_store)
+        server = ThreadPoolHTTPServer(("localhost", 0), api.MainHTTPHandler,
+                                      threads=1)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            connection = http.client.HTTPConnection("localhost",
+                                                    server.server_address[1])
+            connection.request("POST", "/method", json.dumps(self.request))
+            connection.getresponse().read()
+            connection.request("GET", "/metrics")
+            connection.getresponse().read()
+            connection.close()
+            with socket.create_connection(server.server_address, timeout=5) as sock:
+                sock.sendall(b"BROKEN\r\n\r\n")
+                sock.recv(65536)
+        finally:
+            server.shutdown()
+            server.server_close()
+        # Ни строки доступа, ни ошибок протокола в stderr
+        assert capsys.readouterr().err == ""
+        assert any("Bad request" in record.getMessage()
+                   for record in caplog.records)
+
+    def test_pipelined_requests(self, server):
+        body = json.dumps(self.request).encode("utf-8")
+        request = (b"POST /method HTTP/1.1\r\nHost: localhost\r\n"
+                   b"Content-Length: %d\r\n\r\n" % len(body)) + body
+        with socket.create_connection(server.server_address) as sock:
+            sock.sendall(request * 3)
+            data = b""
+            while data.count(b"HTTP/1.1 200") < 3 or not data.endswith(b"}"):
+                chunk = sock.recv(65536)
+                if not chunk:
+                    break
+                data += chunk
+        assert data.count(b"HTTP/1.1 200") == 3
+        assert data.count(b"Content-Length: ") == 3
+
+    def test_payload_too_large(self, server, monkeypatch):
+        monkeypatch.setattr(api.MainHTTPHandler, "max_body_size", 100)
+        connection = http.client.HTTPConnection("localhost",
+                                                server.server_address[1])
+        connection.request("POST", "/method", b"x" * 101)
+        response = connection.getresponse()
+        assert response.status == api.PAYLOAD_TOO_LARGE
+        assert json.loads(response.read())["code"] == api.PAYLOAD_TOO_LARGE
+        assert response.getheader("Connection") == "close"
+        connection.close()
+
+    def test_chunked_request(self, server):
+        connection = http.client.HTTPConnection("localhost",
+                                                server.server_address[1])
+        body = json.dumps(self.request).encode("utf-8")
+        connection.request("POST", "/method", iter([body[:10], body[10:]]),
+                           encode_chunked=True)
+        response = connection.getresponse()
+        assert json.loads(response.read())["response"] == {"score": 0.5}
+        # Соединение остается открытым для следующего запроса
+        assert response.getheader("Connection") is None
+        connection.close()
+
+    def test_streaming_interests(self, server):
+        request = dict(self.request, method="clients_interests",
+                       arguments={"client_ids": list(range(2500))})
+        connection = http.client.HTTPConnection("localhost",
+                                                server.server_address[1])
+        body = json.dumps(request)
+        connection.request("POST", "/method", body, {api.STREAM_HEADER: "1"})
+        response = connection.getresponse()
+        assert response.getheader("Transfer-Encoding") == "chunked"
+        streamed = json.loads(response.read())
+        # Повторный запрос без потокового режима читает те же интересы
+        connection.request("POST", "/method", body)
+        response = connection.getresponse()
+        assert response.getheader("Transfer-Encoding") is None
+        assert json.loads(response.read()) == streamed
+        connection.close()
+        assert streamed["code"] == api.OK
+        assert list(streamed["response"]) == [str(cid) for cid in range(2500)]
+
+    def test_streaming_failure(self, server, monkeypatch):
+        def batches(store, cids, deadline=None):
+            yield {cids[0]: ["cars"]}
+            raise RuntimeError("store failed")
+
+        monkeypatch.setattr(api.scoring, "iter_interests_batches", batches)
+        request = dict(self.request, method="clients_interests",
+                       arguments={"client_ids": [1, 2]})
+        connection = http.client.HTTPConnection("localhost",
+                                                server.server_address[1])
+        connection.request("POST", "/method", json.dumps(request),
+                           {api.STREAM_HEADER: "1"})
+        response = connection.getresponse()
+        # Ответ обрывается без завершающей порции
+        with pytest.raises(http.client.IncompleteRead):
+            response.read()
+        connection.close()
+
+    def test_metrics(self, server):
+        connection = http.client.HTTPConnection("localhost",
+                                                server.server_address[1])
+        connection.request("POST", "/method", json.dumps(self.request))
+        connection.getresponse().read()
+        connection.request("GET", "/metrics")
+        response = connection.getresponse()
+        text = response.read().decode("utf-8")
+        connection.close()
+        assert response.status == api.OK
+        assert response.getheader("Content-Type").startswith("text/plain")
+        assert 'api_request_duration_seconds_count{method="online_score",' \
+               'code="200"}' in text
+        assert 'api_validation_duration_seconds_count{request="method"}' in text
+        assert 'store_command_duration_seconds_count{db="0",command="get"}' in text
+        assert "cache_hit_ratio" in text
+        assert "api_requests_in_flight 0" in text
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,132 @@
+"""Юнит-тесты шардирования REMOTE_DB"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import src.otus_hw5.store as store_module
+from src.otus_hw5.scoring import get_interests_many
+from src.otus_hw5.shard import HashRing, ShardedRedis, parse_nodes
+from src.otus_hw5.store import (REMOTE_DB, AsyncScoringStore, ScoringStore,
+                                connection_kwargs)
+from tests.unit.redis_mock import RedisMock, get_store
+
+NODES = ["localhost:6380", "localhost:6381", "localhost:6382"]
+
+
+class TestHashRing:
+
+    def test_stable_routing(self):
+        ring = HashRing(NODES)
+        other = HashRing(reversed(NODES))
+        keys = [f"i:{cid}" for cid in range(1000)]
+        assert [ring.node(key) for key in keys] == [other.node(key) for key in keys]
+        assert ring.node("i:1") == ring.node(b"i:1")
+
+    def test_balance(self):
+        ring = HashRing(NODES)
+        groups = ring.split(f"i:{cid}" for cid in range(30000))
+        assert sorted(groups) == sorted(NODES)
+        assert all(7000 < len(indexes) < 13000 for indexes in groups.values())
+
+    def test_minimal_movement(self):
+        ring = HashRing(NODES)
+        keys = [f"i:{cid}" for cid in range(10000)]
+        before = [ring.node(key) for key in keys]
+        ring.add("localhost:6383")
+        after = [ring.node(key) for key in keys]
+        moved = [(old, new) for old, new in zip(before, after) if old != new]
+        # Ключи переходят только на новый узел, примерно 1/4 от всех
+        assert all(new == "localhost:6383" for _, new in moved)
+        assert 0.15 < len(moved) / len(keys) < 0.35
+        ring.remove("localhost:6383")
+        assert [ring.node(key) for key in keys] == before
+
+    def test_empty_ring(self):
+        with pytest.raises(LookupError):
+            HashRing().node("i:1")
+
+    def test_parse_nodes(self):
+        assert parse_nodes(" a:1, b:2 ,") == ["a:1", "b:2"]
+        assert connection_kwargs({"REDIS_URL": "x", "REDIS_PORT": "1",
+                                  "REDIS_USER": "", "REDIS_USER_PASSWORD": ""},
+                                 REMOTE_DB, "redis-2:6390")["port"] == "6390"
+
+
+class TestShardedRedis:
+
+    @pytest.fixture()
+    def sharded(self):
+        sharded = ShardedRedis({node: RedisMock() for node in NODES})
+        yield sharded
+        sharded.close()
+
+    def test_get_set(self, sharded):
+        sharded.set("i:1", "a", ex=60)
+        assert sharded.get("i:1") == b"a"
+        node = sharded.ring.node("i:1")
+        assert list(sharded.clients[node].cache) == ["i:1"]
+
+    def test_mget_order(self, sharded):
+        keys = [f"i:{cid}" for cid in range(100)]
+        for key in keys[::2]:
+            sharded.set(key, key)
+        values = sharded.mget(keys)
+        assert values == [key.encode() if i % 2 == 0 else None
+                          for i, key in enumerate(keys)]
+
+    def test_pipeline(self, sharded):
+        pipe = sharded.pipeline(transaction=False)
+        for cid in range(50):
+            pipe.set(f"i:{cid}", cid, ex=60)
+        assert len(pipe.execute()) == 50
+        assert pipe.execute() == []
+        assert sum(len(client.cache) for client in sharded.clients.values()) == 50
+        assert sorted(sharded.scan_iter(match="i:1*")) == sorted(
+            f"i:{cid}" for cid in range(50) if str(cid).startswith("1"))
+
+    def test_concurrent_mget(self):
+        class SlowRedis(RedisMock):
+            def mget(self, keys):
+                time.sleep(0.1)
+                return super().mget(keys)
+
+        sharded = ShardedRedis({node: SlowRedis() for node in NODES[:2]})
+        keys = [f"i:{cid}" for cid in range(20)]
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(lambda _: sharded.mget(keys), range(8)))
+        sharded.close()
+        # Запросы разных потоков к узлам не выстраиваются в очередь
+        assert time.monotonic() - started < 0.4
+
+    def test_store_interests(self, get_store, sharded):
+        get_store.connections[REMOTE_DB] = sharded
+        interests = get_interests_many(store=get_store, cids=list(range(200)))
+        assert get_interests_many(store=get_store,
+                                  cids=list(range(200))) == interests
+        assert all(len(client.cache) > 0 for client in sharded.clients.values())
+
+    def test_store_setup(self):
+        store = ScoringStore(".env")
+        store.config = {"REDIS_URL": "localhost", "REDIS_PORT": "6380",
+                        "REDIS_USER": "", "REDIS_USER_PASSWORD": "",
+                        "REDIS_REMOTE_NODES": ",".join(NODES)}
+        connection = store.setup_connection(REMOTE_DB)
+        assert isinstance(connection, ShardedRedis)
+        assert [client.connection_pool.connection_kwargs["port"]
+                for client in connection.clients.values()] == \
+               ["6380", "6381", "6382"]
+        connection.close()
+
+    def test_async_store_rejects_nodes(self, monkeypatch):
+        monkeypatch.setattr(store_module, "load_config", lambda envfile: {
+            "REDIS_URL": "localhost", "REDIS_PORT": "6380",
+            "REDIS_REMOTE_NODES": ",".join(NODES)})
+        with pytest.raises(ValueError):
+            AsyncScoringStore(".env")
+
+
+if __name__ == "__main__":
+    pytest.main()
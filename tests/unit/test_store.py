@@ -1,10 +1,14 @@
 """Юнит-тесты ScoringStore"""
 
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from time import sleep
 
 import pytest
+from redis.exceptions import ResponseError
 
-from tests.unit.redis_mock import get_store
+import src.otus_hw5.store as store
+from tests.unit.redis_mock import RedisMock, get_store
 
 
 class TestScoringStore:
@@ -67,6 +71,207 @@ class TestScoringStore:
         value = get_store.cache_get(key=params["key"])
         assert value is None
 
+    def test_remote_many(self, get_store):
+        get_store.set_many({"key1": "value1", "key2": 2}, period=60)
+        values = get_store.get_many(["key1", "key2", "key3"])
+        assert values == ["value1", "2", None]
+
+    def test_remote_many_expire(self, get_store):
+        get_store.set_many({"key1": "value1"}, period=1)
+        sleep(1)
+        assert get_store.get_many(["key1"]) == [None]
+
+    def test_get_or_set(self, get_store):
+        assert get_store.get_or_set("key1", "value1", period=60) is None
+        assert get_store.get_or_set("key1", "value2", period=60) == "value1"
+        assert get_store.get("key1") == "value1"
+
+    def test_get_or_set_many(self, get_store):
+        get_store.set("key1", "value1", period=60)
+        values = get_store.get_or_set_many({"key1": "new1", "key2": "new2"},
+                                           period=60)
+        assert values == ["value1", None]
+        assert get_store.get_many(["key1", "key2"]) == ["value1", "new2"]
+        assert get_store.get_or_set_many({}, period=60) == []
+
+    def test_cache_l1(self, get_store):
+        get_store.connections[store.CACHE_DB].set("key1", "value1")
+        assert get_store.cache_get(key="key1") == "value1"
+        # Повторное чтение обслуживается локальным кэшем
+        del get_store.connections[store.CACHE_DB].cache["key1"]
+        assert get_store.cache_get(key="key1") == "value1"
+        assert get_store.l1.info()["hits"] == 1
+
+    def test_cache_l1_set(self, get_store):
+        get_store.cache_set(key="key1", value=1.5, period=60)
+        get_store.connections[store.CACHE_DB].cache.clear()
+        assert get_store.cache_get(key="key1") == "1.5"
+
+
+class TestWriteBehind:
+
+    @pytest.fixture()
+    def write_behind_store(self):
+        scoring_store = store.ScoringStore(".env", write_behind=True)
+        scoring_store.connections[store.CACHE_DB] = RedisMock()
+        scoring_store.connections[store.REMOTE_DB] = RedisMock()
+        yield scoring_store
+        scoring_store.close()
+
+    def test_flush_on_close(self, write_behind_store):
+        for i in range(250):
+            write_behind_store.cache_set(key=f"key{i}", value=i, period=60)
+        cache = write_behind_store.connections[store.CACHE_DB]
+        write_behind_store.writer.close()
+        assert cache.get("key0") == b"0"
+        assert cache.get("key249") == b"249"
+        assert write_behind_store.writer.stats["written"] == 250
+
+    def test_background_flush(self, write_behind_store):
+        write_behind_store.cache_set(key="key1", value="value1", period=60)
+        sleep(store.WRITE_BEHIND_INTERVAL * 10)
+        assert write_behind_store.cache_get(key="key1") == "value1"
+
+    def test_overflow(self):
+        gate = threading.Event()
+        batches = []
+
+        def flush(batch):
+            gate.wait()
+            batches.append(batch)
+
+        writer = store.WriteBehindQueue(flush=flush, max_size=2,
+                                        batch_size=1, interval=0.01)
+        writer.put("key0", 0, 60)
+        # Фоновый поток забрал первую запись и ждет в flush
+        sleep(0.1)
+        results = [writer.put(f"key{i}", i, 60) for i in range(1, 5)]
+        gate.set()
+        writer.close()
+        assert results == [True, True, False, False]
+        assert writer.stats["dropped"] == 2
+        assert writer.stats["written"] == 3
+        assert sum(len(batch) for batch in batches) == 3
+
+
+class FailingRedis:
+    def __init__(self, error=None):
+        self.calls = 0
+        self.error = error or store.TimeoutError("Timeout reading from socket")
+
+    def __getattr__(self, name):
+        def command(*args, **kwargs):
+            self.calls += 1
+            raise self.error
+        return command
+
+
+class TestCircuitBreaker:
+
+    @pytest.fixture()
+    def failing_store(self, get_store):
+        get_store.connections[store.CACHE_DB] = FailingRedis()
+        yield get_store
+
+    def test_cache_get_fails_fast(self, failing_store):
+        cache = failing_store.connections[store.CACHE_DB]
+        for i in range(store.BREAKER_THRESHOLD + 5):
+            assert failing_store.cache_get(key=f"key{i}") is None
+        assert cache.calls == store.BREAKER_THRESHOLD
+        assert failing_store.breaker.state == "open"
+
+    def test_cache_set_fails_fast(self, failing_store):
+        cache = failing_store.connections[store.CACHE_DB]
+        for i in range(store.BREAKER_THRESHOLD + 5):
+            failing_store.cache_set(key=f"key{i}", value=i, period=60)
+        assert cache.calls == store.BREAKER_THRESHOLD
+        assert failing_store.cache_get_many([f"x{i}" for i in range(3)]) == \
+               [None, None, None]
+        assert cache.calls == store.BREAKER_THRESHOLD
+
+    def test_recovery(self, failing_store):
+        for i in range(store.BREAKER_THRESHOLD):
+            failing_store.cache_get(key=f"key{i}")
+        failing_store.breaker.opened_at -= store.BREAKER_RESET_TIMEOUT
+        failing_store.connections[store.CACHE_DB] = RedisMock()
+        failing_store.connections[store.CACHE_DB].set("key1", "value1")
+        assert failing_store.cache_get(key="key1") == "value1"
+        assert failing_store.breaker.state == "closed"
+
+    def test_response_error(self, get_store):
+        error = ResponseError("OOM command not allowed when used memory > 'maxmemory'")
+        get_store.connections[store.CACHE_DB] = FailingRedis(error)
+        # Промах кэша вместо ошибки запроса
+        assert get_store.cache_get(key="key1") is None
+        get_store.cache_set(key="key1", value=1, period=60)
+        assert get_store.breaker.failures == 2
+
+    def test_half_open_probe_error(self, get_store):
+        error = ResponseError("OOM command not allowed when used memory > 'maxmemory'")
+        get_store.connections[store.CACHE_DB] = FailingRedis(error)
+        for i in range(store.BREAKER_THRESHOLD):
+            get_store.cache_get(key=f"key{i}")
+        assert get_store.breaker.state == "open"
+        get_store.breaker.opened_at -= store.BREAKER_RESET_TIMEOUT
+        assert get_store.cache_get(key="key1") is None
+        # Неудачная пробная операция снова размыкает предохранитель
+        assert get_store.breaker.state == "open"
+        assert not get_store.breaker.probing
+        get_store.breaker.opened_at -= store.BREAKER_RESET_TIMEOUT
+        get_store.connections[store.CACHE_DB] = RedisMock()
+        assert get_store.cache_get(key="key1") is None
+        assert get_store.breaker.state == "closed"
+
+    def test_batch_error_recorded(self, get_store):
+        get_store.connections[store.CACHE_DB] = FailingRedis(ValueError("bug"))
+        get_store.breaker.state = "open"
+        get_store.breaker.opened_at -= store.BREAKER_RESET_TIMEOUT
+        # Ошибка не Redis тоже завершает пробную операцию
+        with pytest.raises(ValueError):
+            get_store.cache_set_batch([("key1", 1, 60)])
+        assert not get_store.breaker.probing
+
+    def test_remote_errors_propagate(self, get_store):
+        get_store.connections[store.REMOTE_DB] = FailingRedis()
+        with pytest.raises(store.TimeoutError):
+            get_store.get(key="key1")
+
+
+class TestStorePool:
+
+    def test_pool_settings_default(self):
+        settings = store.pool_settings({})
+        assert settings["max_connections"] == store.POOL_SIZE
+        assert settings["timeout"] == store.POOL_TIMEOUT
+        assert settings["health_check_interval"] == store.HEALTH_CHECK_INTERVAL
+
+    def test_pool_settings_config(self):
+        settings = store.pool_settings({"REDIS_POOL_SIZE": "4",
+                                        "REDIS_POOL_TIMEOUT": "0.5",
+                                        "REDIS_HEALTH_CHECK_INTERVAL": "60"})
+        assert settings == {"max_connections": 4,
+                            "timeout": 0.5,
+                            "health_check_interval": 60}
+
+    def test_setup_connection(self):
+        scoring_store = store.ScoringStore(".env")
+        scoring_store.config = {"REDIS_URL": "localhost", "REDIS_PORT": "6379",
+                                "REDIS_USER": None, "REDIS_USER_PASSWORD": None}
+        connection = scoring_store.setup_connection(db=store.REMOTE_DB)
+        pool = connection.connection_pool
+        assert pool.max_connections == store.POOL_SIZE
+        # Ожидание соединения не дольше таймаута операции
+        assert pool.timeout == min(store.POOL_TIMEOUT, store.REMOTE_TIMEOUT)
+        assert pool.connection_kwargs["socket_timeout"] == store.REMOTE_TIMEOUT
+        assert pool.connection_kwargs["db"] == store.REMOTE_DB
+        assert pool.connection_kwargs["health_check_interval"] == \
+               store.HEALTH_CHECK_INTERVAL
+
+    def test_shared_store(self):
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            stores = list(pool.map(lambda _: store.get_store(), range(8)))
+        assert all(s is stores[0] for s in stores)
+
 
 if __name__ == "__main__":
     pytest.main()
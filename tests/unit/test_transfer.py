@@ -0,0 +1,80 @@
+"""Юнит-тесты выгрузки и загрузки интересов"""
+
+import io
+import json
+
+import pytest
+
+import src.otus_hw5.interests as interests
+from src.otus_hw5.scoring import get_interests_many, interests_key
+from src.otus_hw5.store import REMOTE_DB
+from src.otus_hw5.transfer import (Progress, batches, export_interests,
+                                   import_interests)
+from tests.unit.redis_mock import RedisMock, get_store
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTransfer:
+
+    def test_batches(self):
+        assert list(batches(range(5), 2)) == [[0, 1], [2, 3], [4]]
+        assert list(batches([], 2)) == []
+
+    def test_export(self, get_store):
+        redis = get_store.connections[REMOTE_DB]
+        redis.set(interests_key(1), interests.encode(["cars", "pets"]), ex=60)
+        redis.set(interests_key(2), json.dumps(["tv"]))
+        redis.set("other", "1")
+        output = io.StringIO()
+        progress = export_interests(redis, output, batch_size=1)
+        records = [json.loads(line) for line in output.getvalue().splitlines()]
+        assert progress.count == 2
+        assert records[0]["cid"] == 1 and records[0]["interests"] == ["cars", "pets"]
+        assert 0 < records[0]["ttl"] <= 60
+        assert records[1] == {"cid": 2, "interests": ["tv"], "ttl": None}
+
+    def test_import(self, get_store):
+        redis = get_store.connections[REMOTE_DB]
+        lines = [json.dumps({"cid": cid, "interests": ["sport", "geek"]})
+                 for cid in range(25)]
+        lines.append("")
+        lines.append(json.dumps({"cid": 99, "interests": ["otus"], "ttl": None}))
+        progress = import_interests(redis, lines, batch_size=10, ttl=120)
+        assert progress.count == 26
+        assert redis.ttl(interests_key(0)) in (119, 120)
+        assert redis.ttl(interests_key(99)) == -1
+        result = get_interests_many(store=get_store, cids=[0, 24, 99])
+        assert result == {0: ["sport", "geek"], 24: ["sport", "geek"],
+                          99: ["otus"]}
+
+    def test_roundtrip(self):
+        source, target = RedisMock(), RedisMock()
+        for cid in range(100):
+            source.set(interests_key(cid), interests.encode(["books"]), ex=600)
+        output = io.StringIO()
+        export_interests(source, output, batch_size=30)
+        import_interests(target, io.StringIO(output.getvalue()), batch_size=30)
+        assert {key: value["value"] for key, value in target.cache.items()} == \
+               {key: value["value"] for key, value in source.cache.items()}
+        assert all(target.ttl(key) > 590 for key in target.cache)
+
+    def test_progress(self):
+        clock, stream = Clock(), io.StringIO()
+        progress = Progress("imported", stream, interval=5, clock=clock)
+        progress.update(100)
+        assert stream.getvalue() == ""
+        clock.now = 10
+        progress.update(900)
+        assert stream.getvalue() == "imported 1000 keys, 100 keys/s\n"
+        assert progress.summary() == {"count": 1000, "seconds": 10, "rate": 100.0}
+
+
+if __name__ == "__main__":
+    pytest.main()